@@ -0,0 +1,75 @@
+"""
+Latency of a plan creation request against the number of executors of the plan,
+``POST /api/1/plans/`` vs ``POST /api/1/plans/?async=true``.
+
+The plans use the simple planner with ``times`` executors. The synchronous request
+returns when every executor is committed, the asynchronous one returns a 202 after
+validating the plan, and the task is polled until the plan is created.
+
+Usage::
+
+    python benchmarks/async_plans_bench.py [MAX_EXECUTORS]    (defaults to 10000)
+"""
+import json
+import logging
+import sys
+import time
+
+from bench_utils import configure_benchmark_engine, print_table
+
+PLANNER_REF = "simple_planner:SimplePlanner"
+ATTACK_REF = "terminate_ec2_instance:TerminateEC2Instance"
+
+
+def plan_body(manager, name, times):
+    return {
+        "name": name,
+        "attack": manager.attacks_store.get(ATTACK_REF).example,
+        "planner": {"ref": PLANNER_REF, "args": {"min_time": "00:00", "max_time": "23:59", "times": times}}
+    }
+
+
+def main(max_executors):
+    from chaosmonkey.api.app import flask_app
+    from chaosmonkey.engine.app import shutdown_engine
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+    # avoid a log line for every executor
+    logging.getLogger("simple_planner").setLevel(logging.WARNING)
+    client = flask_app.test_client()
+
+    sizes = [size for size in (100, 1000) if size < max_executors] + [max_executors]
+    rows = []
+    for size in sizes:
+        start = time.perf_counter()
+        response = client.post("/api/1/plans/", content_type="application/json",
+                               data=json.dumps(plan_body(manager, "sync %d" % size, size)))
+        assert response.status_code == 200, response.data
+        sync = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post("/api/1/plans/?async=true", content_type="application/json",
+                               data=json.dumps(plan_body(manager, "async %d" % size, size)))
+        assert response.status_code == 202, response.data
+        accepted = time.perf_counter() - start
+        location = response.headers["Location"]
+        while True:
+            task = json.loads(client.get(location).data.decode())
+            if task["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(0.01)
+        assert task["status"] == "succeeded" and task["executors"] == size, task
+        created = time.perf_counter() - start
+
+        rows.append((size, "%.1f" % (sync * 1000), "%.1f" % (accepted * 1000), "%.1f" % (created * 1000)))
+        # some executors are in the past, they must not be run when the scheduler shuts down
+        for plan in manager.get_plans(show_all=True):
+            manager.delete_plan(plan.id)
+
+    print_table(("executors", "sync request (ms)", "async request (ms)", "async plan created (ms)"), rows)
+    shutdown_engine()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
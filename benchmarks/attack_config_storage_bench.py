@@ -0,0 +1,99 @@
+"""
+Storage used by the executors of a plan against the number of executors.
+
+Uses a run_script:RunScript attack config with a 3KB base64 PEM key. Compares the
+previous layout, with the attack config pickled in the job_state of every executor,
+with the attack config stored once per plan in cme_attack_configs.
+
+The table shows the average job_state size and how much the database file grows
+when the plan is stored, for both layouts.
+
+Usage::
+
+    python benchmarks/attack_config_storage_bench.py [N ...]
+"""
+import base64
+import os
+import sys
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, print_table
+
+DEFAULT_SIZES = [10, 200, 1000]
+
+ATTACK_CONFIG = {
+    "ref": "run_script:RunScript",
+    "args": {
+        "region": "eu-west-1",
+        "filters": {"tag:Name": "playground-asg"},
+        "local_script": "script_attacks/s_burn_cpu.sh",
+        "remote_script": "/chaos/burn_cpu",
+        "ssh": {
+            "user": "ec2-user",
+            "pem": base64.b64encode(os.urandom(2304)).decode()
+        }
+    }
+}
+
+
+def legacy_jobs_kwargs(plan, size, run_time):
+    from chaosmonkey.attacks.executor import execute
+    return [{
+        "func": execute,
+        "name": "%s-%d" % (plan.name, i),
+        "kwargs": {"attack_config": ATTACK_CONFIG, "plan_id": plan.id},
+        "trigger": "date",
+        "run_date": run_time + timedelta(seconds=i)
+    } for i in range(size)]
+
+
+def database_size(db):
+    db.session.commit()
+    page_count = db.session.execute("PRAGMA page_count").scalar()
+    page_size = db.session.execute("PRAGMA page_size").scalar()
+    return page_count * page_size
+
+
+def store_plan(manager, db, executor_model, size, legacy):
+    plan = manager.add_plan("%s-%d" % ("legacy" if legacy else "shared", size))
+    run_time = manager.scheduler.timezone.localize(datetime.now() + timedelta(days=1))
+
+    before = database_size(db)
+    if legacy:
+        manager.scheduler.add_jobs(legacy_jobs_kwargs(plan, size, run_time))
+    else:
+        manager.add_executors([(run_time + timedelta(seconds=i), "%s-%d" % (plan.name, i), ATTACK_CONFIG, plan.id)
+                               for i in range(size)])
+    growth = database_size(db) - before
+
+    row_size = db.session.query(db.func.avg(db.func.length(executor_model.job_state)))\
+        .filter(executor_model.plan_id == plan.id).scalar()
+    return row_size, growth
+
+
+def main(sizes):
+    from chaosmonkey.dal.database import db
+    from chaosmonkey.dal.executor_model import Executor
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+
+    rows = []
+    for size in sizes:
+        legacy_row, legacy_growth = store_plan(manager, db, Executor, size, True)
+        shared_row, shared_growth = store_plan(manager, db, Executor, size, False)
+        rows.append((
+            size,
+            "%.0f" % legacy_row,
+            "%.0f" % shared_row,
+            "%.1f" % (legacy_growth / 1024.0),
+            "%.1f" % (shared_growth / 1024.0)
+        ))
+
+    print_table(("executors", "inline job_state (B)", "shared job_state (B)", "inline db growth (KB)",
+                 "shared db growth (KB)"), rows)
+    manager.scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,61 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Benchmarks run against a real engine (flask app, SQLite store, scheduler and module
+stores) configured with a temporary database file.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def configure_benchmark_engine(database_uri=None, **engine_options):
+    """
+    Configure the engine with the attacks and planners folders of the repo and start
+    the scheduler paused, so no executor is executed during the benchmark.
+
+    :param database_uri:    path for the SQLite database. Defaults to a new temporary file
+    :param engine_options:  extra keyword arguments for configure_engine
+    :return:                (CMEManager, database path)
+    """
+    from chaosmonkey.engine.app import configure_engine
+    from chaosmonkey.engine.cme_manager import manager
+
+    # avoid a log line for every job added to the scheduler
+    logging.getLogger("apscheduler.scheduler").setLevel(logging.WARNING)
+
+    if database_uri is None:
+        database_uri = os.path.join(tempfile.mkdtemp(prefix="cme-bench-"), "cme.sqlite")
+
+    configure_engine(database_uri, os.path.join(ROOT, "attacks"), os.path.join(ROOT, "planners"),
+                     "Europe/Madrid", **engine_options)
+    manager.scheduler.start(paused=True)
+    return manager, database_uri
+
+
+@contextmanager
+def timer(results, key):
+    """
+    Measure the wall time of the block and store it in results[key] (seconds)
+    """
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+
+def print_table(header, rows):
+    """
+    Print a simple aligned table
+    """
+    widths = [max(len(str(value)) for value in column) for column in zip(header, *rows)]
+    line = "  ".join("%%-%ds" % width for width in widths)
+    print(line % tuple(header))
+    print(line % tuple("-" * width for width in widths))
+    for row in rows:
+        print(line % tuple(row))
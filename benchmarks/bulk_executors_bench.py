@@ -0,0 +1,67 @@
+"""
+Time to move an afternoon of executors to another date, one ``PUT /api/1/executors/<id>``
+per executor vs a single ``POST /api/1/executors/bulk``.
+
+For each size a plan with that number of pending executors is created and all of them
+are rescheduled through the flask test client, first one by one and then with a bulk
+shift selected by plan_id. The scheduler wakeups are counted.
+
+Usage::
+
+    python benchmarks/bulk_executors_bench.py [MAX_EXECUTORS]    (defaults to 1000)
+"""
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, print_table
+
+
+def main(max_executors):
+    from chaosmonkey.api.app import flask_app
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+    client = flask_app.test_client()
+    # the executors run tomorrow, the scheduler runs to count its wakeups
+    manager.scheduler.resume()
+    wakeups = []
+    wakeup = manager.scheduler.wakeup
+    manager.scheduler.wakeup = lambda: wakeups.append(1) or wakeup()
+
+    sizes = [size for size in (10, 100) if size < max_executors] + [max_executors]
+    rows = []
+    for size in sizes:
+        plan_id = manager.add_plan("bulk %d" % size).id
+        run_time = datetime.now() + timedelta(days=1)
+        executors = manager.add_executors([(run_time + timedelta(seconds=i), "executor %d" % i, {}, plan_id)
+                                           for i in range(size)])
+
+        del wakeups[:]
+        start = time.perf_counter()
+        for executor in executors:
+            date = (executor.next_run_time + timedelta(hours=1)).isoformat()
+            response = client.put("/api/1/executors/%s" % executor.id, content_type="application/json",
+                                  data=json.dumps({"type": "date", "args": {"date": date}}))
+            assert response.status_code == 200, response.data
+        single = time.perf_counter() - start
+        single_wakeups = len(wakeups)
+
+        del wakeups[:]
+        start = time.perf_counter()
+        response = client.post("/api/1/executors/bulk", content_type="application/json",
+                               data=json.dumps({"action": "shift", "seconds": 3600, "filter": {"plan_id": plan_id}}))
+        assert response.status_code == 200 and json.loads(response.data.decode())["count"] == size, response.data
+        bulk = time.perf_counter() - start
+
+        rows.append((size, "%.1f" % (single * 1000), single_wakeups, "%.1f" % (bulk * 1000), len(wakeups),
+                     "%.0fx" % (single / bulk)))
+        manager.delete_plan(plan_id)
+
+    print_table(("executors", "one by one (ms)", "wakeups", "bulk (ms)", "wakeups", "speedup"), rows)
+    manager.scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,123 @@
+"""
+API reads while the scheduler writes.
+
+Reader threads list the pending executors through the API while a writer thread adds
+and removes executors, as the scheduler and the plan creation do. Each storage
+configuration runs in its own process (the engine is a singleton):
+
+* legacy: DELETE journal, FULL synchronous, a new connection for every session
+* wal: WAL journal, NORMAL synchronous, pool of 5 connections (defaults)
+
+The table shows the read latency percentiles, the reads and writes done and the
+"database is locked" errors.
+
+Usage::
+
+    python benchmarks/concurrency_bench.py [SECONDS] [READERS]    (defaults to 10 and 4)
+"""
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, print_table
+
+CONFIGURATIONS = (
+    ("legacy", {"journal_mode": "DELETE", "synchronous": "FULL", "pool_size": 0}),
+    ("wal", {}),
+)
+EXECUTORS = 200
+WRITE_BATCH = 20
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def reader(client, url, stop, latencies, errors):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = client.get(url)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+                continue
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def writer(manager, plan_id, stop, writes, errors):
+    from chaosmonkey.dal.database import db
+
+    run_time = datetime.now() + timedelta(days=1)
+    while not stop.is_set():
+        try:
+            executors = manager.add_executors([(run_time, "writer", {}, plan_id) for _ in range(WRITE_BATCH)])
+            for executor in executors:
+                manager.sql_store.remove_job(executor.id)
+            writes.append(len(executors))
+        except Exception as e:  # pylint: disable=broad-except
+            db.session.rollback()
+            errors.append(str(e))
+        finally:
+            db.session.remove()
+
+
+def run(name, seconds, readers):
+    from chaosmonkey.api.app import flask_app
+    from chaosmonkey.dal.database import db
+
+    manager, _ = configure_benchmark_engine(storage=dict(CONFIGURATIONS)[name])
+    plan = manager.add_plan("concurrency")
+    manager.add_executors([(datetime.now() + timedelta(days=1), "executor", {}, plan.id)
+                           for _ in range(EXECUTORS)])
+    plan_id = plan.id
+    db.session.remove()
+
+    stop = threading.Event()
+    latencies, read_errors, writes, write_errors = [], [], [], []
+    url = "/api/1/executors/"
+    threads = [threading.Thread(target=reader, args=(flask_app.test_client(), url, stop, latencies, read_errors))
+               for _ in range(readers)]
+    threads.append(threading.Thread(target=writer, args=(manager, plan_id, stop, writes, write_errors)))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    locked = sum(1 for error in read_errors + write_errors if "database is locked" in str(error))
+    print("\t".join(str(value) for value in (
+        name,
+        "%.1f" % (percentile(latencies, 50) * 1000),
+        "%.1f" % (percentile(latencies, 99) * 1000),
+        "%.1f" % (max(latencies or [0]) * 1000),
+        len(latencies),
+        sum(writes),
+        len(read_errors) + len(write_errors),
+        locked
+    )))
+    manager.scheduler.shutdown()
+
+
+def main(seconds, readers):
+    rows = []
+    for name, _ in CONFIGURATIONS:
+        output = subprocess.check_output([sys.executable, __file__, "--run", name, str(seconds), str(readers)])
+        rows.append(output.decode().strip().splitlines()[-1].split("\t"))
+    print_table(("storage", "read p50 (ms)", "read p99 (ms)", "read max (ms)", "reads", "executors written",
+                 "errors", "database is locked"), rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run(sys.argv[2], float(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main(float(sys.argv[1]) if len(sys.argv) > 1 else 10, int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,131 @@
+"""
+Cost of N clients watching the plans, polling ``GET /api/1/plans/`` every second (with
+``If-None-Match``, so unchanged lists are a 304) vs listening to ``GET /api/1/events/``.
+
+The API is served by a gevent WSGIServer, as in the engine, and the clients are greenlets
+of the same process. For each number of clients the CPU time of the process is measured
+for a few idle seconds, and then plans are created from another thread to measure the time
+until every client has seen each plan.
+
+Usage::
+
+    python benchmarks/events_bench.py [MAX_CLIENTS]    (defaults to 500)
+"""
+import resource
+import sys
+import threading
+import time
+
+import gevent
+from gevent import socket
+from gevent.pywsgi import WSGIServer
+
+from bench_utils import configure_benchmark_engine, print_table
+
+IDLE_SECONDS = 5
+POLL_INTERVAL = 1
+PLANS = 5
+
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def http_get(port, path, headers=()):
+    """
+    Send a GET request and return the connected socket file
+    """
+    sock = socket.create_connection(("127.0.0.1", port))
+    request = "GET %s HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n%s\r\n" % (
+        path, "".join("%s: %s\r\n" % header for header in headers))
+    sock.sendall(request.encode())
+    return sock, sock.makefile("rb")
+
+
+def poller(port, seen, stop):
+    etag = None
+    while not stop.is_set():
+        sock, stream = http_get(port, "/api/1/plans/", [("If-None-Match", etag)] if etag else [])
+        response = stream.read().decode()
+        sock.close()
+        head, _, body = response.partition("\r\n\r\n")
+        for line in head.split("\r\n"):
+            if line.lower().startswith("etag:"):
+                etag = line.split(":", 1)[1].strip()
+        for name in set(part.split('"')[0] for part in body.split('"name": "plan-')[1:]):
+            seen.setdefault(name, time.time())
+        gevent.sleep(POLL_INTERVAL)
+
+
+def listener(port, seen, stop):
+    sock, stream = http_get(port, "/api/1/events/")
+    try:
+        while not stop.is_set():
+            line = stream.readline().decode()
+            if not line:
+                return
+            if line.startswith("data:") and '"name": "plan-' in line:
+                seen.setdefault(line.split('"name": "plan-')[1].split('"')[0], time.time())
+    finally:
+        sock.close()
+
+
+def measure(port, manager, clients, client):
+    stop = threading.Event()
+    seen = [{} for _ in range(clients)]
+    greenlets = [gevent.spawn(client, port, seen[i], stop) for i in range(clients)]
+    gevent.sleep(2)
+
+    start = cpu_time()
+    gevent.sleep(IDLE_SECONDS)
+    idle_cpu = (cpu_time() - start) / IDLE_SECONDS * 100
+
+    created = {}
+
+    def create_plans():
+        for i in range(PLANS):
+            name = "%d-%d" % (clients, i)
+            created[name] = time.time()
+            manager.add_plan("plan-%s" % name)
+            time.sleep(0.5)
+
+    writer = threading.Thread(target=create_plans)
+    writer.start()
+    while writer.is_alive():
+        gevent.sleep(0.05)
+    deadline = time.time() + POLL_INTERVAL * 3
+    while time.time() < deadline and not all(len(client_seen) == PLANS for client_seen in seen):
+        gevent.sleep(0.05)
+
+    delays = [client_seen[name] - created[name] for client_seen in seen for name in created if name in client_seen]
+    stop.set()
+    for plan in manager.get_plans(show_all=True):
+        manager.delete_plan(plan.id)
+    gevent.killall(greenlets, timeout=5)
+    return idle_cpu, sum(delays) / len(delays) * 1000, max(delays) * 1000
+
+
+def main(max_clients):
+    from chaosmonkey.api.app import flask_app
+    from chaosmonkey.engine.app import shutdown_engine
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+    server = WSGIServer(("127.0.0.1", 0), flask_app, log=None)
+    server.start()
+
+    sizes = [size for size in (10, 100) if size < max_clients] + [max_clients]
+    rows = []
+    for clients in sizes:
+        for name, client in (("polling", poller), ("events", listener)):
+            idle_cpu, mean_delay, max_delay = measure(server.server_port, manager, clients, client)
+            rows.append((clients, name, "%.1f" % idle_cpu, "%.0f" % mean_delay, "%.0f" % max_delay))
+
+    print_table(("clients", "mode", "idle cpu (%)", "mean delay (ms)", "max delay (ms)"), rows)
+    server.stop()
+    shutdown_engine()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,94 @@
+"""
+Latency and response size of the executors list against the number of pending executors,
+returning the whole list vs keyset pages and filters.
+
+The pending executors are inserted directly in cme_executors, spread over two plans and
+one executor per minute. For each size the following requests are timed through the
+flask test client:
+
+* the whole list (``GET /api/1/executors/``)
+* the first page of 100 executors
+* a deep page: the page after the executor in the middle of the list, using its cursor
+* a filtered page: 100 executors of one plan from a date
+
+Usage::
+
+    python benchmarks/executors_pagination_bench.py [MAX_EXECUTORS]    (defaults to 100000)
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, print_table
+
+PAGE_SIZE = 100
+REPEAT = 20
+INSERT_BATCH = 50000
+
+
+def insert_executors(db, executor_table, plan_ids, base, start, count):
+    for offset in range(start, start + count, INSERT_BATCH):
+        rows = [{
+            "id": "executor-%08d" % i,
+            "next_run_time": base + timedelta(minutes=i),
+            "plan_id": plan_ids[i % len(plan_ids)],
+            "job_state": b"",
+            "executed": False
+        } for i in range(offset, min(offset + INSERT_BATCH, start + count))]
+        db.session.execute(executor_table.insert(), rows)
+    db.session.commit()
+
+
+def time_request(client, url, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url)
+        assert response.status_code == 200, response.data
+    return (time.perf_counter() - start) / repeat * 1000, len(response.data)
+
+
+def main(max_executors):
+    from chaosmonkey.api.app import flask_app
+    from chaosmonkey.api.utils import encode_cursor
+    from chaosmonkey.dal.database import db
+    from chaosmonkey.dal.executor_model import Executor
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+    plan_ids = [manager.add_plan("pagination %d" % i).id for i in range(2)]
+    base = datetime.now() + timedelta(days=1)
+    client = flask_app.test_client()
+
+    sizes = [size for size in (1000, 10000) if size < max_executors] + [max_executors]
+    rows = []
+    inserted = 0
+    for size in sizes:
+        insert_executors(db, Executor.__table__, plan_ids, base, inserted, size - inserted)
+        inserted = size
+        db.session.execute("ANALYZE")
+
+        middle = size // 2
+        cursor = encode_cursor(base + timedelta(minutes=middle), "executor-%08d" % middle)
+        from_date = (base + timedelta(minutes=middle)).isoformat() + "+01:00"
+
+        full_ms, full_bytes = time_request(client, "/api/1/executors/", repeat=max(1, REPEAT // 10))
+        first_ms, page_bytes = time_request(client, "/api/1/executors/?limit=%d" % PAGE_SIZE)
+        deep_ms, _ = time_request(client, "/api/1/executors/?limit=%d&after=%s" % (PAGE_SIZE, cursor))
+        filtered_ms, _ = time_request(client, "/api/1/executors/?limit=%d&plan_id=%s&from=%s" % (
+            PAGE_SIZE, plan_ids[1], from_date.replace("+", "%2B")))
+        rows.append((size, "%.1f" % full_ms, full_bytes, "%.2f" % first_ms, "%.2f" % deep_ms, "%.2f" % filtered_ms,
+                     page_bytes))
+
+    print_table(("pending executors", "whole list (ms)", "whole list (bytes)", "first page (ms)",
+                 "deep page (ms)", "filtered page (ms)", "page (bytes)"), rows)
+
+    statement = ("SELECT id FROM cme_executors WHERE executed = 0 AND next_run_time >= '2030-01-01' "
+                 "AND (next_run_time > '2030-01-01' OR id > 'x') ORDER BY next_run_time, id LIMIT 101")
+    plan_rows = db.session.execute("EXPLAIN QUERY PLAN " + statement).fetchall()
+    print("\n%s\n  -> %s" % (statement, "; ".join(str(row[-1]) for row in plan_rows)))
+
+    manager.scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,93 @@
+"""
+Cost of the ``Idempotency-Key`` header against the number of stored keys.
+
+For each size the keys are inserted directly in cme_idempotency_keys, and then plans
+are created through the flask test client without a key, with a new key each time,
+and replayed with a key already used (the planner does not run). Finally the expired
+keys are evicted.
+
+Usage::
+
+    python benchmarks/idempotency_bench.py [MAX_KEYS]    (defaults to 100000)
+"""
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, print_table
+
+INSERT_BATCH = 5000
+REPEAT = 200
+PLANNER_REF = "exact_planner:ExactPlanner"
+ATTACK_REF = "terminate_ec2_instance:TerminateEC2Instance"
+
+
+def insert_keys(db, keys_table, start, count, created):
+    for offset in range(start, start + count, INSERT_BATCH):
+        rows = [{
+            "key": "key-%08d" % i,
+            "fingerprint": "0" * 64,
+            "created": created,
+            "status_code": 200,
+            "headers": "{}",
+            "body": '{"msg": "ok"}'
+        } for i in range(offset, min(offset + INSERT_BATCH, start + count))]
+        db.session.execute(keys_table.insert(), rows)
+    db.session.commit()
+
+
+def time_requests(client, body, keys):
+    start = time.perf_counter()
+    for key in keys:
+        headers = {"Idempotency-Key": key} if key else {}
+        response = client.post("/api/1/plans/", content_type="application/json", data=body, headers=headers)
+        assert response.status_code == 200, response.data
+    return (time.perf_counter() - start) / len(keys) * 1000
+
+
+def main(max_keys):
+    from chaosmonkey.api.app import flask_app
+    from chaosmonkey.dal.database import db
+    from chaosmonkey.dal.idempotency_key_model import IdempotencyKey
+    from chaosmonkey.engine.app import shutdown_engine
+    from chaosmonkey.engine.idempotency import idempotency_keys
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+    client = flask_app.test_client()
+    body = json.dumps({
+        "name": "idempotency",
+        "attack": manager.attacks_store.get(ATTACK_REF).example,
+        "planner": {"ref": PLANNER_REF, "args": {"date": (datetime.now() + timedelta(days=1)).isoformat()}}
+    })
+
+    sizes = [size for size in (1000, 10000) if size < max_keys] + [max_keys]
+    rows = []
+    inserted = 0
+    for size in sizes:
+        # the stored keys expire in an hour, they are evicted at the end
+        insert_keys(db, IdempotencyKey.__table__, inserted, size - inserted,
+                    datetime.utcnow() - timedelta(hours=idempotency_keys.ttl_hours - 1))
+        inserted = size
+        db.session.remove()
+
+        new_keys = ["new-%d-%d" % (size, i) for i in range(REPEAT)]
+        without_key = time_requests(client, body, [None] * REPEAT)
+        with_new_key = time_requests(client, body, new_keys)
+        replayed = time_requests(client, body, new_keys)
+        rows.append((size, "%.2f" % without_key, "%.2f" % with_new_key, "%.2f" % replayed))
+        for plan in manager.get_plans(show_all=True):
+            manager.delete_plan(plan.id)
+
+    print_table(("stored keys", "no key (ms)", "new key (ms)", "replayed key (ms)"), rows)
+
+    idempotency_keys.ttl_hours = 0
+    start = time.perf_counter()
+    evicted = idempotency_keys.evict()
+    print("evicted %d keys in %.0f ms" % (evicted, (time.perf_counter() - start) * 1000))
+    shutdown_engine()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
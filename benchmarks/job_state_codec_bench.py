@@ -0,0 +1,101 @@
+"""
+Encode/decode throughput and size of the executors job_state for the previous pickle
+format and the JobStateCodec formats (json and json + zlib).
+
+Two kinds of executors are measured: the current ones, which reference the attack
+config by id, and legacy ones with a run_script attack config (3KB PEM) inline.
+
+Usage::
+
+    python benchmarks/job_state_codec_bench.py [N]    (number of jobs, defaults to 10000)
+"""
+import base64
+import os
+import pickle
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, print_table
+
+ATTACK_CONFIG = {
+    "ref": "run_script:RunScript",
+    "args": {
+        "region": "eu-west-1",
+        "filters": {"tag:Name": "playground-asg"},
+        "local_script": "script_attacks/s_burn_cpu.sh",
+        "remote_script": "/chaos/burn_cpu",
+        "ssh": {"user": "ec2-user", "pem": base64.b64encode(os.urandom(2304)).decode()}
+    }
+}
+
+
+class PickleCodec:
+    """
+    job_state format used before JobStateCodec
+    """
+
+    @staticmethod
+    def encode(job):
+        return pickle.dumps(job.__getstate__(), pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def decode(job_state):
+        return pickle.loads(job_state)
+
+
+def create_jobs(manager, count, kwargs):
+    run_time = manager.scheduler.timezone.localize(datetime.now() + timedelta(days=1))
+    jobs = []
+    for i in range(count):
+        job = manager.scheduler._create_job("chaosmonkey.attacks.executor:execute", trigger="date",  # noqa
+                                            id="%032d" % i, name="executor-%d" % i, kwargs=kwargs,
+                                            run_date=run_time + timedelta(seconds=i))
+        job._modify(misfire_grace_time=1, coalesce=True, max_instances=1, next_run_time=job.trigger.run_date)  # noqa
+        jobs.append(job)
+    return jobs
+
+
+def measure(codec, jobs):
+    start = time.perf_counter()
+    states = [codec.encode(job) for job in jobs]
+    encode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for state in states:
+        codec.decode(state)
+    decode = time.perf_counter() - start
+
+    return (
+        "%.0f" % (len(jobs) / encode),
+        "%.0f" % (len(jobs) / decode),
+        "%.0f" % (sum(len(state) for state in states) / float(len(states)))
+    )
+
+
+def main(count):
+    from chaosmonkey.dal.job_state_codec import JobStateCodec
+
+    manager, _ = configure_benchmark_engine()
+    codecs = (
+        ("pickle", PickleCodec()),
+        ("json", JobStateCodec(compress_threshold=None)),
+        ("json + zlib (> 512B)", JobStateCodec(compress_threshold=512)),
+    )
+    executors = (
+        ("attack_config_id", {"attack_config_id": "f" * 32, "plan_id": "e" * 32}),
+        ("inline run_script config", {"attack_config": ATTACK_CONFIG, "plan_id": "e" * 32}),
+    )
+
+    rows = []
+    for executor_name, kwargs in executors:
+        jobs = create_jobs(manager, count, kwargs)
+        for codec_name, codec in codecs:
+            rows.append((executor_name, codec_name) + measure(codec, jobs))
+
+    print_table(("executor", "codec", "encode (jobs/s)", "decode (jobs/s)", "bytes per executor"), rows)
+    manager.scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
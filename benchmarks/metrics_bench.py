@@ -0,0 +1,107 @@
+"""
+Cost of the in-process metrics.
+
+Measures the cost of a histogram observation from one thread and from several threads
+at once, the latency of API reads and executor writes with the histograms enabled and
+with a no-op observe (alternated in rounds, the median of the rounds is shown), and the time
+to render ``/metrics``.
+
+Usage::
+
+    python benchmarks/metrics_bench.py [REPEAT]    (defaults to 2000)
+"""
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, print_table
+
+THREADS = 8
+ROUNDS = 10
+OBSERVATIONS = 200000
+
+
+def observe_cost(histogram, threads):
+    per_thread = OBSERVATIONS // threads
+
+    def observe():
+        for i in range(per_thread):
+            histogram.observe(0.001 * (i % 100), "label")
+
+    workers = [threading.Thread(target=observe) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+
+def time_calls(repeat, call):
+    start = time.perf_counter()
+    for i in range(repeat):
+        call(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def disable(histograms):
+    for histogram in histograms:
+        histogram.observe = lambda value, *label_values: None
+
+
+def enable(histograms):
+    for histogram in histograms:
+        histogram.__dict__.pop("observe", None)
+
+
+def main(repeat):
+    from chaosmonkey.api.app import flask_app
+    from chaosmonkey.engine.app import shutdown_engine
+    from chaosmonkey.engine.metrics import Histogram, metrics
+
+    for threads in (1, THREADS):
+        cost = observe_cost(Histogram("bench", "bench", ("label",)), threads)
+        print("observe from %d threads: %.0f ns" % (threads, cost))
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+    client = flask_app.test_client()
+    plan = manager.add_plan("metrics")
+    histograms = (metrics.request_duration, metrics.store_duration)
+    run_time = datetime.now() + timedelta(days=1)
+
+    def read(_):
+        assert client.get("/api/1/plans/%s" % plan.id).status_code == 200
+
+    def write(i):
+        manager.add_executor(run_time + timedelta(seconds=i), "executor", {"ref": "a:A"}, plan.id)
+
+    rows = []
+    for name, call in (("GET /api/1/plans/<id>", read), ("add executor", write)):
+        time_calls(repeat // ROUNDS, call)  # warm up
+        without_rounds, with_rounds = [], []
+        for _ in range(ROUNDS):
+            disable(histograms)
+            without_rounds.append(time_calls(repeat // ROUNDS, call))
+            enable(histograms)
+            with_rounds.append(time_calls(repeat // ROUNDS, call))
+        without_metrics, with_metrics = median(without_rounds), median(with_rounds)
+        rows.append((name, "%.0f" % without_metrics, "%.0f" % with_metrics,
+                     "%+.1f" % ((with_metrics - without_metrics) / without_metrics * 100)))
+    print_table(("operation", "no-op observe (us)", "metrics (us)", "overhead (%)"), rows)
+
+    start = time.perf_counter()
+    response = client.get("/metrics")
+    print("GET /metrics: %.1f ms, %d bytes" % ((time.perf_counter() - start) * 1000, len(response.data)))
+
+    manager.delete_plan(plan.id)
+    shutdown_engine()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
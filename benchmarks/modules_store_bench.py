@@ -0,0 +1,104 @@
+"""
+Attack lookup and listing cost of the ModulesStore against the number of loaded attack
+modules, for the previous linear scan and the ref index.
+
+Generates N attack modules in a temporary folder, loads them and measures ``get`` of
+the last attack loaded (what every execution does) and ``list`` (what
+``/api/1/attacks/`` does).
+
+Usage::
+
+    python benchmarks/modules_store_bench.py [N ...]    (defaults to 10 100 500)
+"""
+import inspect
+import os
+import sys
+import tempfile
+import time
+
+from bench_utils import print_table
+
+ATTACK_MODULE = '''
+from chaosmonkey.attacks.attack import Attack
+
+
+class BenchAttack{index}(Attack):
+    ref = "{name}:BenchAttack{index}"
+
+    def run(self):
+        pass
+
+    @staticmethod
+    def to_dict():
+        return Attack._to_dict(BenchAttack{index}.ref, None, None)
+'''
+LOOKUPS = 10000
+
+
+def legacy_store(klass):
+    """
+    ModulesStore with the linear scans used before the ref index
+    """
+    from chaosmonkey.modules.module_store import ModulesStore
+
+    class LegacyModulesStore(ModulesStore):
+
+        def list(self):
+            module_names = []
+            for module in self.get_modules():
+                module_name = getattr(module, '__name__')
+                for name, data in inspect.getmembers(module):
+                    if inspect.isclass(data) and self._has_klass_ancestor(data):
+                        module_names.append(module_name + ':' + name)
+            return module_names
+
+        def _ref_to_obj(self, ref):
+            module_name, class_name = ref.split(':', 1)
+            for module in self.modules:
+                if getattr(module, '__name__') == module_name:
+                    return getattr(module, class_name)
+
+    return LegacyModulesStore(klass)
+
+
+def create_modules(count):
+    path = tempfile.mkdtemp(prefix="cme-bench-attacks-")
+    names = []
+    for index in range(count):
+        name = "bench_attack_%d_%d" % (count, index)
+        with open(os.path.join(path, name + ".py"), "w") as module_file:
+            module_file.write(ATTACK_MODULE.format(name=name, index=index))
+        names.append("%s:BenchAttack%d" % (name, index))
+    return path, names
+
+
+def measure(store, ref, calls, func):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func(ref)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main(counts):
+    from chaosmonkey.attacks.attack import Attack
+    from chaosmonkey.modules.module_store import ModulesStore
+
+    rows = []
+    for count in counts:
+        path, refs = create_modules(count)
+        for store_name, store in (("linear scan", legacy_store(Attack)), ("ref index", ModulesStore(Attack))):
+            store.load(path)
+            last_ref = store.list()[-1]
+            assert store.get(last_ref) is not None and len(store.list()) == len(refs)
+            rows.append((
+                count,
+                store_name,
+                "%.2f" % measure(store, last_ref, LOOKUPS, store.get),
+                "%.1f" % measure(store, None, max(10, LOOKUPS // count), lambda _: store.list())
+            ))
+
+    print_table(("modules", "store", "get (us)", "list (us)"), rows)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 500])
@@ -0,0 +1,57 @@
+"""
+Plan creation time against the number of executors in the plan.
+
+Compares adding the executors one by one (a commit and a plan check per executor)
+with the batched path used by the planners (single transaction per plan).
+
+Usage::
+
+    python benchmarks/plan_creation_bench.py [N ...]
+"""
+import sys
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, timer, print_table
+
+DEFAULT_SIZES = [10, 100, 500, 1000]
+
+
+def executors_for(plan, size):
+    run_time = datetime.now() + timedelta(days=1)
+    attack_config = {"ref": "api_request:ApiRequest", "args": {}}
+    return [(run_time + timedelta(seconds=i), "%s-%d" % (plan.name, i), attack_config, plan.id)
+            for i in range(size)]
+
+
+def main(sizes):
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+
+    rows = []
+    for size in sizes:
+        results = {}
+
+        plan = manager.add_plan("single-%d" % size)
+        executors = executors_for(plan, size)
+        with timer(results, "single"):
+            for executor in executors:
+                manager.add_executor(*executor)
+
+        plan = manager.add_plan("batch-%d" % size)
+        executors = executors_for(plan, size)
+        with timer(results, "batch"):
+            manager.add_executors(executors)
+
+        rows.append((
+            size,
+            "%.1f" % (results["single"] * 1000),
+            "%.1f" % (results["batch"] * 1000),
+            "%.1fx" % (results["single"] / results["batch"])
+        ))
+
+    print_table(("executors", "one by one (ms)", "batch (ms)", "speedup"), rows)
+    manager.scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
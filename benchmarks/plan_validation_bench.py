@@ -0,0 +1,53 @@
+"""
+Validation cost of a POST /api/1/plans/ request: the payload against the plan schema,
+the planner args against the planner schema and the attack config against the attack
+schema, with a new validator on every call (jsonschema.validate) and with the cached
+validators.
+
+Usage::
+
+    python benchmarks/plan_validation_bench.py [N]    (number of requests, defaults to 5000)
+"""
+import os
+import sys
+import time
+
+from bench_utils import print_table, ROOT
+
+PLANNER_REF = "simple_planner:SimplePlanner"
+ATTACK_REF = "terminate_ec2_instance:TerminateEC2Instance"
+
+
+def measure(count, validate, payload, planner_class, attack_class, plan_schema):
+    start = time.perf_counter()
+    for _ in range(count):
+        validate(payload, plan_schema)
+        validate(payload["planner"]["args"], planner_class.schema)
+        validate(payload["attack"], attack_class.schema)
+    return time.perf_counter() - start
+
+
+def main(count):
+    from jsonschema import validate
+    from chaosmonkey.api.plans_blueprint import plan_schema
+    from chaosmonkey.api.request_validator import ValidatorsCache
+    from chaosmonkey.attacks.attack import Attack
+    from chaosmonkey.modules.module_store import ModulesStore
+    from chaosmonkey.planners.planner import Planner
+
+    planners_store, attacks_store = ModulesStore(Planner), ModulesStore(Attack)
+    planners_store.load(os.path.join(ROOT, "planners"))
+    attacks_store.load(os.path.join(ROOT, "attacks"))
+    planner_class, attack_class = planners_store.get(PLANNER_REF), attacks_store.get(ATTACK_REF)
+    payload = {"name": "validation", "planner": planner_class.example, "attack": attack_class.example}
+
+    rows = []
+    for name, validate_func in (("jsonschema.validate", validate), ("cached validators", ValidatorsCache().validate)):
+        elapsed = measure(count, validate_func, payload, planner_class, attack_class, plan_schema)
+        rows.append((name, count, "%.1f" % (elapsed / count * 1e6), "%.0f" % (count / elapsed)))
+
+    print_table(("validation", "requests", "per request (us)", "requests/s"), rows)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,76 @@
+"""
+Time to create many plans, one ``POST /api/1/plans/`` per plan vs a single
+``POST /api/1/plans/batch``.
+
+Every plan uses the exact planner, so it has one executor tomorrow. The requests are
+sent through the flask test client with the scheduler running, and its wakeups are
+counted.
+
+Usage::
+
+    python benchmarks/plans_batch_bench.py [MAX_PLANS]    (defaults to 500, the max batch size)
+"""
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, print_table
+
+PLANNER_REF = "exact_planner:ExactPlanner"
+ATTACK_REF = "terminate_ec2_instance:TerminateEC2Instance"
+
+
+def plan_bodies(manager, prefix, count):
+    attack = manager.attacks_store.get(ATTACK_REF).example
+    date = datetime.now() + timedelta(days=1)
+    return [{
+        "name": "%s %d" % (prefix, i),
+        "attack": attack,
+        "planner": {"ref": PLANNER_REF, "args": {"date": (date + timedelta(seconds=i)).isoformat()}}
+    } for i in range(count)]
+
+
+def main(max_plans):
+    from chaosmonkey.api.app import flask_app
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+    client = flask_app.test_client()
+    # the executors run tomorrow, the scheduler runs to count its wakeups
+    manager.scheduler.resume()
+    wakeups = []
+    wakeup = manager.scheduler.wakeup
+    manager.scheduler.wakeup = lambda: wakeups.append(1) or wakeup()
+
+    sizes = [size for size in (10, 100) if size < max_plans] + [max_plans]
+    rows = []
+    for size in sizes:
+        del wakeups[:]
+        start = time.perf_counter()
+        for body in plan_bodies(manager, "single", size):
+            response = client.post("/api/1/plans/", content_type="application/json", data=json.dumps(body))
+            assert response.status_code == 200, response.data
+        single = time.perf_counter() - start
+        single_wakeups = len(wakeups)
+
+        del wakeups[:]
+        start = time.perf_counter()
+        response = client.post("/api/1/plans/batch", content_type="application/json",
+                               data=json.dumps(plan_bodies(manager, "batch", size)))
+        assert response.status_code == 200, response.data
+        batch = time.perf_counter() - start
+        results = json.loads(response.data.decode())["plans"]
+        assert sum(result["executors"] for result in results) == size
+
+        rows.append((size, "%.1f" % (single * 1000), single_wakeups, "%.1f" % (batch * 1000), len(wakeups),
+                     "%.1fx" % (single / batch)))
+        for plan in manager.get_plans(show_all=True):
+            manager.delete_plan(plan.id)
+
+    print_table(("plans", "one by one (ms)", "wakeups", "batch (ms)", "wakeups", "speedup"), rows)
+    manager.scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
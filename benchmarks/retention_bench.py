@@ -0,0 +1,78 @@
+"""
+Retention of a large execution history.
+
+Inserts N executions scheduled 30 days ago for plans of 100 executors, runs the
+retention with 7 days and prints the report: rows deleted, longest delete transaction
+and database size before and after.
+
+Usage::
+
+    python benchmarks/retention_bench.py [N]    (defaults to 100000)
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, timer, print_table
+
+EXECUTORS_PER_PLAN = 100
+INSERT_BATCH = 50000
+
+
+def insert_history(db, count):
+    from chaosmonkey.dal.execution_model import Execution
+    from chaosmonkey.dal.plan_model import Plan
+
+    run_time = datetime.now() - timedelta(days=30)
+    plans = [{
+        "id": "plan-%d" % i,
+        "name": "plan-%d" % i,
+        "created": datetime.utcnow() - timedelta(days=30, seconds=i),
+        "executed": True,
+        "pending_count": 0,
+        "executed_count": min(EXECUTORS_PER_PLAN, count - i * EXECUTORS_PER_PLAN)
+    } for i in range((count + EXECUTORS_PER_PLAN - 1) // EXECUTORS_PER_PLAN)]
+    db.session.execute(Plan.__table__.insert(), plans)
+
+    for offset in range(0, count, INSERT_BATCH):
+        db.session.execute(Execution.__table__.insert(), [{
+            "id": "execution-%d" % i,
+            "plan_id": "plan-%d" % (i // EXECUTORS_PER_PLAN),
+            "next_run_time": run_time + timedelta(seconds=i),
+            "started": run_time,
+            "finished": run_time,
+            "duration": 0.5,
+            "outcome": "success",
+            "error": None
+        } for i in range(offset, min(offset + INSERT_BATCH, count))])
+    db.session.commit()
+
+
+def main(count):
+    from chaosmonkey.dal.database import db
+    from chaosmonkey.engine.retention import retention
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+    insert_history(db, count)
+    size_before = os.path.getsize(database_uri)
+
+    results = {}
+    with timer(results, "retention"):
+        report = retention.run(retention_days=7)
+
+    print_table(("executions", "plans deleted", "executions deleted", "longest batch (ms)", "total (s)",
+                 "file before (MB)", "file after (MB)"), [(
+                     count,
+                     report["plans_deleted"],
+                     report["executions_deleted"],
+                     "%.1f" % (report["longest_batch"] * 1000),
+                     "%.2f" % results["retention"],
+                     "%.1f" % (size_before / 1048576.0),
+                     "%.1f" % (os.path.getsize(database_uri) / 1048576.0)
+                 )])
+    manager.scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
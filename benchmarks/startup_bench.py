@@ -0,0 +1,54 @@
+"""
+Engine startup time with the attacks and planners modules imported on startup and
+in lazy mode (imported the first time they are used).
+
+Every run is a new python process that configures the engine with a new database.
+The table shows the median of the runs of the configure_engine time (the engine package
+is already imported), the whole process time and the time of the first lookup of an
+attack (that imports its module in lazy mode).
+
+Usage::
+
+    python benchmarks/startup_bench.py [RUNS]    (defaults to 5)
+"""
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_utils import print_table, ROOT
+
+RUN = '''
+import json, os, sys, tempfile, time
+sys.path.insert(0, {root!r})
+from chaosmonkey.engine.app import configure_engine
+from chaosmonkey.engine.cme_manager import manager
+start = time.perf_counter()
+configure_engine(os.path.join(tempfile.mkdtemp(), "cme.sqlite"), os.path.join({root!r}, "attacks"),
+                 os.path.join({root!r}, "planners"), "Europe/Madrid", lazy_modules={lazy!r})
+configured = time.perf_counter()
+manager.attacks_store.get("terminate_ec2_instance:TerminateEC2Instance")
+print(json.dumps({{"configure": configured - start, "first_lookup": time.perf_counter() - configured}}))
+'''
+
+
+def run(lazy):
+    start = time.perf_counter()
+    output = subprocess.check_output([sys.executable, "-c", RUN.format(root=ROOT, lazy=lazy)])
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - start
+    return result
+
+
+def main(runs):
+    rows = []
+    for name, lazy in (("import on startup", False), ("lazy", True)):
+        results = [run(lazy) for _ in range(runs)]
+        rows.append((name,) + tuple("%.0f" % (statistics.median(result[key] for result in results) * 1000)
+                                    for key in ("configure", "process", "first_lookup")))
+    print_table(("modules", "configure_engine (ms)", "process (ms)", "first attack lookup (ms)"), rows)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
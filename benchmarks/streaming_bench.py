@@ -0,0 +1,89 @@
+"""
+Peak memory and time to the first byte of the whole executors list against the number of
+pending executors, serializing the full document at once vs streaming it.
+
+The pending executors are inserted directly in cme_executors. For each size the list is
+serialized the previous way (all the executors read, converted to dicts and dumped with a
+single json.dumps) and then requested to ``GET /api/1/executors/``, that streams the
+executors from a db cursor. The streamed response is read chunk by chunk and discarded,
+as a client socket would. Memory is measured with tracemalloc.
+
+Usage::
+
+    python benchmarks/streaming_bench.py [MAX_EXECUTORS]    (defaults to 100000)
+"""
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, print_table
+from executors_pagination_bench import insert_executors
+
+
+def measure(function):
+    """
+    Run the function and return its peak memory (MB), time to the first byte and total time (ms)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+    for chunk in function():
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024, first_byte * 1000, total * 1000, size
+
+
+def main(max_executors):
+    from chaosmonkey.api.app import flask_app
+    from chaosmonkey.api.hal import Document
+    from chaosmonkey.dal.database import db
+    from chaosmonkey.dal.executor_model import Executor
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+    plan_ids = [manager.add_plan("streaming").id]
+    base = datetime.now() + timedelta(days=1)
+    client = flask_app.test_client()
+
+    def full_document():
+        with flask_app.test_request_context("/api/1/executors/"):
+            executors = manager.get_executors()
+            yield Document(embedded={"executors": [executor.to_dict() for executor in executors]}).to_json()
+        db.session.remove()
+
+    def streamed_response():
+        response = client.get("/api/1/executors/", buffered=False)
+        try:
+            for chunk in response.response:
+                yield chunk
+        finally:
+            response.close()
+
+    sizes = [size for size in (1000, 10000) if size < max_executors] + [max_executors]
+    rows = []
+    inserted = 0
+    for size in sizes:
+        insert_executors(db, Executor.__table__, plan_ids, base, inserted, size - inserted)
+        inserted = size
+        db.session.remove()
+
+        full = measure(full_document)
+        streamed = measure(streamed_response)
+        assert full[3] == streamed[3], "the streamed document differs from the full document"
+        rows.append((size, full[3], "%.1f" % full[0], "%.1f" % streamed[0], "%.1f" % full[1], "%.1f" % streamed[1],
+                     "%.0f" % full[2], "%.0f" % streamed[2]))
+
+    print_table(("pending executors", "response (bytes)", "full peak (MB)", "streamed peak (MB)",
+                 "full first byte (ms)", "streamed first byte (ms)", "full total (ms)", "streamed total (ms)"), rows)
+
+    manager.scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,103 @@
+"""
+Cost of a scheduler wakeup (get_due_jobs + get_next_run_time) against the number of
+executed executors kept in the database.
+
+The executed executors are inserted directly in cme_executors. For each history size
+the wakeup queries are timed with the (executed, next_run_time) index, and then with
+the previous single column index on next_run_time for comparison, and against a store
+with the in-memory jobs cache (cache_jobs), which does not read the database at all.
+
+Usage::
+
+    python benchmarks/wakeup_bench.py [MAX_HISTORY]    (defaults to 1000000)
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import configure_benchmark_engine, print_table
+
+PENDING = 100
+REPEAT = 200
+INSERT_BATCH = 50000
+
+
+def insert_history(db, executor_table, plan_id, start, count):
+    base = datetime(2016, 1, 1)
+    for offset in range(start, start + count, INSERT_BATCH):
+        rows = [{
+            "id": "history-%d" % i,
+            "next_run_time": base + timedelta(seconds=i),
+            "plan_id": plan_id,
+            "job_state": b"",
+            "executed": True
+        } for i in range(offset, min(offset + INSERT_BATCH, start + count))]
+        db.session.execute(executor_table.insert(), rows)
+    db.session.commit()
+
+
+def time_wakeup(store, now):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        store.get_due_jobs(now)
+        store.get_next_run_time()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def use_single_column_index(db, single_column):
+    if single_column:
+        db.session.execute("DROP INDEX IF EXISTS ix_cme_executors_executed_next_run_time_id")
+        db.session.execute("CREATE INDEX IF NOT EXISTS ix_bench_next_run_time ON cme_executors (next_run_time)")
+    else:
+        db.session.execute("DROP INDEX IF EXISTS ix_bench_next_run_time")
+        db.session.execute("CREATE INDEX IF NOT EXISTS ix_cme_executors_executed_next_run_time_id "
+                           "ON cme_executors (executed, next_run_time, id)")
+    db.session.execute("ANALYZE")
+    db.session.commit()
+
+
+def main(max_history):
+    from chaosmonkey.dal.database import db
+    from chaosmonkey.dal.executor_model import Executor
+    from chaosmonkey.dal.cme_sqlalchemy_store import CMESQLAlchemyStore
+
+    manager, database_uri = configure_benchmark_engine()
+    print("database: %s" % database_uri)
+    store = manager.sql_store
+
+    plan = manager.add_plan("wakeup")
+    run_time = datetime.now() + timedelta(days=1)
+    manager.add_executors([(run_time + timedelta(seconds=i), "pending-%d" % i, {}, plan.id) for i in range(PENDING)])
+    now = manager.scheduler.timezone.localize(datetime.now())
+    cached_store = CMESQLAlchemyStore(cache_jobs=True)
+    cached_store.start(manager.scheduler, "cached")
+
+    sizes = [0] + [size for size in (10000, 100000, 1000000, 10000000) if size < max_history] + [max_history]
+    rows = []
+    inserted = 0
+    for size in sizes:
+        insert_history(db, Executor.__table__, plan.id, inserted, size - inserted)
+        inserted = size
+
+        use_single_column_index(db, True)
+        single_column = time_wakeup(store, now)
+        use_single_column_index(db, False)
+        composite = time_wakeup(store, now)
+        cached = time_wakeup(cached_store, now)
+        rows.append((size, "%.3f" % single_column, "%.3f" % composite, "%.3f" % cached))
+
+    print_table(("executed executors", "next_run_time index (ms)", "(executed, next_run_time) index (ms)",
+                 "cached store (ms)"), rows)
+
+    for statement in ("SELECT next_run_time FROM cme_executors WHERE executed = 0 AND next_run_time IS NOT NULL "
+                      "ORDER BY next_run_time LIMIT 1",
+                      "SELECT * FROM cme_executors WHERE executed = 0 AND next_run_time <= '2020-01-01' "
+                      "ORDER BY next_run_time"):
+        plan_rows = db.session.execute("EXPLAIN QUERY PLAN " + statement).fetchall()
+        print("\n%s\n  -> %s" % (statement, "; ".join(str(row[-1]) for row in plan_rows)))
+
+    manager.scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
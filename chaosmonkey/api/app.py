@@ -1,12 +1,19 @@
 import logging
+import time
 from flask_cors import CORS
-from flask import Flask, json
+from flask import Flask, g, json, request
 from chaosmonkey.api.hal import HAL, HALResponse
-from chaosmonkey.api.attacks_blueprint import attacks
+from chaosmonkey.api.attacks_blueprint import attacks, attack_list_document
+from chaosmonkey.api.events_blueprint import events
 from chaosmonkey.api.executors_blueprint import executors
-from chaosmonkey.api.planners_blueprint import planners
+from chaosmonkey.api.metrics_blueprint import metrics
+from chaosmonkey.api.planners_blueprint import planners, planner_list_document
 from chaosmonkey.api.plans_blueprint import plans
+from chaosmonkey.api.retention_blueprint import retention
 from chaosmonkey.api.api_errors import APIError
+from chaosmonkey.api.response_cache import precompute_document
+from chaosmonkey.engine.cme_manager import manager
+from chaosmonkey.engine.metrics import metrics as engine_metrics
 
 log = logging.getLogger(__name__)
 
@@ -22,6 +29,29 @@ flask_app.register_blueprint(executors, url_prefix=prev1 + "/executors")
 flask_app.register_blueprint(plans, url_prefix=prev1 + "/plans")
 flask_app.register_blueprint(attacks, url_prefix=prev1 + "/attacks")
 flask_app.register_blueprint(planners, url_prefix=prev1 + "/planners")
+flask_app.register_blueprint(retention, url_prefix=prev1 + "/retention")
+flask_app.register_blueprint(events, url_prefix=prev1 + "/events")
+flask_app.register_blueprint(metrics, url_prefix="/metrics")
+
+
+# Measure the latency of the requests by route
+@flask_app.before_request
+def start_request_timer():
+    g.request_started = time.time()
+
+
+@flask_app.after_request
+def observe_request_duration(response):
+    """
+    Observe the latency of the request in the requests histogram of :meth:`chaosmonkey.engine.metrics`.
+    Requests that do not match a route are observed together.
+    """
+    started = getattr(g, "request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        engine_metrics.request_duration.observe(time.time() - started, route, request.method,
+                                                str(response.status_code))
+    return response
 
 
 # Register error handler for custom APIError exception
@@ -34,3 +64,17 @@ def handle_invalid_usage(error):
     response = json.jsonify(error.to_dict())
     response.status_code = error.status_code
     return response
+
+
+def precompute_documents():
+    """
+    Serialize the attacks and planners lists in the response cache (see
+    :meth:`chaosmonkey.api.response_cache`), so the first requests after the engine starts
+    or the modules are reloaded do not build them.
+    """
+    started = time.time()
+    precompute_document(flask_app, "attacks.list_attacks", "attacks", manager.attacks_store.generation,
+                        attack_list_document)
+    precompute_document(flask_app, "planners.list_planners", "planners", manager.planners_store.generation,
+                        planner_list_document)
+    log.debug('attacks and planners lists serialized in %.3fs', time.time() - started)
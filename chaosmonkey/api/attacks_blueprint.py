@@ -9,10 +9,15 @@ Each attack has three main properties represented in the API:
 2. **ref**: its unique identifier. module_name:AttackClass
 3. **schema**: json schema that validates the json representation for the attack
 
+The list of attacks only changes when the attacks modules are loaded, it is served with an ETag and
+requests with a matching ``If-None-Match`` header get a 304 Not Modified response.
+
 """
 from flask import Blueprint
 from chaosmonkey.api.hal import Document
+from chaosmonkey.api.response_cache import cached_document
 from chaosmonkey.engine.cme_manager import manager
+from chaosmonkey.engine.admission import admission
 
 attacks = Blueprint("attacks", __name__)
 
@@ -80,5 +85,67 @@ def list_attacks():
 
     :return: :meth:`chaosmonkey.api.hal.document`
     """
-    attack_list = manager.get_attack_list()
-    return Document(data={"attacks": attack_list})
+    return cached_document("attacks", manager.attacks_store.generation, attack_list_document)
+
+
+def attack_list_document():
+    """
+    Build the document of :meth:`list_attacks`
+
+    :return: :meth:`chaosmonkey.api.hal.document`
+    """
+    return Document(data={"attacks": manager.get_attack_list()})
+
+
+@attacks.route("/admission/", methods=["GET"])
+def get_admission():
+    """
+    Return the concurrency limits of the attacks and the admission stats of every
+    limited key, to size the limits (see :meth:`chaosmonkey.engine.admission`).
+
+    Keys are the attack ref for the per attack limits and ``ref@target`` for the per
+    target limits. Wait times are in seconds.
+
+    Example::
+
+        {
+            "attack_limits": {
+                "terminate_ec2_instance:TerminateEC2Instance": 2
+            },
+            "target_limit": 1,
+            "keys": [
+                {
+                    "key": "terminate_ec2_instance:TerminateEC2Instance",
+                    "limit": 2,
+                    "running": 1,
+                    "queued": 0,
+                    "max_queued": 3,
+                    "admitted": 12,
+                    "mean_wait": 0.734,
+                    "max_wait": 4.112
+                },
+                {
+                    "key": "terminate_ec2_instance:TerminateEC2Instance@{\"region\":\"eu-west-1\"}",
+                    "limit": 1,
+                    "running": 1,
+                    "queued": 0,
+                    "max_queued": 2,
+                    "admitted": 8,
+                    "mean_wait": 0.551,
+                    "max_wait": 2.054
+                }
+            ],
+            "_links": {
+                "self": {
+                    "href": "/api/1/attacks/admission/"
+                }
+            }
+        }
+
+    :return: :meth:`chaosmonkey.api.hal.document`
+    """
+    return Document(data={
+        "attack_limits": admission.attack_limits,
+        "target_limit": admission.target_limit,
+        "keys": admission.stats()
+    })
@@ -0,0 +1,113 @@
+"""
+**Base path**: /api/1/events
+
+`Server-Sent Events <https://html.spec.whatwg.org/multipage/server-sent-events.html>`_ stream
+of the changes of the executors and plans, so clients do not have to poll the executors and
+plans lists to know when an attack has been executed or a plan has finished.
+
+Every event has an id, a type (see :meth:`chaosmonkey.dal.events`) and a json object with the
+ids of the executor and plan and the changed values::
+
+    id: 5c1d0b8a9e2f-1042
+    event: execution_recorded
+    data: {"id": "3b373155577b4d1bbc62216ffea013a4", "plan_id": "3ec72048cab04b76bdf2cfd4bc81cd1e",
+           "outcome": "success", "error": null}
+
+A client that reconnects with the ``Last-Event-ID`` header (sent by the browsers EventSource)
+receives the events it has missed. If they are no longer kept by the engine, or the engine has
+been restarted, the stream starts with a ``reset`` event: the client must read the executors
+and plans again.
+
+"""
+import gevent
+from flask import Blueprint, Response, json, request
+from chaosmonkey.engine.cme_manager import manager
+
+events = Blueprint("events", __name__)
+
+POLL_INTERVAL = 0.2  #: seconds between reads of the events buffer while there are no events
+HEARTBEAT_INTERVAL = 15  #: seconds without events before sending a comment to keep the connection open
+RETRY_MS = 3000  #: reconnection time for the clients
+RESET_EVENT = "reset"
+
+
+@events.route("/", methods=["GET"])
+def get_events():
+    """
+    Stream the changes of the executors and plans as Server-Sent Events
+
+    Example request::
+
+        GET /api/1/events/?plan_id=3ec72048cab04b76bdf2cfd4bc81cd1e
+        Accept: text/event-stream
+        Last-Event-ID: 5c1d0b8a9e2f-1041
+
+    :param: plan_id. Only the events of the plan and its executors
+    :param: last_event_id. Same as the ``Last-Event-ID`` header, for clients that can not set headers
+
+    :return: text/event-stream response
+    """
+    bus = manager.events
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    plan_id = request.args.get("plan_id") or None
+
+    seq = bus.last_seq
+    reset = False
+    if last_event_id:
+        last_seq = bus.parse_id(last_event_id)
+        if last_seq is None or last_seq > seq:
+            reset = True
+        else:
+            seq = last_seq
+
+    return Response(event_stream(bus, seq, plan_id, reset), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+def event_stream(bus, seq, plan_id=None, reset=False):
+    """
+    Generator of the events published after a sequence number, formatted as Server-Sent Events.
+
+    It never ends: while there are no events it sleeps with gevent, so the server keeps
+    serving other requests, and sends a comment every HEARTBEAT_INTERVAL seconds.
+
+    :param bus:     chaosmonkey.dal.events.EventBus
+    :param seq:     sequence number of the last event sent to the client
+    :param plan_id: only send the events of a plan
+    :param reset:   start with a reset event
+    """
+    yield "retry: %d\n\n" % RETRY_MS
+    if reset:
+        yield format_event("%s-%d" % (bus.epoch, seq), RESET_EVENT, {})
+
+    idle = 0
+    while True:
+        batch, missed = bus.since(seq)
+        if missed:
+            # continue from the first event kept, a client that reconnects with the id of
+            # the reset event gets the events after it instead of another reset
+            seq = batch[0].seq - 1 if batch else bus.last_seq
+            yield format_event("%s-%d" % (bus.epoch, seq), RESET_EVENT, {})
+        if batch:
+            seq = batch[-1].seq
+            chunk = "".join(format_event(event.id, event.type, event.data) for event in batch
+                            if plan_id is None or (event.data.get("plan_id") or event.data.get("id")) == plan_id)
+            if chunk:
+                idle = 0
+                yield chunk
+                continue
+
+        gevent.sleep(POLL_INTERVAL)
+        idle += POLL_INTERVAL
+        if idle >= HEARTBEAT_INTERVAL:
+            idle = 0
+            yield ":\n\n"
+
+
+def format_event(event_id, event_type, data):
+    """
+    Return an event in the Server-Sent Events format
+    """
+    return "id: %s\nevent: %s\ndata: %s\n\n" % (event_id, event_type, json.dumps(data))
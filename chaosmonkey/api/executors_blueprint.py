@@ -21,17 +21,36 @@ Example::
         "executed": false
     }
 
+Executed executors are kept in the execution history, with the result of the attack::
+
+    {
+        "id": "3b373155577b4d1bbc62216ffea013a4",
+        "plan_id": "3ec72048cab04b76bdf2cfd4bc81cd1e",
+        "next_run_time": "2017-01-25T10:12:1485339145",
+        "executed": true,
+        "started": "2017-01-25T10:12:1485339145",
+        "finished": "2017-01-25T10:12:1485339147",
+        "duration": 2.13,
+        "outcome": "success",
+        "error": null
+    }
+
+The outcome is one of submitted, success, error or missed.
+
 """
+from datetime import timedelta
+
 import arrow
 from apscheduler.jobstores.base import JobLookupError
 from apscheduler.triggers.date import DateTrigger
 from flask import Blueprint, json, request
-from chaosmonkey.api.hal import Document
+from chaosmonkey.api.hal import Document, StreamingDocument
 
 from chaosmonkey.api.api_errors import APIError
 from chaosmonkey.api.request_validator import validate_payload
+from chaosmonkey.api.response_cache import conditional_document
 from chaosmonkey.engine.cme_manager import manager
-from chaosmonkey.api.utils import get_boolean
+from chaosmonkey.api.utils import get_boolean, get_limit, get_datetime, decode_cursor, paginate
 
 executors = Blueprint("executors", __name__)
 
@@ -51,6 +70,29 @@ executor_trigger_schema = {
 }
 
 
+executors_bulk_schema = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["reschedule", "shift", "delete"]},
+        "executors": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+        "filter": {
+            "type": "object",
+            "properties": {
+                "plan_id": {"type": "string"},
+                "attack_ref": {"type": "string"},
+                "from": {"type": "string"},
+                "to": {"type": "string"}
+            },
+            "additionalProperties": False,
+            "minProperties": 1
+        },
+        "date": {"type": "string"},
+        "seconds": {"type": "number"}
+    },
+    "required": ["action"]
+}
+
+
 @executors.route("/", methods=["GET"])
 def get_executors():
     """
@@ -80,14 +122,56 @@ def get_executors():
             ]
         }
 
-    :param: executed. Control when to show all executors (true) or only not executed (false). Defaults to false
+    The executors are ordered by next_run_time. The list can be filtered and paginated,
+    when there are more executors than the limit the response has a ``next`` link to the
+    next page::
+
+        GET /api/1/executors/?limit=100&plan_id=3ec72048cab04b76bdf2cfd4bc81cd1e&from=2017-01-25T00:00
+
+        "_links": {
+            "next": {
+                "href": "/api/1/executors/?after=MjAxNy0wMS0yNS...&limit=100&plan_id=..."
+            }
+        }
+
+    The response has an ETag with the change version of the store (or of the plan when the
+    list is filtered by plan_id) and a hash of the query string. Requests with the ETag in
+    ``If-None-Match`` get a 304 Not Modified while the executors do not change.
+
+    :param: executed. Control when to show the executed executors from the execution history (true)
+            or the pending executors (false). Defaults to false
+    :param: limit. Max number of executors in the page (1 to 1000). Defaults to all the executors
+    :param: after. Cursor of the page, given by the ``next`` link
+    :param: plan_id. Only the executors of the plan
+    :param: from. Only the executors with next_run_time from the date (UTC if the date has no timezone)
+    :param: to. Only the executors with next_run_time before the date (UTC if the date has no timezone)
+    :param: attack_ref. Only the executors of the attack ref
 
     :return: :meth:`chaosmonkey.api.hal.document`
     """
     executed_query = request.args.get("executed", False)
     executed = get_boolean(executed_query)
-    executors_list = [executor.to_dict() for executor in manager.get_executors(executed=executed)]
-    return Document(embedded={"executors": executors_list})
+    timezone = manager.scheduler.timezone
+    limit = get_limit(request.args.get("limit"))
+    filters = {
+        "after": decode_cursor(request.args.get("after")),
+        "plan_id": request.args.get("plan_id") or None,
+        "run_from": get_datetime(request.args.get("from"), timezone),
+        "run_to": get_datetime(request.args.get("to"), timezone),
+        "attack_ref": request.args.get("attack_ref") or None
+    }
+
+    def build():
+        executors_list = manager.get_executors(executed=executed, limit=limit + 1 if limit else None,
+                                               stream=limit is None, **filters)
+        if limit is None:
+            # the whole list is serialized while it is read from the db
+            return StreamingDocument("executors", executors_list)
+        executors_list, links = paginate(executors_list, limit,
+                                         lambda executor: (executor.next_run_time, executor.id))
+        return Document(embedded={"executors": [executor.to_dict() for executor in executors_list]}, links=links)
+
+    return conditional_document(manager.get_change_version(filters["plan_id"]), build)
 
 
 @executors.route("/<string:executor_id>", methods=['PUT'])
@@ -161,6 +245,95 @@ def delete_executor(executor_id):
         "msg": "Executor %s succesfully deleted" % executor_id
     })
 
+
+@executors.route("/bulk", methods=['POST'])
+def bulk_executors():
+    """
+    Reschedule, shift or delete many executors at once, in a single transaction.
+    The scheduler is woken up only once.
+
+    The executors are given by a list of ids or by a filter of the pending executors
+    (plan_id, attack_ref, from and to, as in :meth:`get_executors`). The actions are:
+
+    * **reschedule**: move the executors to a date
+    * **shift**: move the executors a number of seconds (negative to bring them forward)
+    * **delete**: delete the executors. Executors given by id can be in the execution history
+
+    Example request::
+
+        POST /api/1/executors/bulk
+        Body:
+            {
+              "action": "shift",
+              "filter": {
+                "plan_id": "3ec72048cab04b76bdf2cfd4bc81cd1e",
+                "from": "2017-10-23T14:00",
+                "to": "2017-10-23T19:00"
+              },
+              "seconds": 3600
+            }
+
+    Example response::
+
+        {
+          "action": "shift",
+          "count": 2,
+          "executors": ["3b373155577b4d1bbc62216ffea013a4", "6890192d8b6c40e5af16f13aa036c7dc"],
+          "not_found": [],
+          "_links": {
+            "self": {
+              "href": "/api/1/executors/bulk"
+            }
+          }
+        }
+
+    :return: :meth:`chaosmonkey.api.hal.document`
+    """
+    assert validate_payload(request, executors_bulk_schema)
+    body = request.get_json()
+    action = body["action"]
+
+    if ("executors" in body) == ("filter" in body):
+        raise APIError("Invalid executors, use a list of executors or a filter")
+    if action == "reschedule" and "date" not in body:
+        raise APIError("Missing date to reschedule the executors")
+    if action == "shift" and "seconds" not in body:
+        raise APIError("Missing seconds to shift the executors")
+
+    if "executors" in body:
+        executor_ids = body["executors"]
+    else:
+        timezone = manager.scheduler.timezone
+        executor_ids = manager.get_executor_ids(
+            plan_id=body["filter"].get("plan_id"),
+            attack_ref=body["filter"].get("attack_ref"),
+            run_from=get_datetime(body["filter"].get("from"), timezone),
+            run_to=get_datetime(body["filter"].get("to"), timezone))
+
+    if action == "delete":
+        changed, not_found = manager.remove_executors(executor_ids)
+    else:
+        if action == "reschedule":
+            trigger = dict_to_trigger({"type": "date", "args": {"date": body["date"]}})
+
+            def trigger_for(_):
+                return trigger
+        else:
+            delta = timedelta(seconds=body["seconds"])
+
+            def trigger_for(job):
+                return DateTrigger(run_date=job.next_run_time + delta)
+
+        executors_list, not_found = manager.reschedule_executors(executor_ids, trigger_for)
+        changed = [executor.id for executor in executors_list]
+
+    return Document(data={
+        "action": action,
+        "count": len(changed),
+        "executors": changed,
+        "not_found": not_found
+    })
+
 ########
 # UTILS
 #######
@@ -1,5 +1,5 @@
 from flask import Response
-from flask import current_app, request
+from flask import current_app, request, stream_with_context
 import json
 
 """
@@ -329,6 +329,74 @@ class Document(BaseDocument):
         self.links.append(Self(external=external_self))
 
 
+_STREAM_PLACEHOLDER = '\x00stream\x00'
+
+
+class StreamingDocument(Document):
+    """Constructs a ``HAL`` document with a list that is serialized item by item
+    while the response is sent, so the list never has to be in memory. Used for
+    the lists that can be very large (eg. the executors read from a db cursor).
+
+    Example:
+        >>> document = StreamingDocument('executors', query.yield_per(100))
+        >>> ''.join(document.iter_json())
+        ... '{"_links": {"self": {"href": "/executors/"}}, "_embedded": {"executors": [...]}}'
+    """
+
+    #: number of items serialized in every chunk of the response
+    chunk_size = 100
+
+    def __init__(self, name, items, data=None, links=None, embedded=None, embed=True):
+        """Initialises a new ``HAL`` StreamingDocument instance.
+
+        Args:
+            name (str): key of the list
+            items (iterable): items of the list, ``BaseDocument`` instances, objects with
+                a ``to_dict`` method or plain json values
+
+        Keyword Args:
+            data (dict): Data for the document
+            links (chaosmonkey.api.hal.link.Collection): A collection of ``HAL`` links
+            embedded: TBC
+            embed (bool): put the list in ``_embedded`` (True) or in the document data (False)
+        """
+        super(StreamingDocument, self).__init__(data, links, embedded)
+        self.name = name
+        self.items = items
+        self.embed = embed
+
+    def iter_json(self):
+        """Generates the ``JSON`` document in chunks. The items are only read from
+        the iterable while the chunks are consumed.
+
+        Returns:
+            generator of str
+        """
+        document = self.to_dict()
+        container = document.setdefault('_embedded', {}) if self.embed else document
+        # the list is serialized as a placeholder that splits the rest of the document
+        container[self.name] = _STREAM_PLACEHOLDER
+        head, tail = json.dumps(document).split(json.dumps(_STREAM_PLACEHOLDER), 1)
+        yield head + '['
+
+        chunk = []
+        first = True
+        for item in self.items:
+            if hasattr(item, 'to_dict'):
+                item = item.to_dict()
+            chunk.append(json.dumps(item))
+            if len(chunk) >= self.chunk_size:
+                yield ('' if first else ', ') + ', '.join(chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield ('' if first else ', ') + ', '.join(chunk)
+        yield ']' + tail
+
+    def to_json(self):
+        return ''.join(self.iter_json())
+
+
 class Embedded(BaseDocument):
     """Constructs a ``HAL`` embedded.
 
@@ -466,6 +534,13 @@ class HALResponse(Response):
             flask.wrappers.Response: A standard Flask response
         """
 
+        if isinstance(rv, StreamingDocument):
+            return Response(
+                stream_with_context(rv.iter_json()),
+                headers={
+                    'Content-Type': 'application/hal+json'
+                })
+
         if isinstance(rv, Document):
             return Response(
                 rv.to_json(),
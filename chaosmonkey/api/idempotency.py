@@ -0,0 +1,79 @@
+"""
+``Idempotency-Key`` header for the endpoints that create data (eg. the plans), so a client
+that retries a request after a timeout does not create it twice.
+
+The endpoints decorated with :meth:`idempotent` claim the key of the request before running,
+and store their response when it is successful (2xx). A request retried with the same key
+gets the stored response with an ``Idempotent-Replayed: true`` header, without running the
+endpoint again. See :meth:`chaosmonkey.engine.idempotency` for the conflicts and the TTL of
+the keys.
+
+Requests without the header are not affected.
+"""
+import hashlib
+from functools import wraps
+from flask import Response, current_app, request
+from chaosmonkey.api.api_errors import APIError
+from chaosmonkey.engine.idempotency import idempotency_keys
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+#: headers of the response stored with the key
+STORED_HEADERS = ("Content-Type", "Location")
+
+
+def idempotent(view):
+    """
+    Decorator for the endpoints that honor the ``Idempotency-Key`` header
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise APIError("invalid %s, it must have 1 to %d characters" % (IDEMPOTENCY_HEADER, MAX_KEY_LENGTH))
+
+        fingerprint = request_fingerprint()
+        existing = idempotency_keys.claim(key, fingerprint)
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                raise APIError("%s %s already used by a different request" % (IDEMPOTENCY_HEADER, key), 422)
+            if existing.in_progress:
+                raise APIError("a request with the %s %s is in progress" % (IDEMPOTENCY_HEADER, key), 409)
+            return replayed_response(existing)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency_keys.release(key)
+            raise
+
+        if 200 <= response.status_code < 300 and not response.is_streamed:
+            headers = dict((name, response.headers[name]) for name in STORED_HEADERS if name in response.headers)
+            idempotency_keys.complete(key, response.status_code, headers, response.get_data(as_text=True))
+        else:
+            idempotency_keys.release(key)
+        return response
+    return wrapper
+
+
+def request_fingerprint():
+    """
+    Return the sha256 of the method, url and body of the current request
+    """
+    digest = hashlib.sha256()
+    digest.update(("%s %s\n" % (request.method, request.full_path)).encode("utf-8"))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def replayed_response(idempotency_key):
+    """
+    Return the stored response of an idempotency key
+    """
+    response = Response(idempotency_key.body, status=idempotency_key.status_code,
+                        headers=idempotency_key.response_headers)
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
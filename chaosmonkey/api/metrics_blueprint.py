@@ -0,0 +1,43 @@
+"""
+**Base path**: /metrics
+
+Metrics of the engine in the
+`Prometheus text format <https://prometheus.io/docs/instrumenting/exposition_formats/>`_,
+to be scraped by a Prometheus server. See :meth:`chaosmonkey.engine.metrics` for the
+list of metrics.
+
+"""
+from flask import Blueprint, Response
+from chaosmonkey.engine.metrics import metrics as engine_metrics, CONTENT_TYPE
+
+metrics = Blueprint("metrics", __name__)
+
+
+@metrics.route("", methods=["GET"])
+def get_metrics():
+    """
+    Return the metrics of the engine
+
+    Example request::
+
+        GET /metrics
+
+    Example response:
+
+    .. code-block:: text
+
+        # HELP cme_http_request_duration_seconds Latency of the API requests
+        # TYPE cme_http_request_duration_seconds histogram
+        cme_http_request_duration_seconds_bucket{route="/api/1/plans/",method="GET",status="200",le="0.005"} 12
+        ...
+        cme_http_request_duration_seconds_bucket{route="/api/1/plans/",method="GET",status="200",le="+Inf"} 14
+        cme_http_request_duration_seconds_sum{route="/api/1/plans/",method="GET",status="200"} 0.0612
+        cme_http_request_duration_seconds_count{route="/api/1/plans/",method="GET",status="200"} 14
+        ...
+        # HELP cme_pending_executors Executors not executed yet
+        # TYPE cme_pending_executors gauge
+        cme_pending_executors 31
+
+    :return: text/plain response
+    """
+    return Response(engine_metrics.render(), content_type=CONTENT_TYPE)
@@ -10,9 +10,13 @@ Planners has three main properties represented in the API:
 2. **ref**: its unique identifier. module_name:PlannerClass
 3. **schema**: json schema that validates the planner
 
+The list of planners only changes when the planners modules are loaded, it is served with an ETag and
+requests with a matching ``If-None-Match`` header get a 304 Not Modified response.
+
 """
 from flask import Blueprint
 from chaosmonkey.api.hal import Document
+from chaosmonkey.api.response_cache import cached_document
 from chaosmonkey.engine.cme_manager import manager
 
 planners = Blueprint("planners", __name__)
@@ -70,5 +74,13 @@ def list_planners():
 
     :return: :meth:`chaosmonkey.api.hal.document`
     """
-    planners_list = manager.get_planner_list()
-    return Document(data={"planners": planners_list})
+    return cached_document("planners", manager.planners_store.generation, planner_list_document)
+
+
+def planner_list_document():
+    """
+    Build the document of :meth:`list_planners`
+
+    :return: :meth:`chaosmonkey.api.hal.document`
+    """
+    return Document(data={"planners": manager.get_planner_list()})
@@ -16,15 +16,22 @@ Plans has the following properties
 * **executed**: if all the executors in the plan has been executed
 
 """
-from flask import Blueprint, json, request
-from chaosmonkey.api.hal import Document
-from chaosmonkey.api.request_validator import validate_payload
+from flask import Blueprint, json, request, url_for
+from jsonschema import ValidationError
+from chaosmonkey.api.api_errors import APIError
+from chaosmonkey.api.hal import Document, StreamingDocument, Link
+from chaosmonkey.api.idempotency import idempotent
+from chaosmonkey.api.request_validator import validate_payload, validators
+from chaosmonkey.api.response_cache import conditional_document
 from chaosmonkey.engine.cme_manager import manager
-from chaosmonkey.api.utils import get_boolean
+from chaosmonkey.engine.plan_tasks import plan_tasks
+from chaosmonkey.api.utils import get_boolean, get_limit, decode_cursor, paginate
 
 
 plans = Blueprint("plans", __name__)
 
+MAX_BATCH_SIZE = 500  #: max number of plans in a batch
+
 plan_schema = {
     "type": "object",
     "properties": {
@@ -49,8 +56,16 @@ plan_schema = {
     "required": ["name", "attack", "planner"]
 }
 
+plans_batch_schema = {
+    "type": "array",
+    "items": {"type": "object"},
+    "minItems": 1,
+    "maxItems": MAX_BATCH_SIZE
+}
+
 
 @plans.route("/", methods=["POST"])
+@idempotent
 def add_plan():
     """
     Add a plan.
@@ -80,6 +95,29 @@ def add_plan():
                 }
             }
 
+    With ``async=true`` the plan is validated and the request returns a 202 Accepted right away,
+    while the planner runs in a background worker. The ``Location`` header is the url of the
+    task, with the status of the plan creation (see :meth:`get_plan_task`)::
+
+        POST /api/1/plans/?async=true
+
+        HTTP/1.1 202 Accepted
+        Location: /api/1/plans/tasks/0d9e83b1a4f44f7c9a3f0c6f4b0f3c1e
+
+        {
+            "id": "0d9e83b1a4f44f7c9a3f0c6f4b0f3c1e",
+            "name": "Terminate instances in Playground",
+            "status": "pending",
+            ...
+        }
+
+    Requests with an ``Idempotency-Key`` header are only executed once: a retry with the
+    same key gets the response of the first request (see :meth:`chaosmonkey.api.idempotency`)::
+
+        POST /api/1/plans/
+        Idempotency-Key: 5f1c9a8e-ci-job-4312
+
+    :param: async. Create the plan in the background. Defaults to false
     """
     assert validate_payload(request, plan_schema)
     req_json = request.get_json()
@@ -88,11 +126,127 @@ def add_plan():
     planner_config = req_json["planner"]
     attack_config = req_json["attack"]
 
+    if get_boolean(request.args.get("async", False)):
+        task = plan_tasks.submit(name, planner_config, attack_config)
+        location = url_for("plans.get_plan_task", task_id=task.id)
+        return Document(data=task_dict(task), links=[Link("status", location)]), 202, {"Location": location}
+
     manager.execute_plan(name, planner_config, attack_config)
 
     return json.jsonify({"msg": "ok"})
 
 
+@plans.route("/tasks/<string:task_id>", methods=["GET"])
+def get_plan_task(task_id):
+    """
+    Get the status of a plan created with ``async=true``. The status is one of
+    pending, running, succeeded or failed. Once succeeded the task has the ids of the
+    plans created by the planner, with links to them, and the number of executors.
+    If the planner failed nothing is stored and the task has the error.
+
+    Finished tasks are kept in memory until there are too many of them, and are lost
+    on restart.
+
+    Example response::
+
+        {
+            "id": "0d9e83b1a4f44f7c9a3f0c6f4b0f3c1e",
+            "name": "Terminate instances in Playground",
+            "status": "succeeded",
+            "created": "2017-01-25T10:12:25.412312+01:00",
+            "started": "2017-01-25T10:12:25.413001+01:00",
+            "finished": "2017-01-25T10:12:27.803127+01:00",
+            "plans": ["3ec72048cab04b76bdf2cfd4bc81cd1e"],
+            "executors": 4000,
+            "error": null,
+            "_links": {
+                "self": {
+                    "href": "/api/1/plans/tasks/0d9e83b1a4f44f7c9a3f0c6f4b0f3c1e"
+                },
+                "plan": {
+                    "href": "/api/1/plans/3ec72048cab04b76bdf2cfd4bc81cd1e"
+                }
+            }
+        }
+
+    :return: :meth:`chaosmonkey.api.hal.document`
+    """
+    task = plan_tasks.get(task_id)
+    if task is None:
+        raise APIError("plan task not found %s" % task_id, 404)
+    links = [Link("plan", url_for("plans.get_plan", plan_id=plan_id)) for plan_id in task.plans]
+    return Document(data=task_dict(task), links=links)
+
+
+@plans.route("/batch", methods=["POST"])
+@idempotent
+def add_plans():
+    """
+    Add a list of plans at once. The body is a list of plans as in :meth:`add_plan`.
+
+    All the plans are validated before running any planner, and all the plans and
+    executors are stored in a single transaction: if a plan is invalid or its planner
+    fails, no plan is created and the response has the errors of each plan by its
+    index in the list.
+
+    The batch honors the ``Idempotency-Key`` header as :meth:`add_plan`.
+
+    Example request::
+
+        POST /api/1/plans/batch
+        Body:
+            [
+                {
+                    "name": "Terminate instances in Playground",
+                    "attack": {...},
+                    "planner": {...}
+                },
+                {
+                    "name": "Terminate instances in Sandbox",
+                    "attack": {...},
+                    "planner": {...}
+                }
+            ]
+
+    Example response::
+
+        {
+            "msg": "ok",
+            "plans": [
+                {"index": 0, "plans": ["6890192d8b6c40e5af16f13aa036c7dc"], "executors": 4},
+                {"index": 1, "plans": ["3ec72048cab04b76bdf2cfd4bc81cd1e"], "executors": 4}
+            ]
+        }
+
+    Example error response (400)::
+
+        {
+            "msg": "invalid plans",
+            "errors": [
+                {"index": 1, "msg": "invalid payload 'name' is a required property"}
+            ]
+        }
+
+    """
+    assert validate_payload(request, plans_batch_schema)
+    req_json = request.get_json()
+
+    # validate every plan with the cached validator, to report the errors of all of them
+    errors = []
+    for index, plan_json in enumerate(req_json):
+        try:
+            validators.validate(plan_json, plan_schema)
+        except ValidationError as e:
+            errors.append({"index": index, "msg": "invalid payload %s" % e.message})
+    if errors:
+        raise APIError("invalid plans", payload={"errors": errors})
+
+    results = manager.execute_plans([(plan_json["name"], plan_json["planner"], plan_json["attack"])
+                                     for plan_json in req_json])
+
+    return json.jsonify({"msg": "ok", "plans": results})
+
+
 @plans.route("/", methods=["GET"])
 def list_plans():
     """
@@ -132,14 +286,34 @@ def list_plans():
             ]
         }
 
+    The response has an ETag with the change version of the store and a hash of the query
+    string. Requests with the ETag in ``If-None-Match`` get a 304 Not Modified while nothing
+    changes.
+
+    The plans are ordered by creation date. With a limit, when there are more plans the
+    response has a ``next`` link to the next page (``GET /api/1/plans/?limit=50``)
+
     :param: all. Control when to show all plans (true) or only not executed (false). Defaults to false
+    :param: limit. Max number of plans in the page (1 to 1000). Defaults to all the plans
+    :param: after. Cursor of the page, given by the ``next`` link
 
     :return: :meth:`chaosmonkey.api.hal.document`
     """
     show_all_query = request.args.get("all", False)
     show_all = get_boolean(show_all_query)
-    plan_list = [plan.to_dict() for plan in manager.get_plans(show_all=show_all)]
-    return Document(data={"plans": plan_list})
+    limit = get_limit(request.args.get("limit"))
+    after = decode_cursor(request.args.get("after"))
+
+    def build():
+        plan_list = manager.get_plans(show_all=show_all, limit=limit + 1 if limit else None, after=after,
+                                      stream=limit is None)
+        if limit is None:
+            # the whole list is serialized while it is read from the db
+            return StreamingDocument("plans", plan_list, embed=False)
+        plan_list, links = paginate(plan_list, limit, lambda plan: (plan.created, plan.id))
+        return Document(data={"plans": [plan.to_dict() for plan in plan_list]}, links=links)
+
+    return conditional_document(manager.get_change_version(), build)
 
 
 @plans.route("/<string:plan_id>", methods=["GET"])
@@ -202,11 +376,17 @@ def get_plan(plan_id):
             }
         }
 
+    The response has an ETag with the change version of the plan. Requests with the ETag in
+    ``If-None-Match`` get a 304 Not Modified while the plan and its executors do not change.
+
     :return: :meth:`chaosmonkey.api.hal.document`
     """
-    plan = manager.get_plan(plan_id)
-    executor_list = [executor.to_dict() for executor in manager.get_executors_for_plan(plan_id)]
-    return Document(data=plan.to_dict(), embedded={"executors": executor_list})
+    def build():
+        plan = manager.get_plan(plan_id)
+        executor_list = [executor.to_dict() for executor in manager.get_executors_for_plan(plan_id)]
+        return Document(data=plan.to_dict(), embedded={"executors": executor_list})
+
+    return conditional_document(manager.get_change_version(plan_id), build)
 
 
 @plans.route("/<string:plan_id>", methods=["DELETE"])
@@ -224,3 +404,14 @@ def delete_plan(plan_id):
     return json.jsonify({
         "msg": "Plan %s successfully deleted" % plan_id
     })
+
+########
+# UTILS
+#######
+
+
+def task_dict(task):
+    """
+    Returns the status of a plan task, with the dates in the scheduler timezone
+    """
+    return task.to_dict(manager.scheduler.timezone)
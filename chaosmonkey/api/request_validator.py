@@ -1,5 +1,77 @@
+"""
+Validation of the API payloads and the attacks and planners configs against their
+json schemas.
+
+The validators are compiled (and their schema checked) once per schema and cached.
+Schemas are identified by the schema object, so the schemas of reloaded modules get
+a new validator, and the cache is cleared when the generation of the module stores
+changes (see :meth:`ValidatorsCache.validate`).
+"""
+import threading
+from jsonschema import validators as jsonschema_validators, ValidationError
 from chaosmonkey.api.api_errors import APIError
-from jsonschema import validate, ValidationError
+
+
+class ValidatorsCache:
+    """
+    Compiled json schema validators
+
+    :param max_size: max number of cached validators, the cache is cleared when it is full
+    """
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._validators = {}
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def get(self, schema, generation=None):
+        """
+        Return the validator of a schema, compiling it if it is not cached
+
+        :param schema:      json schema dict
+        :param generation:  generation of the modules with the schema. The cache is cleared
+                            when it is different from the generation of the previous call
+        :return:            jsonschema validator
+        :raises:            jsonschema.SchemaError if the schema is not valid
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self._validators = {}
+                self._generation = generation
+            cached = self._validators.get(id(schema))
+        # the schema is kept in the cache, so its id is not reused by another schema
+        if cached is not None and cached[0] is schema:
+            return cached[1]
+
+        cls = jsonschema_validators.validator_for(schema)
+        cls.check_schema(schema)
+        validator = cls(schema)
+        with self._lock:
+            if len(self._validators) >= self.max_size:
+                self._validators = {}
+            self._validators[id(schema)] = (schema, validator)
+        return validator
+
+    def validate(self, instance, schema, generation=None):
+        """
+        Validate an instance against a schema, same as ``jsonschema.validate``
+
+        :param instance:    object to validate
+        :param schema:      json schema dict
+        :param generation:  see :meth:`get`
+        :raises:            jsonschema.ValidationError
+        """
+        self.get(schema, generation).validate(instance)
+
+    def clear(self):
+        """
+        Remove all the cached validators
+        """
+        with self._lock:
+            self._validators = {}
+
+
+validators = ValidatorsCache()
 
 
 def validate_payload(request, schema):
@@ -14,7 +86,7 @@ def validate_payload(request, schema):
     """
     try:
         json = request.get_json()
-        validate(json, schema)
+        validators.validate(json, schema)
     except ValidationError as e:
         raise APIError("invalid payload %s" % e.message)
     except Exception:
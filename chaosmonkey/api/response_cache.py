@@ -0,0 +1,141 @@
+"""
+Cache of serialized HAL documents for the endpoints whose data only changes when
+something else changes (eg. the attacks and planners lists, that only change when
+their modules are loaded).
+
+Documents are serialized once per version and url, and served with a strong ETag
+so clients polling the endpoints with ``If-None-Match`` get a 304 Not Modified
+while the version does not change. The documents without query string can be
+serialized before any request with :meth:`precompute_document`.
+
+The endpoints whose data is too big to be cached (eg. plans and executors) use
+:meth:`conditional_document`, with the change version of the store and the query
+string as ETag, so a poll that gets a 304 does not build the document at all.
+"""
+import hashlib
+import threading
+from urllib.parse import urlencode
+from flask import Response, current_app, request, url_for
+
+
+class ResponseCache:
+    """
+    Serialized documents by name, version and url
+
+    :param max_urls: max number of urls cached for a name, the urls of a name are
+                     dropped when it is full (urls can have any query string)
+    """
+    def __init__(self, max_urls=64):
+        self.max_urls = max_urls
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, version, url, build):
+        """
+        Return the serialized document and its ETag, building it if the cached one
+        has another version
+
+        :param name:    name of the document (eg. the endpoint)
+        :param version: version of the data of the document
+        :param url:     path and query string of the request, the document links depend on it
+        :param build:   function that returns the :meth:`chaosmonkey.api.hal.document`
+        :return:        (json string, etag)
+        """
+        with self._lock:
+            entries = self._entries.setdefault(name, {})
+            cached = entries.get(url)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        body = build().to_json()
+        etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+        with self._lock:
+            entries = self._entries.setdefault(name, {})
+            if url not in entries and len(entries) >= self.max_urls:
+                entries.clear()
+            entries[url] = (version, body, etag)
+        return body, etag
+
+    def clear(self):
+        """
+        Remove all the cached documents
+        """
+        with self._lock:
+            self._entries = {}
+
+
+response_cache = ResponseCache()
+
+
+def cached_document(name, version, build):
+    """
+    Return a response with the cached document for the current request, or a 304
+    response if the request ``If-None-Match`` header has its ETag
+
+    :param name:    name of the document (eg. the endpoint)
+    :param version: version of the data of the document
+    :param build:   function that returns the :meth:`chaosmonkey.api.hal.document`
+    :return:        flask.Response
+    """
+    body, etag = response_cache.get(name, version, request.full_path, build)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, headers={'Content-Type': 'application/hal+json'})
+    response.set_etag(etag)
+    return response
+
+
+def precompute_document(app, endpoint, name, version, build):
+    """
+    Serialize the document of an endpoint without query string in the cache, as
+    :meth:`cached_document` does on the first request, so no request has to build it
+
+    :param app:         flask.Flask app with the endpoint
+    :param endpoint:    endpoint of the document (eg. ``attacks.list_attacks``)
+    :param name:        name of the document (eg. the endpoint)
+    :param version:     version of the data of the document
+    :param build:       function that returns the :meth:`chaosmonkey.api.hal.document`
+    """
+    with app.test_request_context():
+        path = url_for(endpoint)
+    with app.test_request_context(path):
+        response_cache.get(name, version, request.full_path, build)
+
+
+def conditional_document(version, build):
+    """
+    Return a 304 response if the request ``If-None-Match`` header has the ETag,
+    otherwise a response with the document built for the request
+
+    The ETag is the version followed by a hash of the normalized query string of the
+    request (see :meth:`query_hash`), so the pages and filters of a list have their
+    own ETags. The version must be read before the data of the document, so the ETag is
+    never newer than the data.
+
+    :param version: change version of the data of the document
+    :param build:   function that returns the :meth:`chaosmonkey.api.hal.document`
+    :return:        flask.Response
+    """
+    query = query_hash()
+    etag = "%s-%s" % (version, query) if query else version
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = current_app.make_response(build())
+    response.set_etag(etag)
+    return response
+
+
+def query_hash():
+    """
+    Return a hash of the query string of the current request, with the args sorted so
+    the same query gives the same hash in any order, or an empty string if the request
+    has no args
+
+    :return: string
+    """
+    if not request.args:
+        return ""
+    query = urlencode(sorted(request.args.items(multi=True)))
+    return hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,90 @@
+"""
+**Base path**: /api/1/retention
+
+The retention deletes periodically the old executions from the history and the executed
+plans without executors left, and returns the free space to the file system.
+It is enabled with the ``--retention-days`` option (see :ref:`usage`).
+
+"""
+from flask import Blueprint, url_for
+from chaosmonkey.api.hal import Document, Link
+from chaosmonkey.api.api_errors import APIError
+from chaosmonkey.engine.retention import retention as cme_retention
+
+retention = Blueprint("retention", __name__)
+
+
+@retention.route("/", methods=["GET"])
+def get_retention():
+    """
+    Return the retention configuration and the report of its last run
+
+    Example response::
+
+        {
+            "_links": {
+                "self": {
+                    "href": "/api/1/retention/"
+                }
+            },
+            "retention_days": 30,
+            "last_run": {
+                "retention_days": 30,
+                "started": "2017-01-26T10:41:12.123456+01:00",
+                "duration": 0.412,
+                "longest_batch": 0.004,
+                "executions_deleted": 1200,
+                "plans_deleted": 40,
+                "bytes_reclaimed": 1163264,
+                "database_size": 4096000,
+                "free_bytes": 0
+            }
+        }
+
+    :return: :meth:`chaosmonkey.api.hal.document`
+    """
+    return Document(data={
+        "retention_days": cme_retention.retention_days,
+        "last_run": cme_retention.last_report
+    })
+
+
+@retention.route("/", methods=["POST"])
+def run_retention():
+    """
+    Schedule a run of the retention right away. The retention runs in the scheduler, the
+    request returns a 202 Accepted with the report of the previous run. The ``Location``
+    header is the url of :meth:`get_retention`, with the report once the run finishes.
+
+    Example request::
+
+        POST /api/1/retention/
+
+    Example response::
+
+        HTTP/1.1 202 Accepted
+        Location: /api/1/retention/
+
+        {
+            "_links": {
+                "self": {
+                    "href": "/api/1/retention/"
+                },
+                "status": {
+                    "href": "/api/1/retention/"
+                }
+            },
+            "retention_days": 30,
+            "last_run": null
+        }
+
+    :return: :meth:`chaosmonkey.api.hal.document`
+    """
+    if cme_retention.retention_days is None:
+        raise APIError("retention is not configured")
+    cme_retention.schedule_run()
+    location = url_for("retention.get_retention")
+    return Document(data={
+        "retention_days": cme_retention.retention_days,
+        "last_run": cme_retention.last_report
+    }, links=[Link("status", location)]), 202, {"Location": location}
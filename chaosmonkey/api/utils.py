@@ -1,6 +1,18 @@
 """
 Utils functions for blueprints methods
 """
+import base64
+import binascii
+from datetime import datetime
+from urllib.parse import urlencode
+
+import arrow
+from flask import request
+from chaosmonkey.api.api_errors import APIError
+from chaosmonkey.api.hal import Link
+
+MAX_PAGE_SIZE = 1000  #: max number of items in a page of a list
+CURSOR_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
 
 
 def get_boolean(value):
@@ -22,3 +34,88 @@ def get_boolean(value):
         return True
 
     return False
+
+
+def get_limit(value, max_limit=MAX_PAGE_SIZE):
+    """
+    to get the page size of a list from the query string
+
+    :param value:       limit query string value
+    :param max_limit:   max page size
+    :return: int or None if the value is empty
+    """
+    if value is None or value == "":
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise APIError("Invalid limit %s" % value)
+    if limit < 1 or limit > max_limit:
+        raise APIError("Invalid limit %s, it must be between 1 and %d" % (value, max_limit))
+    return limit
+
+
+def get_datetime(value, timezone):
+    """
+    to get a date from the query string as a naive datetime in a timezone (the
+    timezone of the scheduler, used to store the executors dates). Dates without
+    timezone are UTC
+
+    :param value:       date in any format supported by arrow
+    :param timezone:    tzinfo of the returned date
+    :return: datetime or None if the value is empty
+    """
+    if not value:
+        return None
+    try:
+        date = arrow.get(value)
+    except (arrow.parser.ParserError, ValueError, TypeError):
+        raise APIError("Invalid date format %s" % value)
+    return date.to(timezone).datetime.replace(tzinfo=None)
+
+
+def encode_cursor(value, item_id):
+    """
+    Encode the keyset of the last item of a page as an opaque cursor. The next page
+    starts after it
+
+    :param value:   datetime the list is ordered by
+    :param item_id: id of the item
+    :return: str
+    """
+    keyset = "%s|%s" % (value.strftime(CURSOR_DATETIME_FORMAT), item_id)
+    return base64.urlsafe_b64encode(keyset.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor encoded with :meth:`encode_cursor`
+
+    :param cursor:  str
+    :return: (datetime, id) or None if the cursor is empty
+    """
+    if not cursor:
+        return None
+    try:
+        value, item_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.strptime(value, CURSOR_DATETIME_FORMAT), item_id
+    except (ValueError, TypeError, binascii.Error):
+        raise APIError("Invalid cursor %s" % cursor)
+
+
+def paginate(items, limit, keyset):
+    """
+    Cut a list read with limit + 1 items to the page size, and return the link to the
+    next page if there are more items. The next link keeps the query string of the request
+
+    :param items:   list of items read with limit + 1
+    :param limit:   page size or None if the list is not paginated
+    :param keyset:  function that returns the (datetime, id) of an item
+    :return: (items, list of chaosmonkey.api.hal.Link)
+    """
+    if limit is None or len(items) <= limit:
+        return items, []
+    items = items[:limit]
+    args = request.args.to_dict()
+    args["after"] = encode_cursor(*keyset(items[-1]))
+    return items, [Link("next", request.path + "?" + urlencode(sorted(args.items())))]
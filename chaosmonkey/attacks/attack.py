@@ -1,3 +1,6 @@
+import json
+
+
 class Attack:
     """
     Base class for attacks. Every attack must extend from this class
@@ -7,6 +10,9 @@ class Attack:
     schema = None   #: **dict** Valid jsonSchema to validate the attack attributes in the API
     #: **dict** example for using when calling add plan endpoint
     example = None
+    #: **string** name of the pool used to run the attack (see :meth:`chaosmonkey.engine.pools`).
+    #: The default pool is used if the pool is not configured
+    executor_pool = "default"
 
     def __init__(self, attack_config):
         self.attack_config = attack_config
@@ -19,6 +25,27 @@ class Attack:
         """
         raise NotImplementedError("Attacks should implement this!")
 
+    @staticmethod
+    def target_key(attack_args):
+        """
+        Return a key that identifies the target of the attack, used to limit the attacks
+        with the same ref running at the same time against the same target
+        (see :meth:`chaosmonkey.engine.admission`).
+
+        The default key is built from the region and filters args. Attacks without them
+        return None and are not limited per target. Override it if the target of your
+        attack is given by other args.
+
+        :param attack_args: attack args of the attack config
+        :return: string or None
+        """
+        if not isinstance(attack_args, dict):
+            return None
+        target = dict((key, attack_args[key]) for key in ("region", "filters") if key in attack_args)
+        if not target:
+            return None
+        return json.dumps(target, sort_keys=True, separators=(",", ":"))
+
     @staticmethod
     def to_dict():
         """
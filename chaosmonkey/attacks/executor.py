@@ -1,26 +1,95 @@
 import logging
+import time
+from datetime import datetime
 import chaosmonkey.engine.cme_manager as CMEManager
+from chaosmonkey.dal.execution_model import Execution
+from chaosmonkey.engine.admission import admission
+from chaosmonkey.engine.metrics import metrics
+from chaosmonkey.engine.pools import pools
 
 log = logging.getLogger(__name__)
 
 
-def execute(attack_config=None, plan_id=None):
+def execute(attack_config=None, plan_id=None, attack_config_id=None, executor_id=None):
     """
     This func is executed for every job stored in the scheduler.
-    Receive in kwargs all attack configuration used when creating
+    Receive in kwargs the reference to the attack configuration used when creating
     the executor that indicates which attack and configuration should be
     used to do the actual attack.
 
+    Executors created by older versions receive the full attack_config instead
+    of the attack_config_id, and no executor_id.
+
+    Attacks over the limits of :meth:`chaosmonkey.engine.admission` are queued and this func
+    returns right away, so the pool thread is free. The queued attack runs later in a thread of
+    its pool.
+
+    The start time, end time and outcome of the attack are recorded in the execution
+    history (:meth:`chaosmonkey.dal.cme_sqlalchemy_store.CMESQLAlchemyStore.record_execution`),
+    and its duration, without the time queued for admission, in the attacks histogram of
+    :meth:`chaosmonkey.engine.metrics`.
+
     :param attack_config: **Dict** with attack configuration
     :param plan_id: **String** plan id for the plan containing the executor
+    :param attack_config_id: **String** id of the attack configuration stored for the plan
+    :param executor_id: **String** id of the executor
     """
-    attack_class = CMEManager.manager.attacks_store.get(attack_config.get('ref'))
+    manager = CMEManager.manager
+    started = datetime.now(manager.scheduler.timezone)
+    try:
+        attack_class, attack_config = _resolve_attack(manager, attack_config, plan_id, attack_config_id)
+    except Exception as e:
+        _record_execution(manager, executor_id, Execution.OUTCOME_ERROR, started, "%s: %s" % (type(e).__name__, e))
+        raise
+
+    def attack(waited):
+        _run_attack(manager, attack_class, attack_config, executor_id, started)
+
+    # run the attack now, or queue it for admission if the attack or its target are limited.
+    # A queued attack runs later in a thread of its pool, the execution is recorded then
+    if not admission.run(attack_class, attack_config.get("args"), attack,
+                         lambda call: pools.submit(attack_class, call)):
+        log.debug('[PlanID %s] attack %s queued for admission', plan_id, attack_config.get('ref'))
+
+
+def _resolve_attack(manager, attack_config, plan_id, attack_config_id):
+    if attack_config is None:
+        stored_config = manager.sql_store.get_attack_config(attack_config_id)
+        if stored_config is None:
+            msg = '[PlanID %s] Attack config %s not found in the store' % (plan_id, attack_config_id)
+            log.debug(msg)
+            raise ValueError(msg)
+        attack_config = stored_config.attack_config
+
+    attack_class = manager.attacks_store.get(attack_config.get('ref'))
 
     if attack_class is None:
         msg = '[PlanID %s] Attack ref %s not loaded in the store ' \
               % (plan_id, attack_config.get('ref'))
         log.debug(msg)
         raise ValueError(msg)
+    return attack_class, attack_config
+
+
+def _run_attack(manager, attack_class, attack_config, executor_id, started):
+    attack_started = time.time()
+    outcome = Execution.OUTCOME_ERROR
+    try:
+        pools.run(attack_class, attack_config.get("args"))
+        outcome = Execution.OUTCOME_SUCCESS
+    except Exception as e:
+        _record_execution(manager, executor_id, outcome, started, "%s: %s" % (type(e).__name__, e))
+        raise
+    finally:
+        metrics.attack_duration.observe(time.time() - attack_started, attack_config.get('ref'), outcome)
+    _record_execution(manager, executor_id, outcome, started)
+
 
-    attack_instance = attack_class(attack_config.get("args"))
-    attack_instance.run()
+def _record_execution(manager, executor_id, outcome, started, error=None):
+    if executor_id is None:
+        return
+    try:
+        manager.sql_store.record_execution(executor_id, outcome, started, datetime.now(manager.scheduler.timezone),
+                                           error)
+    except Exception:  # pylint: disable=broad-except
+        log.exception('Unable to record the execution of executor %s', executor_id)
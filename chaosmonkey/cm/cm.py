@@ -5,10 +5,43 @@ import click
 
 from gevent.wsgi import WSGIServer
 from chaosmonkey.engine.app import configure_engine, shutdown_engine
-from chaosmonkey.api.app import flask_app
+from chaosmonkey.engine.pools import parse_pool
+from chaosmonkey.engine.admission import parse_limit
+from chaosmonkey.engine.plan_tasks import DEFAULT_WORKERS
+from chaosmonkey.engine.idempotency import DEFAULT_TTL_HOURS
+from chaosmonkey.dal.database import JOURNAL_MODES, SYNCHRONOUS_LEVELS
+from chaosmonkey.dal.events import DEFAULT_BUFFER_SIZE
+from chaosmonkey.api.app import flask_app, precompute_documents
+from chaosmonkey.engine.modules_reloader import reloader
 from .profiling import PROFILER_FILE_PATH, profile_ctx
 
 
+def parse_pools(specs):
+    """
+    Parse the --pool options
+
+    :param specs: list of name=kind:size strings
+    :return: dict name -> (kind, size)
+    """
+    try:
+        return dict(parse_pool(spec) for spec in specs)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def parse_limits(specs):
+    """
+    Parse the --attack-limit options
+
+    :param specs: list of ref=limit strings
+    :return: dict ref -> limit
+    """
+    try:
+        return dict(parse_limit(spec) for spec in specs)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
 @click.command(name='chaos-monkey-engine')
 @click.option("--port", "-p", default=5000, help="Port used to expose the CM API. Default 5000")
 @click.option("--timezone", "-t", default="Europe/Madrid", help="Timezone to configure the scheduler. "
@@ -17,7 +50,47 @@ from .profiling import PROFILER_FILE_PATH, profile_ctx
 @click.option("--database-uri", "-d", required=True, help="SQLAlchemy database uri")
 @click.option("--attacks-folder", "-a", required=True, help="Path to the folder where the attacks are stored")
 @click.option("--planners-folder", "-p", required=True, help="Path to the folder where the planners are stored")
-def cm(port, timezone, profiling, database_uri, attacks_folder, planners_folder):
+@click.option("--cache-jobs", is_flag=True, default=False, help="Keep the pending executors in memory to avoid "
+                                                                "db reads on every scheduler wakeup")
+@click.option("--retention-days", type=int, default=None, help="Days to keep the execution history and the "
+                                                               "executed plans. Default keep them forever")
+@click.option("--sqlite-journal-mode", type=click.Choice(JOURNAL_MODES), default=None,
+              help="SQLite journal mode. Default WAL")
+@click.option("--sqlite-synchronous", type=click.Choice(SYNCHRONOUS_LEVELS), default=None,
+              help="SQLite synchronous level. Default NORMAL")
+@click.option("--sqlite-busy-timeout", type=int, default=None,
+              help="Milliseconds to wait for a SQLite lock. Default 5000")
+@click.option("--sqlite-mmap-size", type=int, default=None,
+              help="Bytes of the SQLite database to read with memory mapped I/O. Default 0 (disabled)")
+@click.option("--db-pool-size", type=int, default=None, help="Size of the db connections pool. Default 5")
+@click.option("--pool", "pools", multiple=True, callback=lambda ctx, param, value: parse_pools(value),
+              help="Pool to run the attacks, as name=kind:size with kind thread or process "
+                   "(eg. ssh=thread:20). Can be repeated")
+@click.option("--attack-limit", "attack_limits", multiple=True,
+              callback=lambda ctx, param, value: parse_limits(value),
+              help="Max attacks with a ref running at the same time, as ref=limit. Can be repeated")
+@click.option("--target-limit", type=int, default=None,
+              help="Max attacks with the same ref running at the same time against the same target. "
+                   "Default no limit")
+@click.option("--reload-modules", "reload_interval", type=int, default=None,
+              help="Seconds between checks for changed attacks and planners modules, that are reloaded "
+                   "without restarting the engine. Default disabled")
+@click.option("--lazy-modules", is_flag=True, default=False,
+              help="Import the attacks and planners modules the first time they are used instead of on startup")
+@click.option("--plan-workers", type=int, default=DEFAULT_WORKERS,
+              help="Threads that run the planners of the plans created with async=true. Default %d" % DEFAULT_WORKERS)
+@click.option("--idempotency-ttl", type=int, default=DEFAULT_TTL_HOURS,
+              help="Hours to keep the Idempotency-Key of the requests. Default %d" % DEFAULT_TTL_HOURS)
+@click.option("--events-buffer", type=int, default=DEFAULT_BUFFER_SIZE,
+              help="Events kept for the clients of /api/1/events/ that reconnect. Default %d" % DEFAULT_BUFFER_SIZE)
+@click.option("--convert-auto-vacuum", is_flag=True, default=False,
+              help="Convert a database created by a previous version to incremental vacuum with a full VACUUM "
+                   "on startup, so the retention returns the free space to the file system")
+# pylint: disable=too-many-arguments,too-many-locals
+def cm(port, timezone, profiling, database_uri, attacks_folder, planners_folder, cache_jobs, retention_days,
+       sqlite_journal_mode, sqlite_synchronous, sqlite_busy_timeout, sqlite_mmap_size, db_pool_size, pools,
+       attack_limits, target_limit, reload_interval, lazy_modules, plan_workers,
+       idempotency_ttl, events_buffer, convert_auto_vacuum):
     """
     Chaos Monkey Engine command line utility
     """
@@ -25,13 +98,38 @@ def cm(port, timezone, profiling, database_uri, attacks_folder, planners_folder)
 
         log = logging.getLogger(__name__)
 
-        configure_engine(database_uri, attacks_folder, planners_folder, timezone)
+        storage = {
+            "journal_mode": sqlite_journal_mode,
+            "synchronous": sqlite_synchronous,
+            "busy_timeout": sqlite_busy_timeout,
+            "mmap_size": sqlite_mmap_size,
+            "pool_size": db_pool_size
+        }
+        configure_engine(database_uri, attacks_folder, planners_folder, timezone, cache_jobs, retention_days,
+                         storage, pools, attack_limits, target_limit, reload_interval, lazy_modules, plan_workers,
+                         idempotency_ttl, events_buffer, convert_auto_vacuum)
 
         log.info("Engine configured")
+        if not lazy_modules:
+            # lazy modules are only imported when used, the lists are built on the first request
+            precompute_documents()
+            reloader.add_listener(lambda changed: precompute_documents())
         log.debug("database: %s", database_uri)
         log.debug("attacks folder: %s", attacks_folder)
         log.debug("planners folder: %s", planners_folder)
         log.debug("timezone: %s", timezone)
+        log.debug("cache jobs: %s", cache_jobs)
+        log.debug("retention days: %s", retention_days)
+        log.debug("storage: %s", storage)
+        log.debug("pools: %s", pools)
+        log.debug("attack limits: %s", attack_limits)
+        log.debug("target limit: %s", target_limit)
+        log.debug("reload modules interval: %s", reload_interval)
+        log.debug("lazy modules: %s", lazy_modules)
+        log.debug("plan workers: %s", plan_workers)
+        log.debug("idempotency ttl: %s", idempotency_ttl)
+        log.debug("events buffer: %s", events_buffer)
+        log.debug("convert auto vacuum: %s", convert_auto_vacuum)
 
         try:
             # Catch SIGTERM and convert it to a SystemExit
@@ -0,0 +1,64 @@
+import hashlib
+import json
+from uuid import uuid4
+from chaosmonkey.dal.database import db
+
+
+class AttackConfig(db.Model):
+    """
+    Attack configuration shared by the executors of a plan.
+
+    The configuration is stored once per plan (identified by its digest) and the
+    executors reference it by id, instead of storing a copy in every job_state.
+
+    This model is only used by the cme.
+    """
+
+    __tablename__ = 'cme_attack_configs'
+    __table_args__ = (
+        db.UniqueConstraint('plan_id', 'digest', name='uq_cme_attack_configs_plan_id_digest'),
+    )
+
+    id = db.Column(db.String(80), primary_key=True)  #: unique identifier
+    plan_id = db.Column(db.String(80), db.ForeignKey('cme_plans.id'), nullable=False)  #: plan id reference
+    digest = db.Column(db.String(64), nullable=False)  #: sha256 of the serialized config
+    ref = db.Column(db.String(200))  #: attack ref
+    config = db.Column(db.Text, nullable=False)  #: attack config serialized as json
+
+    def __init__(self, plan_id, attack_config):
+        self.id = uuid4().hex
+        self.plan_id = plan_id
+        self.config = self.serialize(attack_config)
+        self.digest = self.digest_for(self.config)
+        self.ref = attack_config.get("ref")
+
+    @property
+    def attack_config(self):
+        """
+        Attack config as a dict
+        """
+        return json.loads(self.config)
+
+    @staticmethod
+    def serialize(attack_config):
+        """
+        Serialize an attack config, always with the same key order so equal configs
+        have the same digest
+
+        :param attack_config:   dict
+        :return:                string
+        """
+        return json.dumps(attack_config, sort_keys=True, separators=(',', ':'))
+
+    @staticmethod
+    def digest_for(config):
+        """
+        Return the digest of a serialized attack config
+
+        :param config:  string returned by :meth:`serialize`
+        :return:        string
+        """
+        return hashlib.sha256(config.encode('utf-8')).hexdigest()
+
+    def __repr__(self):
+        return '<AttackConfig %r>' % self.id
@@ -0,0 +1,64 @@
+"""
+Change versions of the data of :meth:`chaosmonkey.dal.cme_sqlalchemy_store.CMESQLAlchemyStore`
+
+The store bumps a global version after every successful write that changes plans or
+executors, and records it as the version of the plans changed by the write. The versions
+are only kept in memory, they are combined with an epoch that is different on every start
+so a version is never reused for other data.
+
+The API uses them as ETags of the plans and executors endpoints, so a client that polls
+them gets a 304 Not Modified without reading the db while nothing changes.
+"""
+import threading
+from uuid import uuid4
+
+
+class ChangeVersions:
+    """
+    Global and per plan monotonic change versions
+    """
+
+    def __init__(self):
+        self.epoch = uuid4().hex[:12]  #: identifies this run of the engine
+        self.version = 0  #: version of the last write
+        self._floor = 0  #: version of the last write that changed all the plans
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def bump(self, plan_ids=(), all_plans=False):
+        """
+        Increment the global version after a write
+
+        :param plan_ids:    ids of the plans changed by the write
+        :param all_plans:   the write changed all the plans
+        :return:            the new version
+        """
+        with self._lock:
+            self.version += 1
+            if all_plans:
+                self._floor = self.version
+                self._plans = {}
+            for plan_id in plan_ids:
+                self._plans[plan_id] = self.version
+            return self.version
+
+    def plan_version(self, plan_id):
+        """
+        Return the version of the last write that changed a plan (0 if it has not
+        changed since the start)
+
+        :param plan_id: string
+        :return:        int
+        """
+        return max(self._plans.get(plan_id, 0), self._floor)
+
+    def tag(self, plan_id=None):
+        """
+        Return the global version, or the version of a plan, as a string that is
+        unique across restarts
+
+        :param plan_id: string. None for the global version
+        :return:        string
+        """
+        version = self.version if plan_id is None else self.plan_version(plan_id)
+        return "%s-%d" % (self.epoch, version)
@@ -4,15 +4,39 @@ CMESQLAlchemyStore replaces the default SQLAlchemyJobstore from
 
 It controls the persistence layer.
 """
+import json
 import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
 
 from apscheduler.job import Job
 from apscheduler.jobstores.base import BaseJobStore, JobLookupError
-from sqlalchemy import text
+from sqlalchemy import text, select, literal, or_, func
+from sqlalchemy.exc import IntegrityError
 from chaosmonkey.engine.cme_manager import manager
+from chaosmonkey.engine.metrics import metrics
+from chaosmonkey.dal.attack_config_model import AttackConfig
+from chaosmonkey.dal.change_versions import ChangeVersions
+from chaosmonkey.dal import events
+from chaosmonkey.dal.execution_model import Execution
 from chaosmonkey.dal.executor_model import Executor
+from chaosmonkey.dal.idempotency_key_model import IdempotencyKey
+from chaosmonkey.dal.jobs_cache import JobsCache
+from chaosmonkey.dal.job_state_codec import JobStateCodec
 from chaosmonkey.dal.plan_model import Plan
-from chaosmonkey.dal.database import db
+from chaosmonkey.dal.database import db, migrate_schema
+
+#: format of the DateTime columns in SQLite
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+#: number of rows read from the db at once by the streamed lists
+STREAM_BATCH_SIZE = 500
+#: marks a write that changes all the plans
+ALL_PLANS = object()
+#: max number of ids in a query (SQLite allows 999 params)
+CHUNK_SIZE = 500
 
 try:
     import cPickle as pickle
@@ -20,6 +44,65 @@ except ImportError:  # pragma: nocover
     import pickle
 
 
+def _chunks(items, size=CHUNK_SIZE):
+    """
+    Split a list of ids in lists that fit in the params of a query
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def timed(method):
+    """
+    Decorator for the store methods that query the db. The duration of every call is
+    observed in the store histogram of :meth:`chaosmonkey.engine.metrics`, with the
+    name of the method.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = time.time()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            metrics.store_duration.observe(time.time() - started, name)
+    return wrapper
+
+
+def serialized(method):
+    """
+    Decorator for the store methods that write to the db.
+
+    The writes are serialized with the store write lock, so the scheduler, the executors
+    and the API never compete for the SQLite write lock (readers are not blocked, with
+    the WAL journal they read the last committed data). If the method fails the session
+    is rolled back so the thread can keep using it.
+
+    The change versions are bumped after a successful write that has changed plans or
+    executors (see :meth:`CMESQLAlchemyStore._plan_changed`), or after the commit of the
+    :meth:`CMESQLAlchemyStore.transaction` that contains the write.
+
+    The duration of the write is observed as in :meth:`timed`, without the wait for the lock.
+    """
+    method = timed(method)
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._write_lock:
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception:
+                db.session.rollback()
+                if self._deferred is None:
+                    self._changed_plans = set()
+                raise
+            if self._deferred is None:
+                self._bump_versions()
+            return result
+    return wrapper
+
+
 class CMESQLAlchemyStore(BaseJobStore):
     """
     CMESQLAlchemyStore
@@ -30,97 +113,310 @@ class CMESQLAlchemyStore(BaseJobStore):
     This class is used by the apscheduler, all overridden methods should
     return appscheduler.job.Job objects.
 
-    The store handles 2 types of models: plans and executors.
-    Internally apscheduler names the executors as jobs.
+    The store handles 3 types of models: plans, executors and executions.
+    Internally apscheduler names the executors as jobs. The attack configs of the
+    executors are stored once per plan and referenced by id from the job kwargs.
 
-    TODO: executors are marked as executed when they are processed
-        (no mather if they fail or succeed. We need to handle execution errors
-        in order to know whats going on with the execution and what was its result.)
+    When an executor is processed by the scheduler it is moved to the execution history,
+    and the result of the attack is recorded there (see :meth:`record_execution`).
+    The executors table only holds pending executors.
 
     * Plans: :meth:`chaosmonkey.dal.plan_model.Plan`
     * Executors: :meth:`chaosmonkey.dal.executor_model.Executor`
+    * Executions: :meth:`chaosmonkey.dal.execution_model.Execution`
+
+    With cache_jobs the pending jobs are also kept in a
+    :meth:`chaosmonkey.dal.jobs_cache.JobsCache`. The cache is loaded from the db on
+    start and written through on every job change, so the scheduler reads
+    (due jobs, next run time and lookups) do not touch the db.
+
+    The job state of the executors is serialized with a
+    :meth:`chaosmonkey.dal.job_state_codec.JobStateCodec` (or any object with the
+    same encode and decode methods).
+
+    Every write bumps the :meth:`chaosmonkey.dal.change_versions.ChangeVersions` of
+    the store, globally and for the plans it changes, and publishes the changes of the
+    executors and plans in the :meth:`chaosmonkey.dal.events.EventBus` of the store.
+
+    :param pickle_protocol: protocol used to pickle the job states the codec can not encode
+    :param cache_jobs:      keep the pending jobs in memory
+    :param codec:           job state codec. Defaults to JobStateCodec(pickle_protocol)
+    :param events_size:     number of events kept for the clients that reconnect
     """
 
-    def __init__(self, pickle_protocol=pickle.HIGHEST_PROTOCOL):
+    def __init__(self, pickle_protocol=pickle.HIGHEST_PROTOCOL, cache_jobs=False, codec=None,
+                 events_size=events.DEFAULT_BUFFER_SIZE):
         super(CMESQLAlchemyStore, self).__init__()  # pylint: disable=no-member
         self.pickle_protocol = pickle_protocol
+        self.codec = codec or JobStateCodec(pickle_protocol)
+        self._write_lock = threading.RLock()
+        self._changed_plans = set()
+        self._deferred = None
+        self._vacuum_skipped = False
+        self.versions = ChangeVersions()
+        self.events = events.EventBus(events_size)
         self.log = logging.getLogger(__name__)
+        self._cache = JobsCache() if cache_jobs else None
 
     def start(self, scheduler, alias):
         """
-        Start the SQLAlchemy engine
+        Start the SQLAlchemy engine and load the pending jobs in the cache
+
+        The tables of databases created by older versions are migrated first (see
+        :meth:`chaosmonkey.dal.database.migrate_schema`), and then the executed executors
+        they stored are moved to the execution history.
         """
         super(CMESQLAlchemyStore, self).start(scheduler, alias)
+        migrate_schema(db.engine)
+        self._move_executed_executors()
+        if self._cache is not None:
+            self._cache.clear()
+            for job in self._get_jobs():
+                self._cache.add(job)
+            self.log.info('loaded %d pending jobs in cache', len(self._cache))
 
+    @timed
     def lookup_job(self, job_id):
+        if self._cache is not None:
+            job = self._cache.get(job_id)
+            if job is None:
+                raise JobLookupError("job with id %s not found" % job_id)
+            return job
+
         job = Executor.query.get(job_id)
         if not job:
             raise JobLookupError("job with id %s not found" % job_id)
         else:
             return self._reconstitute_job(job.job_state) if job.job_state else None
 
+    @timed
     def get_due_jobs(self, now):
+        if self._cache is not None:
+            return self._cache.due_jobs(now)
         return self._get_jobs(Executor.next_run_time <= now)
 
+    @timed
     def get_next_run_time(self):
-        job = Executor.query.order_by(Executor.next_run_time).limit(1).all()
-        next_run_time = None
-        if len(job) > 0:
-            next_run_time = manager.scheduler.timezone.localize(job[0].next_run_time)
-        return next_run_time
+        """
+        Return the next_run_time of the first pending executor.
+
+        Only reads the (executed, next_run_time) index, so the cost does not depend on
+        the number of executed executors.
+        """
+        if self._cache is not None:
+            return self._cache.next_run_time()
+
+        # pylint: disable=singleton-comparison
+        next_run_time = db.session.query(Executor.next_run_time)\
+            .filter(Executor.executed == False, Executor.next_run_time.isnot(None))\
+            .order_by(Executor.next_run_time).limit(1).scalar()
+        if next_run_time is None:
+            return None
+        return manager.scheduler.timezone.localize(next_run_time)
 
+    @timed
     def get_all_jobs(self):
+        if self._cache is not None:
+            return self._cache.all_jobs()
         jobs = self._get_jobs()
         self._fix_paused_jobs_sorting(jobs)
         return jobs
 
+    @serialized
     def add_job(self, job):
-        job_state = pickle.dumps(job.__getstate__(), self.pickle_protocol)
-        job = Executor(job.id, job.next_run_time, job.kwargs.get("plan_id"), job_state)
-        db.session.add(job)
-        db.session.commit()
-        self._check_plan_executed(job.id)
+        job_state = self.codec.encode(job)
+        job_model = Executor(job.id, job.next_run_time, job.kwargs.get("plan_id"), job_state,
+                             job.kwargs.get("attack_config_id"))
+        db.session.add(job_model)
+        self._update_plan_counters(job_model.plan_id, pending=1)
+        self._commit()
+        self._cache_job(job)
+        self._publish([self._job_event(events.EXECUTOR_ADDED, job)])
+
+    @serialized
+    def add_jobs(self, jobs):
+        """
+        Add a list of jobs in a single transaction.
+
+        Used by :meth:`chaosmonkey.engine.scheduler.CMEScheduler.add_jobs` to avoid a commit
+        for every job. The counters of the plans related to the jobs are updated once per plan.
+
+        :param jobs: list of apscheduler.job.Job
+        """
+        executors = []
+        plan_counts = Counter()
+        for job in jobs:
+            plan_id = job.kwargs.get("plan_id")
+            plan_counts[plan_id] += 1
+            executors.append({
+                "id": job.id,
+                "next_run_time": job.next_run_time,
+                "plan_id": plan_id,
+                "job_state": self.codec.encode(job),
+                "attack_config_id": job.kwargs.get("attack_config_id"),
+                "executed": False
+            })
+
+        self.log.debug('add %d jobs for plans %s', len(executors), list(plan_counts))
+        db.session.bulk_insert_mappings(Executor, executors)
+        for plan_id, count in plan_counts.items():
+            self._update_plan_counters(plan_id, pending=count)
+        self._commit()
+        for job in jobs:
+            self._cache_job(job)
+        self._publish([self._job_event(events.EXECUTOR_ADDED, job) for job in jobs])
 
+    @serialized
     def update_job(self, job):
         job_model = Executor.query.get(job.id)
         job_model.next_run_time = job.next_run_time
-        job_model.job_state = pickle.dumps(job.__getstate__(), self.pickle_protocol)
-        db.session.commit()
+        job_model.job_state = self.codec.encode(job)
+        self._plan_changed(job_model.plan_id)
+        self._commit()
+        self._cache_job(job)
+        self._publish([self._job_event(events.EXECUTOR_UPDATED, job)])
 
-    def remove_job(self, job_id):
+    @timed
+    def lookup_jobs(self, job_ids):
+        """
+        Return the pending jobs with the given ids, reading them in chunks of ids.
+        The ids that are not found are skipped.
+
+        :param job_ids: list of strings
+        :return:        list of apscheduler.job.Job
+        """
+        if self._cache is not None:
+            return [job for job in (self._cache.get(job_id) for job_id in job_ids) if job is not None]
+
+        jobs = []
+        for chunk in _chunks(job_ids):
+            # pylint: disable=singleton-comparison
+            for job_model in Executor.query.filter(Executor.id.in_(chunk), Executor.executed == False):
+                jobs.append(self._reconstitute_job(job_model.job_state))
+        return jobs
+
+    @serialized
+    def update_jobs(self, jobs):
+        """
+        Update a list of jobs in a single transaction.
+
+        Used by :meth:`chaosmonkey.engine.scheduler.CMEScheduler.reschedule_jobs`.
+
+        :param jobs: list of apscheduler.job.Job
         """
-        Instead of deleting a job when its executed or it has failed, check it as executed.
+        self.log.debug('update %d jobs', len(jobs))
+        db.session.bulk_update_mappings(Executor, [{
+            "id": job.id,
+            "next_run_time": job.next_run_time,
+            "job_state": self.codec.encode(job)
+        } for job in jobs])
+        for job in jobs:
+            self._plan_changed(job.kwargs.get("plan_id"))
+        self._commit()
+        for job in jobs:
+            self._cache_job(job)
+        self._publish([self._job_event(events.EXECUTOR_UPDATED, job) for job in jobs])
 
-        TODO: delete the executor and save to a historic table the executed attacks with its
-        logs and results.
+    @serialized
+    def remove_job(self, job_id):
+        """
+        The scheduler removes a job when it has been processed (executed, failed or missed).
+        Instead of deleting it, the executor is moved to the execution history in the same
+        transaction.
         """
         job_model = Executor.query.get(job_id)
         if job_model is None:
             raise JobLookupError(job_id)
 
-        job_model.executed = True
-        db.session.commit()
-
-        self._check_plan_executed(job_id)
+        plan_id = job_model.plan_id
+        db.session.execute(self._insert_executions(Executor.id == job_id))
+        if not job_model.executed:
+            self._update_plan_counters(plan_id, pending=-1, executed=1)
+        self._plan_changed(plan_id)
+        db.session.delete(job_model)
+        plan_executed = db.session.query(Plan.pending_count).filter(Plan.id == plan_id).scalar() == 0
+        self._commit()
+        self._uncache_job(job_id)
+        changes = [(events.EXECUTOR_EXECUTED, {"id": job_id, "plan_id": plan_id})]
+        if plan_executed:
+            changes.append((events.PLAN_EXECUTED, {"id": plan_id}))
+        self._publish(changes)
 
+    @serialized
     def real_remove_job(self, job_id):
+        """
+        Delete an executor, pending or executed (from the execution history)
+        """
         self.log.debug('real remove job %s', job_id)
         job_model = Executor.query.get(job_id)
-        if job_model is None:
-            raise JobLookupError(job_id)
+        if job_model is not None:
+            if job_model.executed:
+                self._update_plan_counters(job_model.plan_id, executed=-1)
+            else:
+                self._update_plan_counters(job_model.plan_id, pending=-1)
+        else:
+            job_model = Execution.query.get(job_id)
+            if job_model is None:
+                raise JobLookupError(job_id)
+            self._update_plan_counters(job_model.plan_id, executed=-1)
 
+        plan_id = job_model.plan_id
         db.session.delete(job_model)
-        db.session.commit()
+        self._commit()
+        self._uncache_job(job_id)
+        self._publish([(events.EXECUTOR_REMOVED, {"id": job_id, "plan_id": plan_id})])
+
+    @serialized
+    def real_remove_jobs(self, job_ids):
+        """
+        Delete a list of executors, pending or executed (from the execution history), in a
+        single transaction. The counters of the plans are updated once per plan.
+
+        :param job_ids: list of strings
+        :return:        list of the ids deleted, the ids that are not found are skipped
+        """
+        self.log.debug('real remove %d jobs', len(job_ids))
+        removed = []
+        changes = []
+        for chunk in _chunks(job_ids):
+            pending = db.session.query(Executor.id, Executor.plan_id).filter(Executor.id.in_(chunk)).all()
+            pending_ids = set(row.id for row in pending)
+            executed = db.session.query(Execution.id, Execution.plan_id)\
+                .filter(Execution.id.in_([job_id for job_id in chunk if job_id not in pending_ids])).all()
 
+            for model, rows, counter in ((Executor, pending, "pending"), (Execution, executed, "executed")):
+                if not rows:
+                    continue
+                db.session.query(model).filter(model.id.in_([row.id for row in rows]))\
+                    .delete(synchronize_session=False)
+                for plan_id, count in Counter(row.plan_id for row in rows).items():
+                    self._update_plan_counters(plan_id, **{counter: -count})
+                removed.extend(row.id for row in rows)
+                changes.extend((events.EXECUTOR_REMOVED, {"id": row.id, "plan_id": row.plan_id}) for row in rows)
+        self._commit()
+        for job_id in removed:
+            self._uncache_job(job_id)
+        self._publish(changes)
+        return removed
+
+    @serialized
     def remove_all_jobs(self):
+        """
+        Delete all the pending executors. The execution history is kept.
+        """
         db.session.query(Executor).delete()
-        db.session.commit()
+        db.session.query(Plan).filter(Plan.pending_count > 0)\
+            .update({Plan.pending_count: 0, Plan.executed: True}, synchronize_session=False)
+        self._plan_changed(ALL_PLANS)
+        self._commit()
+        if self._cache is not None:
+            self._cache.clear()
 
     def shutdown(self):
         pass
 
     def _reconstitute_job(self, job_state):
-        job_state = pickle.loads(job_state)
+        job_state = self.codec.decode(job_state)
         job_state['jobstore'] = self
         job = Job.__new__(Job)
         job.__setstate__(job_state)
@@ -128,13 +424,99 @@ class CMESQLAlchemyStore(BaseJobStore):
         job._jobstore_alias = self._alias  # pylint: disable=protected-access
         return job
 
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager to run all the store writes of the block in a single transaction,
+        committed when the block exits or rolled back if it raises. Nested transactions
+        are part of the outermost one.
+
+        The writes of other threads wait until the block exits. The jobs cache and the
+        change versions are updated after the commit.
+        """
+        with self._write_lock:
+            if self._deferred is not None:
+                yield
+                return
+
+            self._deferred = []
+            committed = False
+            try:
+                yield
+                db.session.commit()
+                committed = True
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                deferred, self._deferred = self._deferred, None
+                if committed:
+                    for operation in deferred:
+                        operation()
+                    self._bump_versions()
+                else:
+                    self._changed_plans = set()
+
+    def _commit(self):
+        """
+        Commit the current write, or only send it to the db inside a :meth:`transaction`
+        """
+        if self._deferred is None:
+            db.session.commit()
+        else:
+            db.session.flush()
+
+    def _bump_versions(self):
+        changed, self._changed_plans = self._changed_plans, set()
+        if not changed:
+            return
+        self.versions.bump(changed - {ALL_PLANS}, all_plans=ALL_PLANS in changed)
+
+    def _cache_job(self, job):
+        if self._cache is not None:
+            if self._deferred is not None:
+                self._deferred.append(lambda: self._cache.add(job))
+            else:
+                self._cache.add(job)
+
+    def _uncache_job(self, job_id):
+        if self._cache is not None:
+            if self._deferred is not None:
+                self._deferred.append(lambda: self._cache.remove(job_id))
+            else:
+                self._cache.remove(job_id)
+
+    def _publish(self, changes):
+        """
+        Publish the events of the current write, or after the commit inside a :meth:`transaction`
+
+        :param changes: list of (type, data) tuples
+        """
+        if not changes:
+            return
+        if self._deferred is not None:
+            self._deferred.append(lambda: self.events.publish(changes))
+        else:
+            self.events.publish(changes)
+
+    @staticmethod
+    def _job_event(event_type, job):
+        return event_type, {
+            "id": job.id,
+            "plan_id": job.kwargs.get("plan_id"),
+            "next_run_time": job.next_run_time.isoformat() if job.next_run_time else None
+        }
+
     def _get_jobs(self, *conditions):
         """
         Return only jobs with executed == 0. Because we are not deleting the executors we need
-          to filter to ensure the apscheduler gets only pending jobs
+          to filter to ensure the apscheduler gets only pending jobs.
+          The (executed, next_run_time) index keeps the executed executors out of the scan.
         """
         job_list = []
-        jobs = db.session.query(Executor).filter(Executor.executed == 0, *conditions)
+        # pylint: disable=singleton-comparison
+        jobs = db.session.query(Executor).filter(Executor.executed == False, *conditions)\
+            .order_by(Executor.next_run_time)
 
         failed_job_ids = set()
         for job in jobs:
@@ -150,38 +532,193 @@ class CMESQLAlchemyStore(BaseJobStore):
 
         return job_list
 
+    @staticmethod
+    def _insert_executions(*conditions):
+        """
+        Return an INSERT that copies the executors matching the conditions to the execution
+        history. Executors already in the history are ignored.
+        """
+        executors = select([
+            Executor.id, Executor.plan_id, Executor.attack_config_id, Executor.next_run_time,
+            literal(Execution.OUTCOME_SUBMITTED)
+        ]).where(db.and_(*conditions))
+        return Execution.__table__.insert().prefix_with('OR IGNORE').from_select(
+            ['id', 'plan_id', 'attack_config_id', 'next_run_time', 'outcome'], executors)
+
+    @serialized
+    def _move_executed_executors(self):
+        """
+        Move the executors marked as executed (by older versions) to the execution history
+        """
+        # pylint: disable=singleton-comparison
+        moved = db.session.execute(self._insert_executions(Executor.executed == True)).rowcount
+        db.session.query(Executor).filter(Executor.executed == True).delete(synchronize_session=False)
+        self._plan_changed(ALL_PLANS)
+        self._commit()
+        if moved:
+            self.log.info('moved %d executed executors to the execution history', moved)
+
     # Custom methods.
     # Methods defined bellow are only used by the CMEManager and must only return
     # db.Models (chaosmonkey.dal.*_model)
 
-    def _check_plan_executed(self, executor_id):
+    @serialized
+    # pylint: disable=too-many-arguments
+    def record_execution(self, executor_id, outcome, started=None, finished=None, error=None):
         """
-        Each time a executor is marked as executed check if all executors in the plan
-        are executed and check the plan as executed as well
+        Record the result of an executor in the execution history.
+
+        The scheduler may run the executor before removing it from the store, so the
+        executor is copied to the history here if it is not there yet.
 
         :param executor_id: string
-        :return:
+        :param outcome:     one of the Execution.OUTCOME_* values
+        :param started:     datetime the attack started
+        :param finished:    datetime the attack finished
+        :param error:       string with the error raised by the attack
         """
-        executor = Executor.query.get(executor_id)
-        if executor:
-            plan = Plan.query.get(executor.plan_id)
+        self.log.debug('record execution %s: %s', executor_id, outcome)
+        db.session.execute(self._insert_executions(Executor.id == executor_id))
+        db.session.query(Execution).filter(Execution.id == executor_id).update({
+            Execution.outcome: outcome,
+            Execution.started: started,
+            Execution.finished: finished,
+            Execution.duration: (finished - started).total_seconds() if started and finished else None,
+            Execution.error: error
+        }, synchronize_session=False)
+        plan_id = db.session.query(Execution.plan_id).filter(Execution.id == executor_id).scalar()
+        self._plan_changed(plan_id)
+        self._commit()
+        self._publish([(events.EXECUTION_RECORDED,
+                        {"id": executor_id, "plan_id": plan_id, "outcome": outcome, "error": error})])
 
-            self.log.debug('check if all executors in plan %s are executed', executor.plan_id)
-            # get all executor for the same plan that are not executed
-            # pylint: disable=singleton-comparison
-            executors_pending = Executor.query.\
-                filter(Executor.executed == False, Executor.plan_id == executor.plan_id).all()
-            if len(executors_pending) == 0:
-                self.log.debug('all executors has been executed for the plan %s', executor.plan_id)
-                # if no executors are pending to execute, mark the pan as executed
+    def job_missed(self, event):
+        """
+        Scheduler listener for EVENT_JOB_MISSED. Record the executor as missed.
 
-                plan.executed = True
-            else:
-                self.log.debug('there are executors pending in plan %s', executor.plan_id)
-                plan.executed = False
+        :param event: apscheduler.events.JobExecutionEvent
+        """
+        if event.jobstore == self._alias:
+            self.record_execution(event.job_id, Execution.OUTCOME_MISSED)
 
+    @serialized
+    def delete_executions(self, before, limit):
+        """
+        Delete up to limit executions from the history scheduled before a date, in a
+        single transaction. The executed counters of the plans are updated.
+
+        :param before:  naive datetime in the scheduler timezone
+        :param limit:   max number of executions to delete
+        :return:        number of executions deleted
+        """
+        executions = db.session.query(Execution.id, Execution.plan_id)\
+            .filter(Execution.next_run_time < before).limit(limit).all()
+        if not executions:
+            return 0
+
+        db.session.query(Execution).filter(Execution.id.in_([execution.id for execution in executions]))\
+            .delete(synchronize_session=False)
+        for plan_id, count in Counter(execution.plan_id for execution in executions).items():
+            self._update_plan_counters(plan_id, executed=-count)
+        self._commit()
+        return len(executions)
+
+    @serialized
+    def delete_executed_plans(self, before, limit):
+        """
+        Delete up to limit executed plans created before a date without executors left
+        (pending or in the history), with their attack configs, in a single transaction.
+
+        :param before:  naive datetime in UTC
+        :param limit:   max number of plans to delete
+        :return:        number of plans deleted
+        """
+        # pylint: disable=singleton-comparison
+        plan_ids = [plan.id for plan in db.session.query(Plan.id).filter(
+            Plan.executed == True, Plan.pending_count <= 0, Plan.executed_count <= 0, Plan.created < before
+        ).limit(limit)]
+        if not plan_ids:
+            return 0
+
+        db.session.query(AttackConfig).filter(AttackConfig.plan_id.in_(plan_ids)).delete(synchronize_session=False)
+        db.session.query(Plan).filter(Plan.id.in_(plan_ids)).delete(synchronize_session=False)
+        for plan_id in plan_ids:
+            self._plan_changed(plan_id)
+        self._commit()
+        self._publish([(events.PLAN_DELETED, {"id": plan_id}) for plan_id in plan_ids])
+        return len(plan_ids)
+
+    @timed
+    def get_database_size(self):
+        """
+        Return the size of the database and the size of its free pages
+
+        :return: (size, free) in bytes
+        """
+        page_size = db.session.execute("PRAGMA page_size").scalar()
+        page_count = db.session.execute("PRAGMA page_count").scalar()
+        freelist_count = db.session.execute("PRAGMA freelist_count").scalar()
+        return page_count * page_size, freelist_count * page_size
+
+    @serialized
+    def incremental_vacuum(self, pages):
+        """
+        Return up to pages free pages to the file system.
+
+        Databases created without auto_vacuum = INCREMENTAL are skipped, converting them needs
+        a full VACUUM that would hold the write lock for a whole rewrite of the database. They
+        are converted on startup with ``--convert-auto-vacuum``
+        (see :meth:`chaosmonkey.dal.database.convert_to_incremental_vacuum`).
+
+        :param pages:   max number of pages to release
+        :return:        False if the database does not support incremental vacuum
+        """
+        if db.session.execute("PRAGMA auto_vacuum").scalar() != 2:
             db.session.commit()
+            if not self._vacuum_skipped:
+                self._vacuum_skipped = True
+                self.log.warning('the database does not use auto_vacuum = INCREMENTAL, free pages are not '
+                                 'returned to the file system. Start the engine with --convert-auto-vacuum '
+                                 'to convert it')
+            return False
+
+        cursor = db.session.connection().connection.cursor()
+        try:
+            # the pragma releases one page for each row fetched
+            cursor.execute("PRAGMA incremental_vacuum(%d)" % pages)
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        db.session.commit()
+        return True
+
+    def _plan_changed(self, plan_id):
+        """
+        Record that the current write changes a plan or its executors, to bump its version
+        after the write. ALL_PLANS if it changes all the plans. The writes that change
+        nothing here (idempotency keys, vacuum) don't bump the versions
+        """
+        self._changed_plans.add(plan_id)
+
+    def _update_plan_counters(self, plan_id, pending=0, executed=0):
+        """
+        Update the executors counters of a plan in the current transaction, with a
+        single UPDATE statement so concurrent updates can not lose increments.
 
+        The plan is marked as executed when there are no pending executors left.
+
+        :param plan_id:     string
+        :param pending:     increment for the pending executors counter
+        :param executed:    increment for the executed executors counter
+        """
+        self._plan_changed(plan_id)
+        db.session.query(Plan).filter(Plan.id == plan_id).update({
+            Plan.pending_count: Plan.pending_count + pending,
+            Plan.executed_count: Plan.executed_count + executed,
+            Plan.executed: Plan.pending_count + pending <= 0
+        }, synchronize_session=False)
+
+    @timed
     def get_executor(self, executor_id):
         """
         Get an executor
@@ -190,76 +727,203 @@ class CMESQLAlchemyStore(BaseJobStore):
         :return: List of Executor
         """
         self.log.debug('get executor %s', executor_id)
-        return Executor.query.get(executor_id)
+        return Executor.query.get(executor_id) or Execution.query.get(executor_id)
 
-    def get_executors(self, executed=False):
+    # pylint: disable=too-many-arguments
+    @timed
+    def get_executors(self, executed=False, limit=None, after=None, plan_id=None, run_from=None, run_to=None,
+                      attack_ref=None, stream=False):
         """
-        Get a list of executors
+        Get a list of executors ordered by next_run_time and id. Executed executors are
+        read from the execution history.
 
-        :return: List of Executor
+        The list is paginated with a keyset: ``after`` is the (next_run_time, id) of the
+        last executor of the previous page, so every page is read from the index
+        whatever its position.
+
+        :param executed:    read the executed executors instead of the pending ones
+        :param limit:       max number of executors. None to return all of them
+        :param after:       (next_run_time, id) tuple. Return the executors after it
+        :param plan_id:     only the executors of a plan
+        :param run_from:    only the executors with next_run_time >= run_from (naive, scheduler timezone)
+        :param run_to:      only the executors with next_run_time < run_to (naive, scheduler timezone)
+        :param attack_ref:  only the executors of an attack ref
+        :param stream:      return an iterator that reads the executors from the db in batches
+                            while it is consumed, instead of a list
+        :return: List of Executor (or Execution if executed)
         """
-        self.log.debug('get all executors in store with executed %s', executed)
-        return Executor.query.filter(Executor.executed == executed)\
-            .order_by(Executor.next_run_time).all()
+        self.log.debug('get executors in store with executed %s', executed)
+        model = Execution if executed else Executor
+        query = self._filter_executors(model.query, model, plan_id, run_from, run_to, attack_ref)
+        if after is not None:
+            # the >= bound lets the db seek the index, the or_ skips the ties already returned
+            after_time, after_id = after
+            query = query.filter(model.next_run_time >= after_time,
+                                 or_(model.next_run_time > after_time, model.id > after_id))
+        query = query.order_by(model.next_run_time, model.id)
+        if limit is not None:
+            query = query.limit(limit)
+        if stream:
+            return query.yield_per(STREAM_BATCH_SIZE)
+        return query.all()
 
+    @timed
+    def get_executor_ids(self, plan_id=None, run_from=None, run_to=None, attack_ref=None):
+        """
+        Get the ids of the pending executors matching the filters, ordered by next_run_time.
+        See :meth:`get_executors`
+
+        :return: list of strings
+        """
+        query = self._filter_executors(db.session.query(Executor.id), Executor, plan_id, run_from, run_to,
+                                       attack_ref)
+        return [row.id for row in query.order_by(Executor.next_run_time, Executor.id)]
+
+    # pylint: disable=too-many-arguments
+    @staticmethod
+    def _filter_executors(query, model, plan_id=None, run_from=None, run_to=None, attack_ref=None):
+        if model is Executor:
+            # pylint: disable=singleton-comparison
+            query = query.filter(Executor.executed == False)
+        if plan_id is not None:
+            query = query.filter(model.plan_id == plan_id)
+        if run_from is not None:
+            query = query.filter(model.next_run_time >= run_from)
+        if run_to is not None:
+            query = query.filter(model.next_run_time < run_to)
+        if attack_ref is not None:
+            query = query.join(AttackConfig, AttackConfig.id == model.attack_config_id)\
+                .filter(AttackConfig.ref == attack_ref)
+        return query
+
+    @timed
     def get_executors_for_plan(self, plan_id):
         """
-        Get a list of executors related to a plan by its plan_id
+        Get a list of executors related to a plan by its plan_id, executed (from the
+        execution history) and pending
 
         :param plan_id: string
-        :return: List of Executor
+        :return: List of Execution and Executor
         """
         self.log.debug('get executors for plan %s', plan_id)
-        return db.session.query(Executor).filter(Executor.plan_id == plan_id)
+        return Execution.query.filter(Execution.plan_id == plan_id).order_by(Execution.next_run_time).all() + \
+            Executor.query.filter(Executor.plan_id == plan_id).order_by(Executor.next_run_time).all()
+
+    @serialized
+    def add_attack_config(self, plan_id, attack_config):
+        """
+        Store an attack config for a plan. If the plan already has the same
+        config the existing one is returned.
+
+        :param plan_id:         string
+        :param attack_config:   dict
+        :return:                AttackConfig
+        """
+        config = AttackConfig(plan_id, attack_config)
+        existing = AttackConfig.query.filter_by(plan_id=plan_id, digest=config.digest).first()
+        if existing is not None:
+            return existing
 
-    def add_plan(self, name):
+        self.log.debug('create attack config %s for plan %s', config.ref, plan_id)
+        self._plan_changed(plan_id)
+        db.session.add(config)
+        try:
+            self._commit()
+        except IntegrityError:
+            if self._deferred is not None:
+                raise
+            # created by another thread in the meantime
+            db.session.rollback()
+            return AttackConfig.query.filter_by(plan_id=plan_id, digest=config.digest).one()
+        return config
+
+    @timed
+    def get_attack_config(self, attack_config_id):
+        """
+        Get an attack config by its id
+
+        :param attack_config_id:    string
+        :return:                    AttackConfig
+        """
+        return AttackConfig.query.get(attack_config_id)
+
+    @serialized
+    def add_plan(self, name, plan_id=None):
         """
         Create a plan in the db.
 
-        :param name: string
+        :param name:    string
+        :param plan_id: id of the plan, a new one if None
         :return: Plan created
         """
         self.log.debug('create plan %s', name)
-        plan = Plan(name=name)
+        plan = Plan(_id=plan_id, name=name)
         db.session.add(plan)
-        db.session.commit()
+        self._plan_changed(plan.id)
+        changes = [(events.PLAN_ADDED, {"id": plan.id, "name": name})]
+        self._commit()
+        self._publish(changes)
         return plan
 
-    def get_plans(self, show_all=False):
+    @timed
+    def get_plans(self, show_all=False, limit=None, after=None, stream=False):
         """
-        Return a list of plans created on db. For each plan return the number of pending executors and the
-        next_run_time of the first executor
+        Return a list of plans created on db, ordered by creation date and id. For each plan
+        return the executors counters and the next_run_time of the first pending executor
 
+        :param show_all:    include the executed plans
+        :param limit:       max number of plans. None to return all of them
+        :param after:       (created, id) tuple of the last plan of the previous page.
+                            Return the plans after it
+        :param stream:      return an iterator that reads the plans from the db while
+                            it is consumed, instead of a list
         :return: List of Plans
         """
 
         query = 'SELECT ' \
-                'cme_plans.id, name, created, COUNT(cme_executors.id) as executors_count, ' \
-                ' MIN(next_run_time), cme_plans.executed ' \
-                'FROM cme_plans ' \
-                'LEFT JOIN cme_executors ON cme_plans.id == cme_executors.plan_id ' \
+                'id, name, created, pending_count, executed_count, ' \
+                '(SELECT MIN(next_run_time) FROM cme_executors ' \
+                ' WHERE cme_executors.plan_id == cme_plans.id AND cme_executors.executed == 0), ' \
+                'executed ' \
+                'FROM cme_plans '
 
+        conditions = []
+        params = {}
         if show_all is False:
-            query += 'WHERE cme_plans.executed == 0 '
+            conditions.append('executed == 0')
+        if after is not None:
+            conditions.append('created >= :after_created AND (created > :after_created OR id > :after_id)')
+            params.update(after_created=after[0].strftime(DATETIME_FORMAT), after_id=after[1])
+        if conditions:
+            query += 'WHERE ' + ' AND '.join(conditions) + ' '
+        query += 'ORDER BY created, id '
+        if limit is not None:
+            query += 'LIMIT :limit '
+            params['limit'] = limit
 
-        query += 'GROUP BY cme_plans.id'
         self.log.debug('get plans query %s', query)
         sql = text(query)
-        result = db.engine.execute(sql)
-        plans = []
-        for row in result:
-            plan = Plan(
-                _id=row[0],
-                name=row[1],
-                created=row[2],
-                executors_count=row[3],
-                next_execution=row[4],
-                executed=row[5]
-            )
-            plans.append(plan)
-
-        return plans
+        plans = self._iter_plans(db.engine.execute(sql, **params))
+        return plans if stream else list(plans)
 
+    @staticmethod
+    def _iter_plans(result):
+        try:
+            for row in result:
+                yield Plan(
+                    _id=row[0],
+                    name=row[1],
+                    created=row[2],
+                    pending_count=row[3],
+                    executed_count=row[4],
+                    next_execution=row[5],
+                    executed=row[6]
+                )
+        finally:
+            # return the connection to the pool if the iterator is not consumed
+            result.close()
+
+    @timed
     def get_plan(self, plan_id):
         """
         Return a plan by its id
@@ -271,11 +935,35 @@ class CMESQLAlchemyStore(BaseJobStore):
         plan = Plan.query.get(plan_id)
         return plan
 
+    @timed
+    def count_pending_executors(self):
+        """
+        Return the number of executors not executed yet
+
+        :return: int
+        """
+        if self._cache is not None:
+            return len(self._cache)
+        # pylint: disable=singleton-comparison
+        return db.session.query(func.count(Executor.id)).filter(Executor.executed == False).scalar()
+
+    @timed
+    def count_active_plans(self):
+        """
+        Return the number of plans not executed yet (with pending executors, or still being planned)
+
+        :return: int
+        """
+        # pylint: disable=singleton-comparison
+        return db.session.query(func.count(Plan.id)).filter(Plan.executed == False).scalar()
+
+    @serialized
     def delete_plan(self, plan_id):
         """
         Delete a plan.
 
-        All the executors related to the plan are deleted. (ON_DELETE constrain in db.Models)
+        All the executors, executions and attack configs related to the plan are deleted.
+        (ON_DELETE constrain in db.Models)
 
         :param plan_id: string
         """
@@ -283,10 +971,88 @@ class CMESQLAlchemyStore(BaseJobStore):
         plan = Plan.query.get(plan_id)
         if plan:
             db.session.delete(plan)
-            db.session.commit()
+            self._plan_changed(plan_id)
+            self._commit()
+            if self._cache is not None:
+                for job in self._cache.all_jobs():
+                    if job.kwargs.get("plan_id") == plan_id:
+                        self._uncache_job(job.id)
+            self._publish([(events.PLAN_DELETED, {"id": plan_id})])
         else:
             raise PlanLookupError(plan_id)
 
+    @serialized
+    def claim_idempotency_key(self, key, fingerprint, expired_before):
+        """
+        Claim the idempotency key of a request. A key claimed before expired_before is
+        claimed again, as if it did not exist.
+
+        :param key:             Idempotency-Key header
+        :param fingerprint:     sha256 of the request
+        :param expired_before:  naive datetime in UTC
+        :return:                None if the key has been claimed, or the existing IdempotencyKey
+        """
+        existing = IdempotencyKey.query.get(key)
+        if existing is not None:
+            if existing.created >= expired_before:
+                return existing
+            db.session.delete(existing)
+            db.session.flush()
+
+        db.session.add(IdempotencyKey(key, fingerprint))
+        self._commit()
+        return None
+
+    @serialized
+    def complete_idempotency_key(self, key, status_code, headers, body):
+        """
+        Store the response of the request that claimed an idempotency key
+
+        :param key:             Idempotency-Key header
+        :param status_code:     int
+        :param headers:         dict with the headers to replay
+        :param body:            string
+        """
+        db.session.query(IdempotencyKey).filter(IdempotencyKey.key == key).update({
+            IdempotencyKey.status_code: status_code,
+            IdempotencyKey.headers: json.dumps(headers),
+            IdempotencyKey.body: body
+        }, synchronize_session=False)
+        self._commit()
+
+    @serialized
+    def release_idempotency_keys(self, keys=None):
+        """
+        Delete the claims of the idempotency keys that have no response, so the requests
+        can be retried
+
+        :param keys:    list of keys. None to release all the keys in progress
+        :return:        number of keys released
+        """
+        query = db.session.query(IdempotencyKey).filter(IdempotencyKey.status_code.is_(None))
+        if keys is not None:
+            query = query.filter(IdempotencyKey.key.in_(keys))
+        count = query.delete(synchronize_session=False)
+        self._commit()
+        return count
+
+    @serialized
+    def delete_idempotency_keys(self, before, limit):
+        """
+        Delete up to limit idempotency keys claimed before a date, in a single transaction
+
+        :param before:  naive datetime in UTC
+        :param limit:   max number of keys to delete
+        :return:        number of keys deleted
+        """
+        keys = [row.key for row in db.session.query(IdempotencyKey.key)
+                .filter(IdempotencyKey.created < before).limit(limit)]
+        if not keys:
+            return 0
+        db.session.query(IdempotencyKey).filter(IdempotencyKey.key.in_(keys)).delete(synchronize_session=False)
+        self._commit()
+        return len(keys)
+
     def __repr__(self):
         return '<%s>' % self.__class__.__name__
 
@@ -1,6 +1,180 @@
 """
 SQLAlchemy database
 """
+import logging
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
 
-db = SQLAlchemy()
+#: default storage options for SQLite databases (see :meth:`configure_sqlite`)
+STORAGE_DEFAULTS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 0,
+    "pool_size": 5
+}
+
+#: fill the executors counters of the plans from the executors and the execution history
+PLAN_COUNTERS_BACKFILL = [
+    "UPDATE cme_plans SET "
+    "pending_count = (SELECT count(*) FROM cme_executors WHERE cme_executors.plan_id = cme_plans.id "
+    "AND (cme_executors.executed IS NULL OR cme_executors.executed = 0)), "
+    "executed_count = (SELECT count(*) FROM cme_executors WHERE cme_executors.plan_id = cme_plans.id "
+    "AND cme_executors.executed = 1) "
+    "+ (SELECT count(*) FROM cme_executions WHERE cme_executions.plan_id = cme_plans.id)",
+    "UPDATE cme_plans SET executed = (pending_count = 0) WHERE pending_count > 0 OR executed_count > 0"
+]
+
+#: columns added to the tables created by older versions: (table, column, definition, statements
+#: run once after adding the columns to fill them from the existing rows)
+ADDED_COLUMNS = [
+    ("cme_plans", "pending_count", "INTEGER NOT NULL DEFAULT 0", PLAN_COUNTERS_BACKFILL),
+    ("cme_plans", "executed_count", "INTEGER NOT NULL DEFAULT 0", PLAN_COUNTERS_BACKFILL),
+    # older executors keep the attack config in their job state
+    ("cme_executors", "attack_config_id", "VARCHAR(80) REFERENCES cme_attack_configs (id)", [])
+]
+
+#: indexes of older versions replaced by the indexes of the current models
+OBSOLETE_INDEXES = ["ix_cme_executors_next_run_time", "ix_cme_executors_executed_next_run_time"]
+
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+class CMESQLAlchemy(SQLAlchemy):
+    """
+    Flask-SQLAlchemy extension that creates the engine of file databases with a
+    QueuePool of pool_size connections shared between threads, instead of opening
+    a new connection for every session.
+    """
+
+    pool_size = STORAGE_DEFAULTS["pool_size"]
+
+    def apply_driver_hacks(self, app, info, options):
+        if info.drivername == 'sqlite' and info.database not in (None, '', ':memory:') and self.pool_size:
+            options['poolclass'] = QueuePool
+            options['pool_size'] = self.pool_size
+            options.setdefault('connect_args', {})['check_same_thread'] = False
+        super(CMESQLAlchemy, self).apply_driver_hacks(app, info, options)
+
+
+db = CMESQLAlchemy()
+
+
+def storage_options(**options):
+    """
+    Return the storage options merged with the defaults. Options set to None use
+    the default value.
+
+    :return: dict
+    """
+    merged = dict(STORAGE_DEFAULTS)
+    merged.update((key, value) for key, value in options.items() if value is not None)
+    unknown = set(merged) - set(STORAGE_DEFAULTS)
+    if unknown:
+        raise ValueError("unknown storage options %s" % ", ".join(sorted(unknown)))
+    merged["journal_mode"] = merged["journal_mode"].upper()
+    merged["synchronous"] = merged["synchronous"].upper()
+    if merged["journal_mode"] not in JOURNAL_MODES:
+        raise ValueError("invalid journal_mode %s" % merged["journal_mode"])
+    if merged["synchronous"] not in SYNCHRONOUS_LEVELS:
+        raise ValueError("invalid synchronous %s" % merged["synchronous"])
+    return merged
+
+
+def configure_sqlite(engine, options=None):
+    """
+    Set the SQLite PRAGMAs used by the engine on every new connection
+
+    * auto_vacuum = INCREMENTAL: the pages freed by deletes can be returned to the
+      file system with ``PRAGMA incremental_vacuum``. It only applies to new databases,
+      existing ones need a VACUUM to switch the mode.
+
+    File databases also get the storage options:
+
+    * journal_mode: WAL lets the API read while the scheduler writes
+    * synchronous: NORMAL is safe with WAL and avoids a fsync on every commit
+    * busy_timeout: milliseconds to wait for a lock before failing with "database is locked"
+    * mmap_size: bytes of the database read through memory mapped I/O (0 disables it)
+
+    :param engine:  sqlalchemy.engine.Engine
+    :param options: storage options (see :meth:`storage_options`)
+    """
+    options = options or storage_options()
+    pragmas = ["PRAGMA auto_vacuum = INCREMENTAL"]
+    if engine.url.database not in (None, '', ':memory:'):
+        pragmas += [
+            "PRAGMA journal_mode = %s" % options["journal_mode"],
+            "PRAGMA synchronous = %s" % options["synchronous"],
+            "PRAGMA busy_timeout = %d" % int(options["busy_timeout"]),
+            "PRAGMA mmap_size = %d" % int(options["mmap_size"])
+        ]
+
+    def set_sqlite_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    event.listen(engine, "connect", set_sqlite_pragmas)
+
+
+def migrate_schema(engine):
+    """
+    Add the columns and indexes of the current models to the tables of a database created
+    by an older version, fill the new columns from the existing rows (see ADDED_COLUMNS) and
+    drop the OBSOLETE_INDEXES. ``db.create_all`` only creates the missing tables, it never
+    alters the existing ones.
+
+    It runs after ``db.create_all`` in ``configure_engine``, and again when the store is
+    started, before it reads the tables. Once migrated it only reads the table and index lists.
+
+    :param engine:  sqlalchemy.engine.Engine
+    :return:        list of the "table.column" added
+    """
+    added = []
+    backfills = []
+    with engine.begin() as connection:
+        for table, column, definition, backfill in ADDED_COLUMNS:
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(%s)" % table)]
+            if column in columns:
+                continue
+            connection.execute("ALTER TABLE %s ADD COLUMN %s %s" % (table, column, definition))
+            added.append("%s.%s" % (table, column))
+            if backfill not in backfills:
+                backfills.append(backfill)
+        for statements in backfills:
+            for statement in statements:
+                connection.execute(statement)
+        for index in OBSOLETE_INDEXES:
+            connection.execute("DROP INDEX IF EXISTS %s" % index)
+        for table in db.metadata.sorted_tables:
+            existing = set(row[1] for row in connection.execute("PRAGMA index_list(%s)" % table.name))
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+    if added:
+        logging.getLogger(__name__).info('added columns %s to the database', ", ".join(added))
+    return added
+
+
+def convert_to_incremental_vacuum(engine):
+    """
+    Convert a database created without auto_vacuum = INCREMENTAL with a full VACUUM, that
+    rewrites the whole file. It must run on startup, before the store and the scheduler
+    use the database.
+
+    :param engine:  sqlalchemy.engine.Engine
+    :return:        True if the database has been converted
+    """
+    connection = engine.raw_connection()
+    try:
+        if connection.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        logging.getLogger(__name__).info('converting the database to auto_vacuum = INCREMENTAL with a full VACUUM')
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.execute("VACUUM")
+        return True
+    finally:
+        connection.close()
@@ -0,0 +1,108 @@
+"""
+Events of the changes of the executors and plans of
+:meth:`chaosmonkey.dal.cme_sqlalchemy_store.CMESQLAlchemyStore`
+
+The store publishes an event after every write is committed. The last events are kept
+in a bounded ring buffer, so a client that reconnects to ``/api/1/events/`` with the id
+of the last event it got receives the events it has missed. Event ids are combined with
+an epoch that is different on every start, like the change versions, so an id of a
+previous run is never taken for an id of this one.
+
+Event types:
+
+* executor_added, executor_updated: an executor has been created or rescheduled
+* executor_executed: the scheduler has run the executor, it is moved to the execution history
+* executor_removed: an executor has been deleted
+* execution_recorded: the outcome of an executed executor is known (success, error or missed)
+* plan_added, plan_deleted
+* plan_executed: the last pending executor of a plan has been executed
+"""
+import threading
+import time
+from collections import deque
+from itertools import islice
+from uuid import uuid4
+
+DEFAULT_BUFFER_SIZE = 10000
+
+EXECUTOR_ADDED = "executor_added"
+EXECUTOR_UPDATED = "executor_updated"
+EXECUTOR_EXECUTED = "executor_executed"
+EXECUTOR_REMOVED = "executor_removed"
+EXECUTION_RECORDED = "execution_recorded"
+PLAN_ADDED = "plan_added"
+PLAN_DELETED = "plan_deleted"
+PLAN_EXECUTED = "plan_executed"
+
+
+class Event:
+    """
+    A change in the store
+    """
+    __slots__ = ("id", "seq", "type", "data", "time")
+
+    def __init__(self, event_id, seq, event_type, data):
+        self.id = event_id  #: id of the event, unique across restarts
+        self.seq = seq  #: sequence number of the event in this run
+        self.type = event_type
+        self.data = data  #: dict with the ids of the executor or plan and the changed values
+        self.time = time.time()
+
+    def __repr__(self):
+        return '<Event %s %s>' % (self.id, self.type)
+
+
+class EventBus:
+    """
+    Ring buffer of the last events
+
+    :param size: max number of events kept
+    """
+    def __init__(self, size=DEFAULT_BUFFER_SIZE):
+        self.epoch = uuid4().hex[:12]  #: identifies this run of the engine
+        self._events = deque(maxlen=size)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def last_seq(self):
+        """ Sequence number of the last event published, 0 if there are none """
+        return self._seq
+
+    def publish(self, events):
+        """
+        Publish a list of events
+
+        :param events:  list of (type, data) tuples
+        """
+        with self._lock:
+            for event_type, data in events:
+                self._seq += 1
+                self._events.append(Event("%s-%d" % (self.epoch, self._seq), self._seq, event_type, data))
+
+    def parse_id(self, event_id):
+        """
+        Return the sequence number of an event id of this run
+
+        :param event_id:    string
+        :return:            int, or None if the id is not from this run
+        """
+        epoch, _, seq = (event_id or "").rpartition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq):
+        """
+        Return the events published after a sequence number
+
+        :param seq:     sequence number of the last event seen
+        :return:        (list of events, True if there were events after seq that are no longer
+                        in the buffer)
+        """
+        with self._lock:
+            if seq >= self._seq:
+                return [], False
+            first = self._events[0].seq if self._events else self._seq + 1
+            missed = seq < first - 1
+            return list(islice(self._events, max(seq - first + 1, 0), None)), missed
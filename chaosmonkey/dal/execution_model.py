@@ -0,0 +1,76 @@
+from flask import request
+from chaosmonkey.api.hal import BaseDocument, Link
+from chaosmonkey.dal.database import db
+
+
+class Execution(db.Model):
+    """
+    Execution history. When an executor is executed it is moved from the executors
+    table to this table, so the executors table only holds pending executors.
+
+    Rows are inserted by the store when the scheduler processes the executor and
+    completed with the result of the attack when it finishes.
+
+    This model is only used by the cme.
+    """
+
+    __tablename__ = 'cme_executions'
+    __table_args__ = (
+        # the execution history is listed and paginated by (next_run_time, id)
+        db.Index('ix_cme_executions_next_run_time_id', 'next_run_time', 'id'),
+    )
+
+    OUTCOME_SUBMITTED = "submitted"  #: the scheduler has submitted the attack
+    OUTCOME_SUCCESS = "success"  #: the attack finished without errors
+    OUTCOME_ERROR = "error"  #: the attack raised an error
+    OUTCOME_MISSED = "missed"  #: the attack was not run because its run time was missed
+
+    id = db.Column(db.String(80), primary_key=True)  #: executor id
+    plan_id = db.Column(db.String(80), db.ForeignKey('cme_plans.id'), index=True)  #: plan id reference
+    #: attack config reference (:meth:`chaosmonkey.dal.attack_config_model.AttackConfig`)
+    attack_config_id = db.Column(db.String(80), db.ForeignKey('cme_attack_configs.id'))
+    next_run_time = db.Column(db.DateTime)  #: DateTime the executor was scheduled for
+    started = db.Column(db.DateTime)  #: DateTime the attack started
+    finished = db.Column(db.DateTime)  #: DateTime the attack finished
+    duration = db.Column(db.Float)  #: attack duration in seconds
+    outcome = db.Column(db.String(20), nullable=False)  #: one of the OUTCOME_* values
+    error = db.Column(db.Text)  #: error raised by the attack
+
+    executed = True  #: executions are always executed (same interface as Executor)
+
+    def to_dict(self):
+        """
+        Return a :meth:`chaosmonkey.api.hal.document` representation for the Execution
+
+        :return: :meth:`chaosmonkey.dal.execution_model.HalExecution`
+        """
+
+        return HalExecution(data={
+            "id": self.id,
+            "next_run_time": _format_datetime(self.next_run_time),
+            "plan_id": self.plan_id,
+            "executed": self.executed,
+            "started": _format_datetime(self.started),
+            "finished": _format_datetime(self.finished),
+            "duration": self.duration,
+            "outcome": self.outcome,
+            "error": self.error
+        }).to_dict()
+
+    def __repr__(self):
+        return '<Execution %r>' % self.id
+
+
+def _format_datetime(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%s') if value else None
+
+
+class HalExecution(BaseDocument):
+    """
+    Class to represent an Execution as a :meth:`chaosmonkey.api.hal.document`
+    """
+    def __init__(self, data=None, links=None, embedded=None):
+        super(HalExecution, self).__init__(data, links, embedded)
+
+        self.links.append(Link("self", request.path + data["id"]))
+        self.links.append(Link("delete", request.path + data["id"]))
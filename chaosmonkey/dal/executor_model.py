@@ -10,18 +10,27 @@ class Executor(db.Model):
     """
 
     __tablename__ = 'cme_executors'
+    __table_args__ = (
+        # the scheduler only looks for pending executors, ordered by next_run_time, and the
+        # executors list is paginated by (next_run_time, id)
+        db.Index('ix_cme_executors_executed_next_run_time_id', 'executed', 'next_run_time', 'id'),
+    )
 
     id = db.Column(db.String(80), primary_key=True)  #: unique identifier
-    next_run_time = db.Column(db.DateTime, index=True)  #: DateTime for the executor to be executed
+    next_run_time = db.Column(db.DateTime)  #: DateTime for the executor to be executed
     job_state = db.Column(db.LargeBinary, nullable=False)  #: store the full state of the executor (with pickle)
-    plan_id = db.Column(db.Integer, db.ForeignKey('cme_plans.id'))  #: plan id reference
+    plan_id = db.Column(db.Integer, db.ForeignKey('cme_plans.id'), index=True)  #: plan id reference
     executed = db.Column(db.Boolean)  #: if the job was executed
+    #: attack config reference (:meth:`chaosmonkey.dal.attack_config_model.AttackConfig`)
+    attack_config_id = db.Column(db.String(80), db.ForeignKey('cme_attack_configs.id'))
 
-    def __init__(self, job_id, next_run_time, plan_id, job_state=None):
+    # pylint: disable=too-many-arguments
+    def __init__(self, job_id, next_run_time, plan_id, job_state=None, attack_config_id=None):
         self.id = job_id
         self.next_run_time = next_run_time
         self.job_state = job_state
         self.plan_id = plan_id
+        self.attack_config_id = attack_config_id
         self.executed = False
 
     def to_dict(self):
@@ -0,0 +1,42 @@
+import json
+from datetime import datetime
+from chaosmonkey.dal.database import db
+
+
+class IdempotencyKey(db.Model):
+    """
+    Idempotency key of an API request, with the response to replay when the request
+    is retried with the same key.
+
+    The key is claimed when the request starts, the response is empty while the request
+    is in progress. The keys are deleted when they expire.
+
+    This model is only used by the cme.
+    """
+
+    __tablename__ = 'cme_idempotency_keys'
+
+    key = db.Column(db.String(255), primary_key=True)  #: Idempotency-Key header of the request
+    fingerprint = db.Column(db.String(64), nullable=False)  #: sha256 of the request method, url and body
+    created = db.Column(db.DateTime, nullable=False, index=True)  #: claim date (UTC)
+    status_code = db.Column(db.Integer)  #: status of the response, null while in progress
+    headers = db.Column(db.Text)  #: headers of the response serialized as json
+    body = db.Column(db.Text)  #: body of the response
+
+    def __init__(self, key, fingerprint):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.created = datetime.utcnow()
+
+    @property
+    def in_progress(self):
+        """ True while the request that claimed the key has not finished """
+        return self.status_code is None
+
+    @property
+    def response_headers(self):
+        """ Headers of the response as a dict """
+        return json.loads(self.headers) if self.headers else {}
+
+    def __repr__(self):
+        return '<IdempotencyKey %r>' % self.key
@@ -0,0 +1,135 @@
+"""
+Serialization of the executors job_state
+
+:meth:`JobStateCodec` encodes the state of an apscheduler.job.Job in a compact json
+document with only the fields of the job, prefixed with a version byte:
+
+* ``0x01``: json
+* ``0x02``: json compressed with zlib (used for documents bigger than compress_threshold)
+
+Jobs that can not be encoded as json (triggers other than date or kwargs that are not
+json serializable) are pickled. States stored with pickle (starting with the pickle
+``PROTO`` opcode ``0x80``), including the ones stored by older versions of the engine,
+are always decoded.
+"""
+import json
+import zlib
+from datetime import datetime
+
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.util import datetime_to_utc_timestamp
+from pytz import timezone
+
+try:
+    import cPickle as pickle
+except ImportError:  # pragma: nocover
+    import pickle
+
+FORMAT_JSON = 1
+FORMAT_JSON_ZLIB = 2
+PICKLE_PROTO = 0x80
+
+#: order of the job state fields in the encoded document
+FIELDS = ('id', 'func', 'executor', 'args', 'kwargs', 'name', 'misfire_grace_time', 'coalesce',
+          'max_instances', 'next_run_time', 'trigger')
+
+
+class JobStateCodec:
+    """
+    Encode and decode the job_state stored for every executor
+
+    :param pickle_protocol:     protocol used for the jobs that can not be encoded as json
+    :param compress_threshold:  compress documents bigger than this size (bytes).
+                                None to never compress
+    :param compress_level:      zlib compression level
+    """
+
+    def __init__(self, pickle_protocol=pickle.HIGHEST_PROTOCOL, compress_threshold=512, compress_level=6):
+        self.pickle_protocol = pickle_protocol
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def encode(self, job):
+        """
+        Encode the state of a job
+
+        :param job: apscheduler.job.Job
+        :return:    bytes
+        """
+        state = job.__getstate__()
+        try:
+            document = json.dumps([self._encode_field(field, state[field]) for field in FIELDS],
+                                  separators=(',', ':')).encode('utf-8')
+        except (TypeError, ValueError):
+            return pickle.dumps(state, self.pickle_protocol)
+
+        if self.compress_threshold is not None and len(document) > self.compress_threshold:
+            return bytes([FORMAT_JSON_ZLIB]) + zlib.compress(document, self.compress_level)
+        return bytes([FORMAT_JSON]) + document
+
+    def decode(self, job_state):
+        """
+        Decode a job_state returned by :meth:`encode` or pickled by older versions
+
+        :param job_state:   bytes
+        :return:            dict with the state for apscheduler.job.Job.__setstate__
+        """
+        version = job_state[0]
+        if version == PICKLE_PROTO:
+            return pickle.loads(job_state)
+        elif version == FORMAT_JSON:
+            document = job_state[1:]
+        elif version == FORMAT_JSON_ZLIB:
+            document = zlib.decompress(job_state[1:])
+        else:
+            raise ValueError('Unknown job_state format %d' % version)
+
+        values = json.loads(document.decode('utf-8'))
+        datetimes = {}  # next_run_time and run_date are usually the same value, decode it once
+        state = dict((field, self._decode_field(field, value, datetimes)) for field, value in zip(FIELDS, values))
+        state['version'] = 1
+        return state
+
+    @staticmethod
+    def _encode_field(field, value):
+        if field == 'trigger':
+            if type(value) is not DateTrigger:  # pylint: disable=unidiomatic-typecheck
+                raise TypeError('Only date triggers can be encoded')
+            return _encode_datetime(value.run_date)
+        elif field == 'next_run_time':
+            return _encode_datetime(value)
+        return value
+
+    @staticmethod
+    def _decode_field(field, value, datetimes):
+        if field == 'trigger':
+            trigger = DateTrigger.__new__(DateTrigger)
+            trigger.__setstate__({'version': 1, 'run_date': _decode_datetime(value, datetimes)})
+            return trigger
+        elif field == 'next_run_time':
+            return _decode_datetime(value, datetimes)
+        elif field == 'args':
+            return tuple(value)
+        return value
+
+
+def _encode_datetime(value):
+    """
+    Encode an aware datetime as [utc timestamp, timezone name]
+    """
+    if value is None:
+        return None
+    zone = getattr(value.tzinfo, 'zone', None)
+    if zone is None:
+        raise TypeError('Only pytz timezones can be encoded')
+    return [datetime_to_utc_timestamp(value), zone]
+
+
+def _decode_datetime(value, datetimes):
+    if value is None:
+        return None
+    timestamp, zone = value
+    key = (timestamp, zone)
+    if key not in datetimes:
+        datetimes[key] = datetime.fromtimestamp(timestamp, timezone(zone))
+    return datetimes[key]
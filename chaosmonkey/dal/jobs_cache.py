@@ -0,0 +1,148 @@
+"""
+In memory cache of the pending jobs used by :meth:`chaosmonkey.dal.cme_sqlalchemy_store.CMESQLAlchemyStore`
+
+The jobs are kept in a dict by id and their run times in a heap, so the scheduler
+can find the due jobs and the next wakeup time without touching the database.
+
+The cache keeps its own copies of the jobs and returns copies, so the changes the
+scheduler makes to a job before writing it (``job._modify``) only reach the cache when
+the store commits the write. If the write fails the cache keeps the committed job.
+"""
+import heapq
+import threading
+
+from apscheduler.job import Job
+from apscheduler.util import datetime_to_utc_timestamp
+
+COMPACT_MIN_ENTRIES = 64  #: stale heap entries always tolerated, so small heaps are not built again on every change
+
+
+class JobsCache:
+    """
+    Pending apscheduler.job.Job objects indexed by id and ordered by next_run_time.
+
+    The heap is never updated in place: when a job is updated or removed its old
+    heap entry becomes stale and is discarded when it reaches the top of the heap.
+    The heap is built again from the cached jobs when it has more stale entries than
+    live ones, so jobs rescheduled far in the future do not make it grow forever.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._run_times = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def add(self, job):
+        """
+        Add or replace a job
+
+        :param job: apscheduler.job.Job
+        """
+        job = _copy(job)
+        with self._lock:
+            self._jobs[job.id] = job
+            if job.next_run_time is not None:
+                heapq.heappush(self._run_times, (datetime_to_utc_timestamp(job.next_run_time), job.id))
+            self._compact()
+
+    def remove(self, job_id):
+        """
+        Remove a job from the cache
+
+        :param job_id: string
+        :return: True if the job was in the cache
+        """
+        with self._lock:
+            removed = self._jobs.pop(job_id, None) is not None
+            self._compact()
+            return removed
+
+    def clear(self):
+        """
+        Remove all jobs
+        """
+        with self._lock:
+            self._jobs = {}
+            self._run_times = []
+
+    def get(self, job_id):
+        """
+        Return a copy of a job by its id or None if it is not in the cache
+        """
+        job = self._jobs.get(job_id)
+        return _copy(job) if job is not None else None
+
+    def due_jobs(self, now):
+        """
+        Return copies of the jobs with next_run_time <= now, ordered by next_run_time
+        """
+        timestamp = datetime_to_utc_timestamp(now)
+        due = []
+        with self._lock:
+            while self._run_times and self._run_times[0][0] <= timestamp:
+                entry = heapq.heappop(self._run_times)
+                job = self._job_for(entry)
+                if job is not None and (not due or due[-1][1] is not job):
+                    due.append((entry, job))
+
+            # due jobs stay in the heap until they are updated or removed
+            for entry, _ in due:
+                heapq.heappush(self._run_times, entry)
+
+        return [_copy(job) for _, job in due]
+
+    def next_run_time(self):
+        """
+        Return the earliest next_run_time of the cached jobs or None if there are no scheduled jobs
+        """
+        with self._lock:
+            while self._run_times:
+                job = self._job_for(self._run_times[0])
+                if job is not None:
+                    return job.next_run_time
+                heapq.heappop(self._run_times)
+        return None
+
+    def all_jobs(self):
+        """
+        Return copies of all the jobs ordered by next_run_time, paused jobs (without next_run_time) last
+        """
+        with self._lock:
+            jobs = [_copy(job) for job in self._jobs.values()]
+        return sorted(jobs, key=lambda job: (job.next_run_time is None,
+                                             datetime_to_utc_timestamp(job.next_run_time) or 0))
+
+    def _job_for(self, entry):
+        """
+        Return the job of a heap entry, or None if the entry is stale
+        """
+        timestamp, job_id = entry
+        job = self._jobs.get(job_id)
+        if job is None or job.next_run_time is None or datetime_to_utc_timestamp(job.next_run_time) != timestamp:
+            return None
+        return job
+
+    def _compact(self):
+        """
+        Build the heap again from the cached jobs when most of its entries are stale
+        """
+        if len(self._run_times) <= 2 * len(self._jobs) + COMPACT_MIN_ENTRIES:
+            return
+        self._run_times = [(datetime_to_utc_timestamp(job.next_run_time), job.id)
+                           for job in self._jobs.values() if job.next_run_time is not None]
+        heapq.heapify(self._run_times)
+
+
+def _copy(job):
+    """
+    Return a shallow copy of a job. The scheduler replaces the attributes of a job when
+    it modifies it, it never changes them in place, so the attribute values can be shared.
+    """
+    copy = Job.__new__(Job)
+    for name in Job.__slots__:
+        if hasattr(job, name):
+            setattr(copy, name, getattr(job, name))
+    return copy
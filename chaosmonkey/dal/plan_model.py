@@ -5,6 +5,8 @@ from flask import request
 from chaosmonkey.api.hal import BaseDocument, Link
 from chaosmonkey.dal.database import db
 from chaosmonkey.dal.executor_model import Executor
+from chaosmonkey.dal.attack_config_model import AttackConfig
+from chaosmonkey.dal.execution_model import Execution
 
 
 class Plan(db.Model):
@@ -19,14 +21,18 @@ class Plan(db.Model):
     name = db.Column(db.String(200), unique=False)  #: plan name
     created = db.Column(db.DateTime, unique=True)  #: creation datetime
     executed = db.Column(db.Boolean)  #: if all the executors in the plan has been executed
+    pending_count = db.Column(db.Integer, nullable=False, default=0)  #: number of pending executors
+    executed_count = db.Column(db.Integer, nullable=False, default=0)  #: number of executed executors
 
     next_execution = None  #: DateTime for the next executor execution time
-    executors_count = None  #: number of pending executors
 
     jobs = relationship(Executor, cascade='all, delete, delete-orphan')
+    attack_configs = relationship(AttackConfig, cascade='all, delete, delete-orphan')
+    executions = relationship(Execution, cascade='all, delete, delete-orphan')
 
     # pylint: disable=too-many-arguments
-    def __init__(self, _id=None, name=None, created=None, next_execution=None, executors_count=0, executed=False):
+    def __init__(self, _id=None, name=None, created=None, next_execution=None, pending_count=0, executed_count=0,
+                 executed=False):
         self.id = _id or uuid4().hex
         self.name = name
         if created:
@@ -35,7 +41,15 @@ class Plan(db.Model):
             self.created = datetime.utcnow()
         self.executed = executed
         self.next_execution = next_execution
-        self.executors_count = executors_count
+        self.pending_count = pending_count
+        self.executed_count = executed_count
+
+    @property
+    def executors_count(self):
+        """
+        Number of executors in the plan (pending and executed)
+        """
+        return (self.pending_count or 0) + (self.executed_count or 0)
 
     def to_dict(self):
         """
@@ -0,0 +1,215 @@
+"""
+Admission of the attacks.
+
+Limits the number of attacks running at the same time:
+
+* per attack ref, eg. at most 2 TerminateEC2Instance attacks at once
+* per attack ref and target, eg. at most 1 TerminateEC2Instance attack against the same ASG.
+  The target of an attack is given by :meth:`chaosmonkey.attacks.attack.Attack.target_key`
+
+Attacks over a limit wait in a FIFO queue without holding a pool thread, so a burst of
+attacks with the same ref does not take the threads of the other attacks. An attack is
+admitted when all its keys have a free slot and no attack queued before it is waiting for
+any of its keys, so attacks with the same key are admitted in the order they arrived. When
+an attack finishes, the attacks it admits are sent back to their pool to run.
+
+The queue depth and wait times of every key are available at ``/api/1/attacks/admission/``
+to size the limits.
+"""
+import logging
+import threading
+import time
+
+
+def parse_limit(spec):
+    """
+    Parse an attack limit from the command line
+
+    :param spec:    string ``ref=limit`` (eg. ``terminate_ec2_instance:TerminateEC2Instance=2``)
+    :return:        (ref, limit)
+    """
+    try:
+        ref, limit = spec.rsplit("=", 1)
+        limit = int(limit)
+    except ValueError:
+        raise ValueError("invalid attack limit %s, expected ref=limit" % spec)
+    if not ref:
+        raise ValueError("invalid attack limit %s, the ref is empty" % spec)
+    if limit < 1:
+        raise ValueError("invalid attack limit %d for %s" % (limit, ref))
+    return ref, limit
+
+
+class AdmissionController:
+    """
+    Concurrency limits of the attacks with queued admission
+    """
+    def __init__(self):
+        self.attack_limits = {}
+        self.target_limit = None
+        self._lock = threading.Lock()
+        self._queue = []
+        self._running = {}
+        self._stats = {}
+        self.log = logging.getLogger(__name__)
+
+    def configure(self, attack_limits=None, target_limit=None):
+        """
+        Configure the limits. Attacks without limits are admitted right away.
+
+        :param attack_limits:   dict attack ref -> max attacks with that ref running at the same time
+        :param target_limit:    max attacks with the same ref and target key running at the same time
+        """
+        with self._lock:
+            self.attack_limits = dict(attack_limits or {})
+            self.target_limit = target_limit
+            self._stats = {}
+        for ref, limit in self.attack_limits.items():
+            self.log.info('attack %s limited to %d concurrent runs', ref, limit)
+        if target_limit:
+            self.log.info('attacks limited to %d concurrent runs per target', target_limit)
+
+    def keys_for(self, attack_class, attack_args):
+        """
+        Return the limited keys of an attack
+
+        :param attack_class:    chaosmonkey.attacks.attack.Attack subclass
+        :param attack_args:     attack args of the attack config
+        :return:                list of (key, limit)
+        """
+        if not self.attack_limits and not self.target_limit:
+            return []
+
+        ref = getattr(attack_class, "ref", None) or "%s:%s" % (attack_class.__module__, attack_class.__name__)
+        keys = []
+        if ref in self.attack_limits:
+            keys.append((ref, self.attack_limits[ref]))
+        if self.target_limit:
+            target = attack_class.target_key(attack_args)
+            if target is not None:
+                keys.append(("%s@%s" % (ref, target), self.target_limit))
+        return keys
+
+    def run(self, attack_class, attack_args, attack, dispatch):
+        """
+        Run an attack if it is admitted, or queue it without holding the calling thread.
+        A queued attack is handed to dispatch once it is admitted, and its slots are freed
+        when it finishes.
+
+        :param attack_class:    chaosmonkey.attacks.attack.Attack subclass
+        :param attack_args:     attack args of the attack config
+        :param attack:          callable that runs the attack, receives the number of seconds it has been queued
+        :param dispatch:        callable that runs a callable without args in a pool thread
+        :return:                True if the attack ran in the calling thread, False if it was queued
+        """
+        keys = self.keys_for(attack_class, attack_args)
+        if not keys:
+            attack(0)
+            return True
+
+        waiter = _Waiter(keys, attack, dispatch)
+        with self._lock:
+            for key, limit in keys:
+                stats = self._key_stats(key, limit)
+                stats["queued"] += 1
+                stats["max_queued"] = max(stats["max_queued"], stats["queued"])
+            self._queue.append(waiter)
+            admitted = self._admit_queued()
+
+        self._dispatch([queued for queued in admitted if queued is not waiter])
+        if waiter not in admitted:
+            self.log.debug('attack %s queued', ", ".join(sorted(waiter.keys)))
+            return False
+        self._run_admitted(waiter)
+        return True
+
+    def stats(self):
+        """
+        Return the admission stats of every key that has been limited
+
+        :return: list of dicts sorted by key
+        """
+        with self._lock:
+            return [{
+                "key": key,
+                "limit": stats["limit"],
+                "running": self._running.get(key, 0),
+                "queued": stats["queued"],
+                "max_queued": stats["max_queued"],
+                "admitted": stats["admitted"],
+                "mean_wait": round(stats["total_wait"] / stats["admitted"], 3) if stats["admitted"] else 0.0,
+                "max_wait": round(stats["max_wait"], 3)
+            } for key, stats in sorted(self._stats.items())]
+
+    def _admit_queued(self):
+        # called with the lock held, admits the queued attacks in order. An attack is admitted
+        # when all its keys have a free slot and no attack queued before it waits for any of them
+        admitted, blocked = [], set()
+        now = time.time()
+        for waiter in list(self._queue):
+            if not blocked & waiter.keys and \
+                    all(self._running.get(key, 0) < limit for key, limit in waiter.limits):
+                self._queue.remove(waiter)
+                waiter.waited = now - waiter.queued
+                for key, limit in waiter.limits:
+                    self._running[key] = self._running.get(key, 0) + 1
+                    stats = self._key_stats(key, limit)
+                    stats["queued"] -= 1
+                    stats["admitted"] += 1
+                    stats["total_wait"] += waiter.waited
+                    stats["max_wait"] = max(stats["max_wait"], waiter.waited)
+                admitted.append(waiter)
+            else:
+                blocked |= waiter.keys
+        return admitted
+
+    def _run_admitted(self, waiter):
+        if waiter.waited > 0.001:
+            self.log.info('attack %s admitted after %.3fs queued', ", ".join(sorted(waiter.keys)), waiter.waited)
+        try:
+            waiter.attack(waiter.waited)
+        finally:
+            self._release(waiter)
+
+    def _run_queued(self, waiter):
+        # runs in a pool thread, nobody waits for the result of a queued attack
+        try:
+            self._run_admitted(waiter)
+        except Exception:  # pylint: disable=broad-except
+            self.log.exception('queued attack %s failed', ", ".join(sorted(waiter.keys)))
+
+    def _dispatch(self, waiters):
+        for waiter in waiters:
+            try:
+                waiter.dispatch(lambda waiter=waiter: self._run_queued(waiter))
+            except Exception:  # pylint: disable=broad-except
+                self.log.exception('unable to dispatch the queued attack %s', ", ".join(sorted(waiter.keys)))
+                self._release(waiter)
+
+    def _release(self, waiter):
+        with self._lock:
+            for key, _ in waiter.limits:
+                self._running[key] -= 1
+            admitted = self._admit_queued()
+        self._dispatch(admitted)
+
+    def _key_stats(self, key, limit):
+        if key not in self._stats:
+            self._stats[key] = {"limit": limit, "queued": 0, "max_queued": 0, "admitted": 0,
+                                "total_wait": 0.0, "max_wait": 0.0}
+        self._stats[key]["limit"] = limit
+        return self._stats[key]
+
+
+class _Waiter:
+    # queued attacks are compared by identity, several attacks can wait for the same keys
+    def __init__(self, limits, attack, dispatch):
+        self.limits = limits
+        self.keys = frozenset(key for key, _ in limits)
+        self.attack = attack
+        self.dispatch = dispatch
+        self.queued = time.time()
+        self.waited = 0.0
+
+
+admission = AdmissionController()
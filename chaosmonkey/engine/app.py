@@ -4,25 +4,48 @@ ChaosMonkey Engine
 import os
 import errno
 from pytz import timezone
+from apscheduler.events import EVENT_JOB_MISSED
+from apscheduler.jobstores.memory import MemoryJobStore
 
 from chaosmonkey.api.app import flask_app
 from chaosmonkey.engine.cme_manager import manager
 from chaosmonkey.engine.scheduler import scheduler
+from chaosmonkey.engine.pools import pools as attack_pools
+from chaosmonkey.engine.admission import admission
+from chaosmonkey.engine.modules_reloader import reloader
+from chaosmonkey.engine.retention import retention
+from chaosmonkey.engine.plan_tasks import plan_tasks, DEFAULT_WORKERS
+from chaosmonkey.engine.idempotency import idempotency_keys, DEFAULT_TTL_HOURS
+from chaosmonkey.engine.metrics import metrics
 from chaosmonkey.attacks.attack import Attack
 from chaosmonkey.dal.cme_sqlalchemy_store import CMESQLAlchemyStore
-from chaosmonkey.dal.database import db
+from chaosmonkey.dal.database import db, configure_sqlite, storage_options, migrate_schema, \
+    convert_to_incremental_vacuum
+from chaosmonkey.dal.events import DEFAULT_BUFFER_SIZE
 from chaosmonkey.modules.module_store import ModulesStore
 from chaosmonkey.planners.planner import Planner
 
 
-def configure_engine(database_uri, attacks_folder, planners_folder, cme_timezone):
+# pylint: disable=too-many-arguments
+def configure_engine(database_uri, attacks_folder, planners_folder, cme_timezone, cache_jobs=False,
+                     retention_days=None, storage=None, pools=None, attack_limits=None, target_limit=None,
+                     reload_interval=None, lazy_modules=False, plan_workers=DEFAULT_WORKERS,
+                     idempotency_ttl=DEFAULT_TTL_HOURS, events_buffer=DEFAULT_BUFFER_SIZE,
+                     convert_auto_vacuum=False):
     """
     Create a Flask App and all the configuration needed to run the CMEEngine
 
-    * Init and configure the SQLAlchemy store (create db and tables if don't exists)
+    * Init and configure the SQLAlchemy store (create db and tables if don't exists, and add the
+      new columns to the tables created by older versions)
     * Init ModuleStores (attacks and planners)
-    * Configure the timezone and jobstore for the scheduler
+    * Configure the timezone, jobstores and attack pools for the scheduler
     * Configure the CMEManager
+    * Configure the retention of the execution history
+    * Configure the concurrency limits of the attacks
+    * Configure the hot reload of the attacks and planners modules
+    * Configure the workers of the asynchronous plan creation
+    * Configure the TTL of the idempotency keys of the API requests
+    * Configure the gauges of the metrics
 
     TODO:
         The scheduler start is not made until the first request is made. This is due to
@@ -33,6 +56,28 @@ def configure_engine(database_uri, attacks_folder, planners_folder, cme_timezone
     :param attacks_folder:  folder to load the attacks modules
     :param planners_folder: folder to load the planners modules
     :param cme_timezone:    timezone to set in the scheduler
+    :param cache_jobs:      keep the pending executors in memory to serve the scheduler reads
+    :param retention_days:  days to keep the execution history and the executed plans. None to keep them forever
+    :param storage:         dict with SQLite storage options (journal_mode, synchronous, busy_timeout,
+                            mmap_size and pool_size). See :meth:`chaosmonkey.dal.database.configure_sqlite`
+    :param pools:           dict name -> (kind, size) with the pools to run the attacks, kind is thread or
+                            process. See :meth:`chaosmonkey.engine.pools`
+    :param attack_limits:   dict attack ref -> max attacks with that ref running at the same time
+    :param target_limit:    max attacks with the same ref and target running at the same time.
+                            See :meth:`chaosmonkey.engine.admission`
+    :param reload_interval: seconds between checks for changed attacks and planners modules. None to
+                            disable the hot reload. See :meth:`chaosmonkey.engine.modules_reloader`
+    :param lazy_modules:    import the attacks and planners modules the first time they are used instead of
+                            on startup. See :meth:`chaosmonkey.modules.module_store`
+    :param plan_workers:    threads that run the planners of the plans created asynchronously.
+                            See :meth:`chaosmonkey.engine.plan_tasks`
+    :param idempotency_ttl: hours to keep the idempotency keys of the API requests.
+                            See :meth:`chaosmonkey.engine.idempotency`
+    :param events_buffer:   number of events of the executors and plans kept for the clients of
+                            ``/api/1/events/`` that reconnect. See :meth:`chaosmonkey.dal.events`
+    :param convert_auto_vacuum: convert a database created without auto_vacuum = INCREMENTAL with a
+                            full VACUUM before starting, so the retention can return the free pages
+                            to the file system. See :meth:`chaosmonkey.dal.database.convert_to_incremental_vacuum`
     """
 
     # configure and init FlaskSQLAlchemy
@@ -42,22 +87,30 @@ def configure_engine(database_uri, attacks_folder, planners_folder, cme_timezone
 
     flask_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///%s" % database_uri
     flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    options = storage_options(**(storage or {}))
+    db.pool_size = options["pool_size"]
     db.init_app(flask_app)
     with flask_app.app_context():
+        configure_sqlite(db.engine, options)
         db.create_all()
+        migrate_schema(db.engine)
+        if convert_auto_vacuum:
+            convert_to_incremental_vacuum(db.engine)
         db.app = flask_app
 
     # init stores
-    sql_store = CMESQLAlchemyStore()
-    planners_store = ModulesStore(Planner)
-    attacks_store = ModulesStore(Attack)
+    sql_store = CMESQLAlchemyStore(cache_jobs=cache_jobs, events_size=events_buffer)
+    planners_store = ModulesStore(Planner, lazy=lazy_modules)
+    attacks_store = ModulesStore(Attack, lazy=lazy_modules)
 
     # configure the scheduler
     tz = timezone(cme_timezone)
     jobstores = {
-        "default": sql_store
+        "default": sql_store,
+        "internal": MemoryJobStore()  # engine jobs, not persisted
     }
-    scheduler.configure(jobstores=jobstores, timezone=tz)
+    scheduler.configure(jobstores=jobstores, executors=attack_pools.configure(pools), timezone=tz)
+    scheduler.add_listener(sql_store.job_missed, EVENT_JOB_MISSED)
 
     # configure module stores
     attacks_store.load(attacks_folder)
@@ -66,6 +119,24 @@ def configure_engine(database_uri, attacks_folder, planners_folder, cme_timezone
     # configure CMEManager
     manager.configure(scheduler, sql_store, planners_store, attacks_store)
 
+    # configure the retention job
+    retention.configure(scheduler, sql_store, retention_days)
+
+    # configure the attacks admission
+    admission.configure(attack_limits, target_limit)
+
+    # configure the modules hot reload
+    reloader.configure(scheduler, {"attacks": attacks_store, "planners": planners_store}, reload_interval)
+
+    # configure the asynchronous plan creation
+    plan_tasks.configure(manager, plan_workers)
+
+    # configure the idempotency keys
+    idempotency_keys.configure(scheduler, sql_store, idempotency_ttl)
+
+    # configure the metrics gauges
+    metrics.configure(sql_store, attack_pools)
+
 
 # Start the scheduler in the first request
 @flask_app.before_first_request
@@ -76,10 +147,12 @@ def start_scheduler():
 
 def shutdown_engine():
     """
-    Shutdown the scheduler
+    Shutdown the plan workers, the scheduler and the attack pools
     """
+    plan_tasks.shutdown()
     if scheduler.running:
         scheduler.shutdown()
+    attack_pools.shutdown()
 
 
 def make_sure_path_exists(path):
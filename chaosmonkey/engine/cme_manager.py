@@ -4,10 +4,17 @@ CME Manager
 Control layer for CME Engine
 """
 import logging
+import threading
+from contextlib import contextmanager
+from uuid import uuid4
 
-from jsonschema import validate, ValidationError
+from jsonschema import ValidationError
+from chaosmonkey.dal.attack_config_model import AttackConfig
 from chaosmonkey.dal.executor_model import Executor
+from chaosmonkey.dal.plan_model import Plan
 from chaosmonkey.api.api_errors import APIError
+from chaosmonkey.api.request_validator import validators
+from chaosmonkey.engine.pools import pools, DEFAULT_POOL
 from chaosmonkey.modules.module_store import ModuleLookupError
 
 
@@ -33,6 +40,7 @@ class CMEManager:
         self._sql_store = None
         self._planners_store = None
         self._attacks_store = None
+        self._batch = threading.local()
         self.log = logging.getLogger(__name__)
 
     def configure(self, scheduler, sql_store, planners_store, attacks_store):
@@ -71,12 +79,21 @@ class CMEManager:
         """ SQLstore property """
         return self._sql_store
 
-    def get_executors(self, executed=False):
+    @property
+    def events(self):
+        """ Events of the store, see :meth:`chaosmonkey.dal.events.EventBus` """
+        return self._sql_store.events
+
+    def get_executors(self, executed=False, **filters):
         """
         Return a list of Executor objects created in DB
+
+        :param executed:    return the executed executors from the execution history
+        :param filters:     pagination and filters, see
+                            :meth:`chaosmonkey.dal.cme_sqlalchemy_store.CMESQLAlchemyStore.get_executors`
         :return: chaosmonkey.dal.executor.Executor list
         """
-        return self._sql_store.get_executors(executed=executed)
+        return self._sql_store.get_executors(executed=executed, **filters)
 
     def get_executor(self, executor_id):
         """
@@ -103,40 +120,223 @@ class CMEManager:
         job = self._scheduler.reschedule_job(job_id=executor_id, trigger=trigger)
         return self._job_to_executor(job)
 
+    def reschedule_executors(self, executor_ids, trigger_for):
+        """
+        Reschedule a list of pending executors in a single transaction, waking up the
+        scheduler only once
+
+        :param executor_ids:    list of executor ids
+        :param trigger_for:     function that returns the new trigger of the job of an executor
+                                (apscheduler.triggers.BaseTrigger)
+        :return:                (chaosmonkey.dal.executor.Executor list, list of the ids not found)
+        """
+        jobs, missing = self._scheduler.reschedule_jobs(executor_ids, trigger_for)
+        return [self._job_to_executor(job) for job in jobs], missing
+
+    def remove_executors(self, executor_ids):
+        """
+        Removes a list of executors, pending or executed (from the execution history),
+        in a single transaction
+
+        :param executor_ids:    list of executor ids
+        :return:                (list of the ids removed, list of the ids not found)
+        """
+        removed = self.sql_store.real_remove_jobs(executor_ids)
+        found = set(removed)
+        return removed, [executor_id for executor_id in executor_ids if executor_id not in found]
+
+    def get_executor_ids(self, **filters):
+        """
+        Return the ids of the pending executors matching the filters
+
+        :param filters: plan_id, run_from, run_to and attack_ref. See
+                        :meth:`chaosmonkey.dal.cme_sqlalchemy_store.CMESQLAlchemyStore.get_executor_ids`
+        :return:        list of strings
+        """
+        return self._sql_store.get_executor_ids(**filters)
+
     def remove_executor(self, executor_id):
         """
-        Removes an executor by his ID
+        Removes an executor by his ID, pending or executed (from the execution history)
         :param executor_id:
         :return:
         """
-        self._scheduler.remove_job(job_id=executor_id)
         self.sql_store.real_remove_job(job_id=executor_id)
 
     def add_executor(self, date, name, attack_config, plan_id):
         """
         Adds a new executor to the scheduler
 
+        Inside :meth:`executors_batch` the executor is not added right away, it is
+        buffered with its attack config and added with the rest of the batch when the
+        context exits.
+
+        The attack config is stored once per plan (see :meth:`_attack_config_id`) and
+        the executor only keeps a reference to it.
+
         :param date:            Datetime to execute the job
         :param name:            Executor name
         :param attack_config:   Attack config. Dict to be passed to the executor on execution time
         :param plan_id:         Referenced plan id
         :return:                chaosmonkey.dal.executor.Executor
         """
-        from chaosmonkey.attacks.executor import execute
         self.log.debug('add scheduled job %s at %s', name, date)
-        job = self._scheduler.add_job(
-            execute,
-            name=name,
-            kwargs={
-                "attack_config": attack_config,
-                "plan_id": plan_id
-            },
-            trigger='date',
-            run_date=date
-        )
-
+        batch = getattr(self._batch, "current", None)
+        if batch is not None:
+            job_kwargs = self._executor_job_kwargs(date, name, None, plan_id, self._executor_pool(attack_config))
+            batch.add_job(job_kwargs, attack_config, plan_id)
+            return Executor(job_kwargs["id"], date, plan_id)
+
+        with self._store_transaction():
+            attack_config_id = self._attack_config_id(attack_config, plan_id)
+            job = self._scheduler.add_job(**self._executor_job_kwargs(date, name, attack_config_id, plan_id,
+                                                                      self._executor_pool(attack_config)))
         return self._job_to_executor(job)
 
+    def add_executors(self, executors):
+        """
+        Adds a list of executors to the scheduler. All the executors are stored
+        in a single transaction.
+
+        :param executors:   list of (date, name, attack_config, plan_id) tuples.
+                            See :meth:`add_executor`
+        :return:            list of chaosmonkey.dal.executor.Executor
+        """
+        self.log.debug('add %d scheduled jobs', len(executors))
+        known_configs = {}
+        jobs_kwargs = []
+        with self._store_transaction():
+            for date, name, attack_config, plan_id in executors:
+                attack_config_id = self._attack_config_id(attack_config, plan_id, known_configs)
+                jobs_kwargs.append(self._executor_job_kwargs(date, name, attack_config_id, plan_id,
+                                                             self._executor_pool(attack_config)))
+            jobs = self._scheduler.add_jobs(jobs_kwargs)
+        return [self._job_to_executor(job) for job in jobs]
+
+    @contextmanager
+    def executors_batch(self):
+        """
+        Context manager to buffer the plans added with :meth:`add_plan` and the executors
+        added with :meth:`add_executor` in the current thread, and store them at once on exit.
+
+        Nothing is written while the block runs, so slow planners do not hold the scheduler
+        or the store locks. On exit the plans, attack configs and executors are stored in a
+        single short transaction (see :meth:`_store_batches`). If the context exits with an
+        exception nothing is stored. Nested batches are merged in the outermost one.
+
+        The context value is a dict with the ids of the plans added in the batch and the
+        number of executors, filled when the context exits (None for nested batches).
+        """
+        with self._buffered() as batch:
+            if batch is None:
+                yield None
+                return
+            result = {"plans": [], "executors": 0}
+            yield result
+        self._store_batches([batch])
+        result.update(batch.result())
+
+    @contextmanager
+    def _buffered(self):
+        """
+        Context manager that buffers the writes of the current thread in a :class:`_Batch`,
+        the context value. None if the thread is already buffering.
+        """
+        if getattr(self._batch, "current", None) is not None:
+            yield None
+            return
+
+        batch = self._batch.current = _Batch()
+        try:
+            yield batch
+        finally:
+            self._batch.current = None
+
+    def _store_batches(self, batches):
+        """
+        Store the plans, attack configs and executors of a list of batches in a single
+        store transaction, adding all the jobs to the scheduler at once
+
+        :param batches: list of :class:`_Batch`
+        """
+        jobs = []
+        with self._store_transaction():
+            for batch in batches:
+                for plan in batch.plans:
+                    self._sql_store.add_plan(plan.name, plan.id)
+                config_ids = dict((key, self._sql_store.add_attack_config(key[0], attack_config).id)
+                                  for key, attack_config in batch.attack_configs.items())
+                for job_kwargs, key in batch.jobs:
+                    job_kwargs["kwargs"]["attack_config_id"] = config_ids[key]
+                    jobs.append(job_kwargs)
+            if jobs:
+                self.log.debug('add batch of %d scheduled jobs', len(jobs))
+                self._scheduler.add_jobs(jobs)
+
+    @contextmanager
+    def _store_transaction(self):
+        """
+        Context manager for a store transaction that adds jobs to the scheduler. The job
+        stores lock is taken first (see :meth:`chaosmonkey.engine.scheduler.CMEScheduler.jobstores_locked`)
+        """
+        with self._scheduler.jobstores_locked(), self._sql_store.transaction():
+            yield
+
+    def _attack_config_id(self, attack_config, plan_id, known_configs=None):
+        """
+        Return the id of the stored attack config for a plan, storing it if needed.
+        Called inside a store transaction, so a new config is only flushed and committed
+        with the executors that reference it.
+
+        :param attack_config:   Attack config dict
+        :param plan_id:         Referenced plan id
+        :param known_configs:   optional dict (plan_id, serialized config) -> id, to avoid
+                                looking up the same config for every executor in a batch
+        :return:                string
+        """
+        if known_configs is None:
+            return self._sql_store.add_attack_config(plan_id, attack_config).id
+
+        key = (plan_id, AttackConfig.serialize(attack_config))
+        if key not in known_configs:
+            known_configs[key] = self._sql_store.add_attack_config(plan_id, attack_config).id
+        return known_configs[key]
+
+    def _executor_pool(self, attack_config):
+        """
+        Return the name of the pool that runs the attack of an attack config
+
+        :param attack_config:   Attack config dict
+        :return:                string
+        """
+        ref = attack_config.get("ref") if attack_config else None
+        try:
+            attack_class = self._attacks_store.get(ref) if ref else None
+        except (TypeError, ValueError, ModuleLookupError):
+            attack_class = None
+        return pools.pool_for(attack_class)
+
+    @staticmethod
+    def _executor_job_kwargs(date, name, attack_config_id, plan_id, executor_pool=DEFAULT_POOL):
+        """
+        Return the kwargs used to add the job for an executor to the scheduler
+        """
+        from chaosmonkey.attacks.executor import execute
+        executor_id = uuid4().hex
+        return {
+            "func": execute,
+            "id": executor_id,
+            "name": name,
+            "executor": executor_pool,
+            "kwargs": {
+                "attack_config_id": attack_config_id,
+                "plan_id": plan_id,
+                "executor_id": executor_id
+            },
+            "trigger": 'date',
+            "run_date": date
+        }
+
     def get_attack_list(self):
         """
         Return a list with all attacks loaded in the self._attacks_store
@@ -159,11 +359,75 @@ class CMEManager:
         """
         Execute a plan with a planner and executor config to create executors based on the configs
 
-        It also validates the planner and executor config against the modules
+        It also validates the planner and executor config against the modules.
+        All the executors created by the planner are added in a single batch
+        (see :meth:`executors_batch`)
+
+        :param name:                Plan name
+        :param planner_config:      Dict with planner config
+        :param attack_config:       Dict with attack config
+        """
+        planner = self._validated_planner(name, planner_config, attack_config)
+        with self.executors_batch():
+            planner.plan(planner_config, attack_config)
+
+    def execute_plans(self, plans):
+        """
+        Execute a list of plans, storing all the plans and executors in a single transaction.
+
+        All the plans are validated before running any planner. The planners run one after
+        another without any lock, and their plans and executors are stored once all of them
+        succeed. If a plan is invalid or a planner fails nothing is stored, and the error has
+        the index of the plan. The scheduler is woken up once, after the commit.
+
+        :param plans:   list of (name, planner_config, attack_config) tuples. See :meth:`execute_plan`
+        :return:        list with a dict for each plan, with the ids of the plans created by
+                        the planner and the number of executors
+        :raises:        chaosmonkey.api.api_errors.APIError with the errors of the invalid plans
+        """
+        planners = []
+        errors = []
+        for index, (name, planner_config, attack_config) in enumerate(plans):
+            try:
+                planners.append(self._validated_planner(name, planner_config, attack_config))
+            except APIError as e:
+                errors.append({"index": index, "msg": e.message})
+        if errors:
+            raise APIError("invalid plans", payload={"errors": errors})
+
+        # the planners run without any lock, the plans are stored at once when all of them succeed
+        batches = []
+        for index, (planner, (_, planner_config, attack_config)) in enumerate(zip(planners, plans)):
+            try:
+                with self._buffered() as batch:
+                    planner.plan(planner_config, attack_config)
+            except Exception as e:
+                self.log.exception('error executing plan %d of the batch', index)
+                message = e.message if isinstance(e, APIError) else str(e)
+                raise APIError("error executing plan %d: %s" % (index, message),
+                               e.status_code if isinstance(e, APIError) else 500,
+                               {"errors": [{"index": index, "msg": message}]})
+            batches.append(batch)
+
+        self._store_batches(batches)
+        return [dict(batch.result(), index=index) for index, batch in enumerate(batches)]
+
+    def validate_plan(self, name, planner_config, attack_config):
+        """
+        Validate the planner and attack configs of a plan against the modules, without
+        running the planner
 
         :param name:                Plan name
         :param planner_config:      Dict with planner config
         :param attack_config:       Dict with attack config
+        :raises:                    chaosmonkey.api.api_errors.APIError if the plan is invalid
+        """
+        self._validated_planner(name, planner_config, attack_config)
+
+    def _validated_planner(self, name, planner_config, attack_config):
+        """
+        Validate the planner and attack configs of a plan against the modules and
+        return the planner instance
         """
         try:
             planner_class = self._planners_store.get(planner_config.get("ref"))
@@ -171,25 +435,41 @@ class CMEManager:
         except ModuleLookupError as e:
             raise APIError("invalid planner %s" % e.message)
 
-        # Validate both executor and planner configs
+        # Validate both executor and planner configs, the validators are cached until the modules change
+        generation = (self._planners_store.generation, self._attacks_store.generation)
         try:
-            validate(planner_config.get("args"), planner_class.schema)
-            validate(attack_config, attack_class.schema)
+            validators.validate(planner_config.get("args"), planner_class.schema, generation)
+            validators.validate(attack_config, attack_class.schema, generation)
         except ValidationError as e:
             raise APIError("invalid payload %s" % e.message)
 
-        planner = planner_class(name)
-        planner.plan(planner_config, attack_config)
+        return planner_class(name)
 
     def add_plan(self, name):
         """
-        Creates a new plan in the sqlStore
+        Creates a new plan in the sqlStore. Inside :meth:`executors_batch` the plan is
+        stored with the rest of the batch when the context exits.
 
         :param name:    Plan name
         :return:        chaosmonkey.dal.plan.Plan
         """
+        batch = getattr(self._batch, "current", None)
+        if batch is not None:
+            plan = Plan(name=name)
+            batch.plans.append(plan)
+            return plan
         return self._sql_store.add_plan(name)
 
+    def get_change_version(self, plan_id=None):
+        """
+        Return the version of the data in the store, that changes on every write.
+        See :meth:`chaosmonkey.dal.change_versions.ChangeVersions`
+
+        :param plan_id: return the version of a plan instead of the global one
+        :return:        string
+        """
+        return self._sql_store.versions.tag(plan_id)
+
     def get_plan(self, plan_id):
         """
         Returns a plans
@@ -198,13 +478,17 @@ class CMEManager:
         """
         return self._sql_store.get_plan(plan_id)
 
-    def get_plans(self, show_all=None):
+    def get_plans(self, show_all=None, limit=None, after=None, stream=False):
         """
         Returns a list with al plans in the sqlStore
 
+        :param show_all:    include the executed plans
+        :param limit:       max number of plans
+        :param after:       (created, id) of the last plan of the previous page
+        :param stream:      return an iterator that reads the plans while it is consumed
         :return: List of chaosmonkey.dal.plan.Plan
         """
-        return self._sql_store.get_plans(show_all=show_all)
+        return self._sql_store.get_plans(show_all=show_all, limit=limit, after=after, stream=stream)
 
     def delete_plan(self, plan_id):
         """
@@ -230,4 +514,22 @@ class CMEManager:
         )
 
 
+class _Batch:
+    """
+    Plans, attack configs and executors buffered by :meth:`CMEManager.executors_batch`
+    """
+    def __init__(self):
+        self.plans = []  #: chaosmonkey.dal.plan_model.Plan not stored yet
+        self.attack_configs = {}  #: (plan_id, serialized attack config) -> attack config
+        self.jobs = []  #: (job kwargs, attack config key)
+
+    def add_job(self, job_kwargs, attack_config, plan_id):
+        key = (plan_id, AttackConfig.serialize(attack_config))
+        self.attack_configs.setdefault(key, attack_config)
+        self.jobs.append((job_kwargs, key))
+
+    def result(self):
+        return {"plans": [plan.id for plan in self.plans], "executors": len(self.jobs)}
+
+
 manager = CMEManager()
@@ -0,0 +1,102 @@
+"""
+Idempotency keys of the API requests.
+
+Clients that retry a request after a timeout send the same ``Idempotency-Key`` header,
+so the request is only executed once. The key is claimed in the store when the request
+starts (a single primary key lookup and insert), and the response is stored when it
+ends. A retry with the same key gets:
+
+* the stored response, without executing the request again
+* a 409 Conflict while the first request is in progress
+* a 422 if the key was used by a different request
+
+Keys expire after ``ttl_hours``. An internal scheduler job deletes the expired keys
+in bounded batches, and an expired key that has not been deleted yet is claimed again
+as a new key.
+
+The keys in progress when the engine stops are released on startup, since their
+requests will never finish.
+"""
+import logging
+from datetime import datetime, timedelta
+
+IDEMPOTENCY_JOB_ID = "cme-idempotency-keys"
+EVICTION_INTERVAL_MINUTES = 10
+DEFAULT_TTL_HOURS = 24
+
+
+class IdempotencyKeys:
+    """
+    Claim, complete and evict the idempotency keys
+
+    :param batch_size:  max number of keys deleted in a transaction
+    """
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.ttl_hours = DEFAULT_TTL_HOURS
+        self._sql_store = None
+        self.log = logging.getLogger(__name__)
+
+    def configure(self, scheduler, sql_store, ttl_hours=DEFAULT_TTL_HOURS, jobstore="internal"):
+        """
+        Configure the keys TTL and schedule the eviction job every EVICTION_INTERVAL_MINUTES minutes
+
+        :param scheduler:   chaosmonkey.engine.scheduler.CMEScheduler
+        :param sql_store:   chaosmonkey.dal.cme_sqlalchemy_store.CMESQLAlchemyStore
+        :param ttl_hours:   hours to keep the keys
+        :param jobstore:    job store alias for the eviction job
+        """
+        self._sql_store = sql_store
+        self.ttl_hours = ttl_hours
+        released = sql_store.release_idempotency_keys()
+        if released:
+            self.log.info('released %d idempotency keys of unfinished requests', released)
+        scheduler.add_job(self.evict, "interval", minutes=EVICTION_INTERVAL_MINUTES, id=IDEMPOTENCY_JOB_ID,
+                          name="idempotency keys eviction", jobstore=jobstore, replace_existing=True)
+        self.log.info('idempotency keys configured with a TTL of %d hours', ttl_hours)
+
+    def claim(self, key, fingerprint):
+        """
+        Claim a key for a request
+
+        :param key:         Idempotency-Key header
+        :param fingerprint: sha256 of the request
+        :return:            None if the request can run, or the existing
+                            chaosmonkey.dal.idempotency_key_model.IdempotencyKey
+        """
+        return self._sql_store.claim_idempotency_key(key, fingerprint, self._expired_before())
+
+    def complete(self, key, status_code, headers, body):
+        """
+        Store the response of the request that claimed a key
+        """
+        self._sql_store.complete_idempotency_key(key, status_code, headers, body)
+
+    def release(self, key):
+        """
+        Release a key whose request failed, so it can be retried
+        """
+        self._sql_store.release_idempotency_keys([key])
+
+    def evict(self):
+        """
+        Delete the expired keys
+
+        :return:    number of keys deleted
+        """
+        before = self._expired_before()
+        deleted = 0
+        while True:
+            count = self._sql_store.delete_idempotency_keys(before, self.batch_size)
+            deleted += count
+            if count < self.batch_size:
+                break
+        if deleted:
+            self.log.info('deleted %d expired idempotency keys', deleted)
+        return deleted
+
+    def _expired_before(self):
+        return datetime.utcnow() - timedelta(hours=self.ttl_hours)
+
+
+idempotency_keys = IdempotencyKeys()
@@ -0,0 +1,236 @@
+"""
+In-process metrics of the engine, exposed in the
+`Prometheus text format <https://prometheus.io/docs/instrumenting/exposition_formats/>`_
+by ``GET /metrics``.
+
+The histograms are updated where the things happen, with a lock and a few additions
+per observation, and the gauges are read when the metrics are scraped:
+
+* cme_http_request_duration_seconds: latency of the API requests, by route, method and status
+* cme_attack_duration_seconds: duration of the attacks, by attack ref and outcome
+* cme_scheduler_lag_seconds: time between the next_run_time of a job and the moment a thread
+  of its pool starts running it, by pool
+* cme_store_query_duration_seconds: time of the store methods that query the db, by method
+* cme_pending_executors, cme_active_plans: executors and plans not executed yet
+* cme_pool_busy_workers, cme_pool_saturation: threads of the attack pools running a job,
+  and the same number as a fraction of the pool size
+"""
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+#: upper bounds in seconds of the buckets of the histograms
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+#: the attacks and the scheduler lag are measured in seconds to minutes
+LONG_BUCKETS = (.01, .1, .5, 1, 5, 10, 30, 60, 300, 900)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = ['%s="%s"' % (name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append('%s="%s"' % extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+class Histogram:
+    """
+    Histogram of observations with fixed buckets
+
+    :param name:            metric name
+    :param documentation:   help text
+    :param labels:          tuple of label names
+    :param buckets:         sorted upper bounds of the buckets, the +Inf bucket is added
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        """
+        Add an observation
+
+        :param value:           float
+        :param label_values:    values of the labels, in the order of the label names
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(label_values)
+            if child is None:
+                child = self._children[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            child[0][index] += 1
+            child[1] += value
+
+    def values(self):
+        """
+        Return the observations of every label values
+
+        :return: dict label values -> (list of cumulative bucket counts, sum, count)
+        """
+        with self._lock:
+            children = dict((labels, (list(counts), total)) for labels, (counts, total) in self._children.items())
+        values = {}
+        for labels, (counts, total) in children.items():
+            cumulative = []
+            count = 0
+            for bucket_count in counts:
+                count += bucket_count
+                cumulative.append(count)
+            values[labels] = (cumulative, total, count)
+        return values
+
+    def clear(self):
+        """ Remove all the observations """
+        with self._lock:
+            self._children = {}
+
+    def samples(self):
+        """
+        Return the samples in the text format
+
+        :return: list of strings
+        """
+        lines = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, (cumulative, total, count) in sorted(self.values().items()):
+            for bound, bucket_count in zip(bounds, cumulative):
+                lines.append("%s_bucket%s %d" % (self.name, _format_labels(self.labels, labels, ("le", bound)),
+                                                 bucket_count))
+            lines.append("%s_sum%s %s" % (self.name, _format_labels(self.labels, labels), _format_value(total)))
+            lines.append("%s_count%s %d" % (self.name, _format_labels(self.labels, labels), count))
+        return lines
+
+
+class Gauge:
+    """
+    Gauge read from a callback when the metrics are collected
+
+    :param name:            metric name
+    :param documentation:   help text
+    :param labels:          tuple of label names
+    :param callback:        function that returns the value, or a dict label values -> value if
+                            the gauge has labels. None while there is nothing to measure
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.callback = callback
+
+    def values(self):
+        """
+        Return the current values
+
+        :return: dict label values -> value
+        """
+        if self.callback is None:
+            return {}
+        value = self.callback()
+        if not self.labels:
+            return {(): value}
+        return value
+
+    def samples(self):
+        """
+        Return the samples in the text format
+
+        :return: list of strings
+        """
+        return ["%s%s %s" % (self.name, _format_labels(self.labels, labels), _format_value(value))
+                for labels, value in sorted(self.values().items())]
+
+
+class Registry:
+    """
+    Collection of metrics rendered together
+    """
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """
+        Add a metric to the registry
+
+        :param metric:  Histogram or Gauge
+        :return:        the metric
+        """
+        if any(registered.name == metric.name for registered in self._metrics):
+            raise ValueError("metric %s already registered" % metric.name)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Return all the metrics in the Prometheus text format
+
+        :return: string
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append("# HELP %s %s" % (metric.name, metric.documentation))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class EngineMetrics(Registry):
+    """
+    Metrics of the chaosmonkey engine
+    """
+    def __init__(self):
+        super(EngineMetrics, self).__init__()
+        self.request_duration = self.register(Histogram(
+            "cme_http_request_duration_seconds", "Latency of the API requests",
+            ("route", "method", "status")))
+        self.attack_duration = self.register(Histogram(
+            "cme_attack_duration_seconds", "Duration of the attacks",
+            ("ref", "outcome"), LONG_BUCKETS))
+        self.scheduler_lag = self.register(Histogram(
+            "cme_scheduler_lag_seconds", "Time between the next run time of a job and its start",
+            ("pool",), LONG_BUCKETS))
+        self.store_duration = self.register(Histogram(
+            "cme_store_query_duration_seconds", "Duration of the store methods that query the db",
+            ("method",)))
+        self.pending_executors = self.register(Gauge(
+            "cme_pending_executors", "Executors not executed yet"))
+        self.active_plans = self.register(Gauge(
+            "cme_active_plans", "Plans not executed yet"))
+        self.pool_busy_workers = self.register(Gauge(
+            "cme_pool_busy_workers", "Threads of the attack pools running a job", ("pool",)))
+        self.pool_saturation = self.register(Gauge(
+            "cme_pool_saturation", "Busy threads of the attack pools as a fraction of the pool size", ("pool",)))
+
+    def configure(self, sql_store, pools):
+        """
+        Configure the sources of the gauges
+
+        :param sql_store:   chaosmonkey.dal.cme_sqlalchemy_store.CMESQLAlchemyStore
+        :param pools:       chaosmonkey.engine.pools.Pools
+        """
+        self.pending_executors.callback = sql_store.count_pending_executors
+        self.active_plans.callback = sql_store.count_active_plans
+        self.pool_busy_workers.callback = lambda: dict(
+            ((name,), busy) for name, (busy, _) in pools.usage().items())
+        self.pool_saturation.callback = lambda: dict(
+            ((name,), float(busy) / size) for name, (busy, size) in pools.usage().items())
+
+
+metrics = EngineMetrics()
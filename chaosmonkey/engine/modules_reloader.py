@@ -0,0 +1,91 @@
+"""
+Hot reload of the attacks and planners modules.
+
+When configured with an interval, an internal scheduler job polls the attacks and
+planners folders and reloads the modules whose files changed (see
+:meth:`chaosmonkey.modules.module_store.ModulesStore.reload`), so new or modified
+attacks and planners are available without restarting the engine.
+
+Running attacks keep the class they started with. The child processes of the process
+pools are replaced after attacks are reloaded, so the next attacks run the new code.
+"""
+import logging
+import threading
+
+from chaosmonkey.engine.pools import pools
+
+RELOAD_JOB_ID = "cme-modules-reload"
+
+
+class ModulesReloader:
+    """
+    Reload the changed modules of the module stores
+    """
+    def __init__(self):
+        self.interval = None
+        self._stores = {}
+        self._last_report = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.log = logging.getLogger(__name__)
+
+    def configure(self, scheduler, stores, interval=None, jobstore="internal"):
+        """
+        Configure the reloader. If interval is set, schedule the reload job every
+        interval seconds.
+
+        :param scheduler:   chaosmonkey.engine.scheduler.CMEScheduler
+        :param stores:      dict name -> chaosmonkey.modules.module_store.ModulesStore
+        :param interval:    seconds between checks of the modules folders. None to disable the reload
+        :param jobstore:    job store alias for the reload job
+        """
+        self._stores = dict(stores)
+        self.interval = interval
+        if interval:
+            scheduler.add_job(self.run, "interval", seconds=interval, id=RELOAD_JOB_ID,
+                              name="modules reload", jobstore=jobstore, replace_existing=True)
+            self.log.info('modules reload every %ds', interval)
+
+    def add_listener(self, callback):
+        """
+        Add a function called after every reload that changes any module
+
+        :param callback:    function that receives a dict store name -> changes of the changed stores
+        """
+        self._listeners.append(callback)
+
+    @property
+    def last_report(self):
+        """ Report of the last reload that changed any module, None if there has been none """
+        return self._last_report
+
+    def run(self):
+        """
+        Reload the changed modules of every store
+
+        :return: dict store name -> changes (see ModulesStore.reload)
+        """
+        with self._lock:
+            report = dict((name, store.reload()) for name, store in self._stores.items())
+
+        changed = dict((name, changes) for name, changes in report.items()
+                       if changes["added"] or changes["reloaded"] or changes["removed"] or changes["failed"])
+        for name, changes in changed.items():
+            self.log.info('%s reloaded in %.3fs: added %s, reloaded %s, removed %s, failed %s', name,
+                          changes["duration"], changes["added"], changes["reloaded"], changes["removed"],
+                          changes["failed"])
+        if changed:
+            self._last_report = report
+        if "attacks" in changed:
+            # new child processes import the reloaded attacks
+            pools.shutdown()
+        if changed:
+            for callback in self._listeners:
+                try:
+                    callback(changed)
+                except Exception:  # pylint: disable=broad-except
+                    self.log.exception('error in a modules reload listener')
+        return report
+
+
+reloader = ModulesReloader()
@@ -0,0 +1,171 @@
+"""
+Asynchronous creation of plans.
+
+``POST /api/1/plans/?async=true`` validates the plan and returns right away with a task,
+while the planner runs in a background worker thread. The task has the status of the
+plan creation:
+
+* pending: waiting for a free worker
+* running: the planner is running
+* succeeded: the plans and executors are stored, the task has their ids and count
+* failed: nothing is stored, the task has the error
+
+The plan is created as a batch of one plan (see :meth:`chaosmonkey.engine.cme_manager.CMEManager.execute_plans`),
+so a failed planner does not leave a half created plan behind.
+
+The tasks are only kept in memory. Finished tasks are evicted, oldest first, when there are
+more than ``max_tasks``.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from uuid import uuid4
+
+from chaosmonkey.api.api_errors import APIError
+
+TASK_PENDING = "pending"
+TASK_RUNNING = "running"
+TASK_SUCCEEDED = "succeeded"
+TASK_FAILED = "failed"
+
+DEFAULT_WORKERS = 1  #: plans are written one at a time anyway, the store serializes its writes
+DEFAULT_MAX_TASKS = 1000
+
+
+class PlanTask:
+    """
+    Status of a plan creation
+    """
+    def __init__(self, name):
+        self.id = uuid4().hex
+        self.name = name
+        self.status = TASK_PENDING
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.plans = []
+        self.executors = 0
+        self.error = None
+
+    @property
+    def done(self):
+        """ True when the task has succeeded or failed """
+        return self.status in (TASK_SUCCEEDED, TASK_FAILED)
+
+    def to_dict(self, timezone=None):
+        """
+        Return a dict with the task status, with the dates in the given timezone
+
+        :param timezone:    pytz timezone. None for the local time
+        :return:            dict
+        """
+        def date(timestamp):
+            return datetime.fromtimestamp(timestamp, timezone).isoformat() if timestamp is not None else None
+
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "created": date(self.created),
+            "started": date(self.started),
+            "finished": date(self.finished),
+            "plans": list(self.plans),
+            "executors": self.executors,
+            "error": self.error
+        }
+
+
+class PlanTasks:
+    """
+    Background workers to create plans and the status of their tasks
+    """
+    def __init__(self):
+        self.max_tasks = DEFAULT_MAX_TASKS
+        self._manager = None
+        self._workers = None
+        self._tasks = OrderedDict()
+        self._lock = threading.Lock()
+        self.log = logging.getLogger(__name__)
+
+    def configure(self, manager, workers=DEFAULT_WORKERS, max_tasks=DEFAULT_MAX_TASKS):
+        """
+        Configure the workers
+
+        :param manager:     chaosmonkey.engine.cme_manager.CMEManager
+        :param workers:     number of threads that run the planners
+        :param max_tasks:   max number of tasks kept in memory
+        """
+        self.shutdown()
+        self._manager = manager
+        self._workers = ThreadPoolExecutor(workers)
+        self.max_tasks = max_tasks
+        with self._lock:
+            self._tasks = OrderedDict()
+        self.log.info('plan tasks configured with %d workers', workers)
+
+    def submit(self, name, planner_config, attack_config):
+        """
+        Validate a plan and create it in a background worker
+
+        :param name:            Plan name
+        :param planner_config:  Dict with planner config
+        :param attack_config:   Dict with attack config
+        :return:                PlanTask
+        :raises:                chaosmonkey.api.api_errors.APIError if the plan is invalid
+        """
+        self._manager.validate_plan(name, planner_config, attack_config)
+
+        task = PlanTask(name)
+        with self._lock:
+            self._tasks[task.id] = task
+            self._evict()
+        self._workers.submit(self._run, task, planner_config, attack_config)
+        self.log.debug('plan task %s submitted', task.id)
+        return task
+
+    def get(self, task_id):
+        """
+        Return a task by id
+
+        :param task_id: string
+        :return:        PlanTask or None if it does not exist or has been evicted
+        """
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def shutdown(self, wait=True):
+        """
+        Shutdown the workers, waiting for the running planners
+        """
+        if self._workers is not None:
+            self._workers.shutdown(wait=wait)
+            self._workers = None
+
+    def _run(self, task, planner_config, attack_config):
+        task.started = time.time()
+        task.status = TASK_RUNNING
+        try:
+            result, = self._manager.execute_plans([(task.name, planner_config, attack_config)])
+        except Exception as e:  # pylint: disable=broad-except
+            task.error = e.message if isinstance(e, APIError) else str(e)
+            task.finished = time.time()
+            task.status = TASK_FAILED
+            self.log.warning('plan task %s failed: %s', task.id, task.error)
+        else:
+            task.plans = result["plans"]
+            task.executors = result["executors"]
+            task.finished = time.time()
+            task.status = TASK_SUCCEEDED
+
+    def _evict(self):
+        # the oldest finished tasks go first, running tasks are never evicted
+        for task_id in [task_id for task_id, task in self._tasks.items() if task.done]:
+            if len(self._tasks) <= self.max_tasks:
+                return
+            del self._tasks[task_id]
+
+
+plan_tasks = PlanTasks()
@@ -0,0 +1,247 @@
+"""
+Named pools to run the attacks.
+
+Every pool is an :meth:`apscheduler.executors.pool.ThreadPoolExecutor` of the scheduler,
+so a slow attack only uses the threads of its own pool. Attacks choose the pool with
+:attr:`chaosmonkey.attacks.attack.Attack.executor_pool`, attacks asking for a pool that
+is not configured run in the default pool.
+
+There are two kinds of pools:
+
+* thread: the attack runs in one of the pool threads. For I/O bound attacks (API calls, SSH)
+* process: the attack runs in a child process and the pool thread waits for it. For CPU heavy
+  attacks or attacks that can crash the interpreter. If a child process dies the process pool
+  is created again and the attack fails
+
+The pools count their busy threads, and measure the scheduler lag of the jobs they run
+(see :meth:`chaosmonkey.engine.metrics`).
+"""
+import importlib
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from apscheduler.executors.pool import ThreadPoolExecutor
+from pytz import utc
+from chaosmonkey.engine.metrics import metrics
+
+POOL_THREAD = "thread"
+POOL_PROCESS = "process"
+POOL_KINDS = (POOL_THREAD, POOL_PROCESS)
+
+DEFAULT_POOL = "default"
+DEFAULT_POOL_SIZE = 10  #: same size as the default pool of APScheduler
+
+
+def parse_pool(spec):
+    """
+    Parse a pool definition from the command line
+
+    :param spec:    string ``name=kind:size`` (eg. ``ssh=thread:20`` or ``cpu=process:2``)
+    :return:        (name, (kind, size))
+    """
+    try:
+        name, definition = spec.split("=", 1)
+        kind, size = definition.split(":", 1)
+        size = int(size)
+    except ValueError:
+        raise ValueError("invalid pool %s, expected name=kind:size" % spec)
+    if not name:
+        raise ValueError("invalid pool %s, the name is empty" % spec)
+    if kind not in POOL_KINDS:
+        raise ValueError("invalid pool kind %s, expected one of %s" % (kind, ", ".join(POOL_KINDS)))
+    if size < 1:
+        raise ValueError("invalid pool size %d for pool %s" % (size, name))
+    return name, (kind, size)
+
+
+class Pools:
+    """
+    Pools to run the attacks
+    """
+    def __init__(self):
+        self._pools = {DEFAULT_POOL: (POOL_THREAD, DEFAULT_POOL_SIZE)}
+        self._processes = {}
+        self._executors = {}
+        self._lock = threading.Lock()
+        self.log = logging.getLogger(__name__)
+
+    def configure(self, pools=None):
+        """
+        Configure the pools. The default pool is a thread pool of DEFAULT_POOL_SIZE threads
+        unless it is included in pools.
+
+        :param pools:   dict name -> (kind, size)
+        :return:        dict alias -> apscheduler executor, to configure the scheduler executors
+        """
+        self.shutdown()
+        self._pools = {DEFAULT_POOL: (POOL_THREAD, DEFAULT_POOL_SIZE)}
+        for name, (kind, size) in (pools or {}).items():
+            if kind not in POOL_KINDS:
+                raise ValueError("invalid pool kind %s, expected one of %s" % (kind, ", ".join(POOL_KINDS)))
+            self._pools[name] = (kind, size)
+            self.log.info('pool %s configured with %d %s workers', name, size, kind)
+        self._executors = dict((name, PoolExecutor(name, size)) for name, (_, size) in self._pools.items())
+        return dict(self._executors)
+
+    @property
+    def pools(self):
+        """ dict name -> (kind, size) with the configured pools """
+        return dict(self._pools)
+
+    def usage(self):
+        """
+        Return the busy threads of the configured pools
+
+        :return:    dict name -> (busy threads, size)
+        """
+        return dict((name, (executor.busy, self._pools[name][1])) for name, executor in self._executors.items())
+
+    def pool_for(self, attack_class):
+        """
+        Return the name of the pool used to run an attack
+
+        :param attack_class:    chaosmonkey.attacks.attack.Attack subclass or None
+        :return:                string
+        """
+        name = getattr(attack_class, "executor_pool", None) or DEFAULT_POOL
+        if name not in self._pools:
+            self.log.debug('pool %s not configured, using the default pool', name)
+            return DEFAULT_POOL
+        return name
+
+    def run(self, attack_class, attack_args):
+        """
+        Run an attack in the current thread or, if its pool is a process pool, in a child
+        process, waiting for it to finish.
+
+        :param attack_class:    chaosmonkey.attacks.attack.Attack subclass
+        :param attack_args:     attack args of the attack config
+        """
+        name = self.pool_for(attack_class)
+        if self._pools[name][0] != POOL_PROCESS:
+            attack_class(attack_args).run()
+            return
+
+        processes = self._process_pool(name)
+        try:
+            processes.submit(run_in_process, attack_class.__module__, attack_class.__name__, attack_args).result()
+        except BrokenProcessPool:
+            self.log.error('process pool %s is broken, creating it again', name)
+            with self._lock:
+                if self._processes.get(name) is processes:
+                    del self._processes[name]
+            processes.shutdown(wait=False)
+            raise
+
+    def submit(self, attack_class, call):
+        """
+        Run a callable in a thread of the pool of an attack, without going through the
+        scheduler. Used to run the attacks that were queued for admission.
+
+        :param attack_class:    chaosmonkey.attacks.attack.Attack subclass
+        :param call:            callable without args
+        :return:                concurrent.futures.Future
+        """
+        return self._executors[self.pool_for(attack_class)].submit_call(call)
+
+    def shutdown(self):
+        """
+        Shutdown the child processes of the process pools
+        """
+        with self._lock:
+            processes, self._processes = self._processes, {}
+        for pool in processes.values():
+            pool.shutdown(wait=False)
+
+    def _process_pool(self, name):
+        # created on first use, so the child processes inherit the loaded attack modules
+        with self._lock:
+            if name not in self._processes:
+                self._processes[name] = ProcessPoolExecutor(self._pools[name][1])
+            return self._processes[name]
+
+
+class PoolExecutor(ThreadPoolExecutor):
+    """
+    Scheduler executor of a pool. Counts the threads running a job and observes the
+    scheduler lag of every job, the time between its run time and the start of the thread.
+
+    :param name:        pool name
+    :param max_workers: number of threads
+    """
+    def __init__(self, name, max_workers):
+        super(PoolExecutor, self).__init__(max_workers)
+        self.name = name
+        self.busy = 0  #: threads running a job
+        self._busy_lock = threading.Lock()
+        self._pool = _MeasuredPool(self, self._pool)
+
+    def job_started(self, run_times):
+        """
+        Called from the pool thread before running a job
+        """
+        with self._busy_lock:
+            self.busy += 1
+        if run_times:
+            metrics.scheduler_lag.observe((datetime.now(utc) - run_times[0]).total_seconds(), self.name)
+
+    def job_finished(self):
+        """
+        Called from the pool thread after running a job
+        """
+        with self._busy_lock:
+            self.busy -= 1
+
+    def submit_call(self, call):
+        """
+        Run a callable without args in a thread of the pool, counted as a busy thread
+
+        :param call:    callable
+        :return:        concurrent.futures.Future
+        """
+        return self._pool.submit_call(call)
+
+
+class _MeasuredPool:
+    # wraps the concurrent.futures pool where apscheduler submits run_job(job, jobstore_alias, run_times, logger)
+    def __init__(self, executor, pool):
+        self._executor = executor
+        self._pool = pool
+
+    def submit(self, fn, job, jobstore_alias, run_times, logger_name):
+        return self._pool.submit(self._run, fn, job, jobstore_alias, run_times, logger_name)
+
+    def _run(self, fn, job, jobstore_alias, run_times, logger_name):
+        self._executor.job_started(run_times)
+        try:
+            return fn(job, jobstore_alias, run_times, logger_name)
+        finally:
+            self._executor.job_finished()
+
+    def submit_call(self, call):
+        return self._pool.submit(self._run_call, call)
+
+    def _run_call(self, call):
+        self._executor.job_started(None)
+        try:
+            return call()
+        finally:
+            self._executor.job_finished()
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait)
+
+
+def run_in_process(module_name, class_name, attack_args):
+    """
+    Run an attack in a child process of a process pool. The attack class is looked up
+    by its module and name, the attack modules folders are in the sys.path of the child.
+    """
+    attack_class = getattr(importlib.import_module(module_name), class_name)
+    attack_class(attack_args).run()
+
+
+pools = Pools()
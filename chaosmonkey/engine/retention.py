@@ -0,0 +1,146 @@
+"""
+Retention policy for the execution history.
+
+When configured with a number of days, an internal scheduler job deletes periodically:
+
+* the executions scheduled more than N days ago
+* the executed plans created more than N days ago that have no executors left
+
+Rows are deleted in bounded batches (a transaction per batch) so the database write lock
+is never held for long, and then the free pages are returned to the file system with an
+incremental VACUUM.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+RETENTION_JOB_ID = "cme-retention"
+RETENTION_RUN_JOB_ID = "cme-retention-now"
+RETENTION_INTERVAL_HOURS = 1
+
+
+class Retention:
+    """
+    Delete old executions and plans from the store
+
+    :param batch_size:      max number of rows deleted in a transaction
+    :param vacuum_pages:    max number of pages released by each incremental VACUUM
+    :param pause:           seconds to wait between batches, to let other writers in
+    """
+    def __init__(self, batch_size=500, vacuum_pages=256, pause=0.01):
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.pause = pause
+        self.retention_days = None
+        self._scheduler = None
+        self._sql_store = None
+        self._jobstore = None
+        self._last_report = None
+        self._longest_batch = 0
+        self._lock = threading.Lock()
+        self.log = logging.getLogger(__name__)
+
+    def configure(self, scheduler, sql_store, retention_days=None, jobstore="internal"):
+        """
+        Configure the retention. If retention_days is set, schedule the retention job
+        every RETENTION_INTERVAL_HOURS hours.
+
+        :param scheduler:       chaosmonkey.engine.scheduler.CMEScheduler
+        :param sql_store:       chaosmonkey.dal.cme_sqlalchemy_store.CMESQLAlchemyStore
+        :param retention_days:  days to keep the executions and executed plans. None to keep them forever
+        :param jobstore:        job store alias for the retention job
+        """
+        self._scheduler = scheduler
+        self._sql_store = sql_store
+        self._jobstore = jobstore
+        self.retention_days = retention_days
+        if retention_days is not None:
+            scheduler.add_job(self.run, "interval", hours=RETENTION_INTERVAL_HOURS, id=RETENTION_JOB_ID,
+                              name="retention", jobstore=jobstore, replace_existing=True)
+            self.log.info('retention configured to %d days', retention_days)
+
+    @property
+    def last_report(self):
+        """ Report of the last retention run, None if it has not run yet """
+        return self._last_report
+
+    def schedule_run(self):
+        """
+        Schedule a run of the retention right away in the job store of the retention job,
+        so it runs in a thread of the scheduler and not in the thread of the caller.
+        The report is available in :attr:`last_report` when it finishes.
+        """
+        if self.retention_days is None:
+            raise ValueError("retention days not configured")
+        self._scheduler.add_job(self.run, "date", id=RETENTION_RUN_JOB_ID, name="retention now",
+                                jobstore=self._jobstore, replace_existing=True)
+        self.log.info('retention run scheduled')
+
+    def run(self, retention_days=None):
+        """
+        Run the retention
+
+        :param retention_days:  days to keep. Defaults to the configured retention_days
+        :return:                dict with the report
+        """
+        retention_days = retention_days if retention_days is not None else self.retention_days
+        if retention_days is None:
+            raise ValueError("retention days not configured")
+
+        with self._lock:
+            started = time.time()
+            self._longest_batch = 0
+            size_before, _ = self._sql_store.get_database_size()
+
+            # executions run times are stored in the scheduler timezone, plans creation dates in UTC
+            now = datetime.now(self._scheduler.timezone).replace(tzinfo=None)
+            executions = self._delete_in_batches(self._sql_store.delete_executions,
+                                                 now - timedelta(days=retention_days))
+            plans = self._delete_in_batches(self._sql_store.delete_executed_plans,
+                                            datetime.utcnow() - timedelta(days=retention_days))
+            self._vacuum()
+
+            size_after, free_after = self._sql_store.get_database_size()
+            report = {
+                "retention_days": retention_days,
+                "started": datetime.fromtimestamp(started, self._scheduler.timezone).isoformat(),
+                "duration": round(time.time() - started, 3),
+                "longest_batch": round(self._longest_batch, 3),
+                "executions_deleted": executions,
+                "plans_deleted": plans,
+                "bytes_reclaimed": size_before - size_after,
+                "database_size": size_after,
+                "free_bytes": free_after
+            }
+            self._last_report = report
+
+        self.log.info('retention deleted %d executions and %d plans, reclaimed %d bytes in %.3fs',
+                      executions, plans, report["bytes_reclaimed"], report["duration"])
+        return report
+
+    def _delete_in_batches(self, delete, before):
+        deleted = 0
+        while True:
+            batch_started = time.time()
+            count = delete(before, self.batch_size)
+            self._longest_batch = max(self._longest_batch, time.time() - batch_started)
+            deleted += count
+            if count < self.batch_size:
+                return deleted
+            time.sleep(self.pause)
+
+    def _vacuum(self):
+        while True:
+            _, free = self._sql_store.get_database_size()
+            if not free:
+                return
+            if not self._sql_store.incremental_vacuum(self.vacuum_pages):
+                return
+            _, free_after = self._sql_store.get_database_size()
+            if free_after >= free:
+                return
+            time.sleep(self.pause)
+
+
+retention = Retention()
@@ -3,7 +3,179 @@
 
 The scheduler is responsible of storing executors and execute them in the given datatime.
 """
+from contextlib import contextmanager
+from datetime import datetime
 
+from apscheduler.events import JobEvent, EVENT_JOB_ADDED, EVENT_JOB_MODIFIED
+from apscheduler.job import Job
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.base import STATE_STOPPED, STATE_RUNNING
 
-scheduler = BackgroundScheduler()
+
+class CMEScheduler(BackgroundScheduler):
+    """
+    BackgroundScheduler that can add and reschedule many jobs at once.
+
+    Jobs added with :meth:`add_jobs` are handed to the job store in a single call
+    (using the store ``add_jobs`` method when available) and the scheduler is woken
+    up only once for the whole list. The same goes for the jobs rescheduled with
+    :meth:`reschedule_jobs` (using the store ``lookup_jobs`` and ``update_jobs`` methods).
+    """
+
+    _deferred_wakeup = None
+
+    def add_jobs(self, jobs_kwargs, jobstore='default'):
+        """
+        Add a list of jobs to the given job store
+
+        :param jobs_kwargs: list of dicts with the arguments accepted by add_job
+                            (func, trigger, args, kwargs, id, name, executor and trigger args)
+        :param jobstore:    alias of the job store to store the jobs in
+        :return:            list of apscheduler.job.Job
+        """
+        jobs = [self._create_job(**job_kwargs) for job_kwargs in jobs_kwargs]
+
+        # Don't really add jobs to job stores before the scheduler is up and running
+        with self._jobstores_lock:
+            if self.state == STATE_STOPPED:
+                for job in jobs:
+                    self._pending_jobs.append((job, jobstore, False))
+                self._logger.info('Adding %d jobs tentatively -- they will be properly scheduled when '
+                                  'the scheduler starts', len(jobs))
+            elif jobs:
+                self._real_add_jobs(jobs, jobstore)
+
+        return jobs
+
+    @contextmanager
+    def jobstores_locked(self):
+        """
+        Context manager that holds the job stores lock, so the scheduler does not process
+        jobs during the block.
+
+        Used to write to a job store in a transaction that spans several calls to the
+        scheduler: the scheduler thread takes this lock before writing to the job stores,
+        so it must be taken before the job store transaction to avoid a deadlock.
+
+        The jobs added or rescheduled in the block wake up the scheduler only once, when
+        the block exits (after the job store transaction, that is inside the block).
+        """
+        with self._jobstores_lock:
+            if self._deferred_wakeup is not None:
+                yield
+                return
+
+            self._deferred_wakeup = False
+            try:
+                yield
+            finally:
+                wakeup, self._deferred_wakeup = self._deferred_wakeup, None
+                if wakeup and self.state == STATE_RUNNING:
+                    self.wakeup()
+
+    def reschedule_jobs(self, job_ids, trigger_for, jobstore='default'):
+        """
+        Reschedule a list of pending jobs of the given job store
+
+        :param job_ids:     list of job ids
+        :param trigger_for: function that returns the new trigger of a job
+                            (apscheduler.triggers.BaseTrigger)
+        :param jobstore:    alias of the job store of the jobs
+        :return:            (list of rescheduled apscheduler.job.Job, list of the ids not found)
+        """
+        now = datetime.now(self.timezone)
+        with self._jobstores_lock:
+            store = self._lookup_jobstore(jobstore)
+            if hasattr(store, 'lookup_jobs'):
+                jobs = store.lookup_jobs(job_ids)
+            else:
+                wanted = set(job_ids)
+                jobs = [job for job in store.get_all_jobs() if job.id in wanted]
+
+            for job in jobs:
+                trigger = trigger_for(job)
+                # pylint: disable=protected-access
+                job._modify(trigger=trigger, next_run_time=trigger.get_next_fire_time(None, now))
+
+            if hasattr(store, 'update_jobs'):
+                store.update_jobs(jobs)
+            else:
+                for job in jobs:
+                    store.update_job(job)
+
+        for job in jobs:
+            self._dispatch_event(JobEvent(EVENT_JOB_MODIFIED, job.id, jobstore))
+
+        self._logger.info('Rescheduled %d jobs in job store "%s"', len(jobs), jobstore)
+
+        # Notify the scheduler about the new run times
+        if jobs:
+            self._notify_changes()
+
+        found = set(job.id for job in jobs)
+        return jobs, [job_id for job_id in job_ids if job_id not in found]
+
+    # pylint: disable=too-many-arguments,redefined-builtin
+    def _create_job(self, func, trigger=None, args=None, kwargs=None, id=None, name=None,
+                    executor='default', **trigger_args):
+        return Job(
+            self,
+            trigger=self._create_trigger(trigger, trigger_args),
+            executor=executor,
+            func=func,
+            args=tuple(args) if args is not None else (),
+            kwargs=dict(kwargs) if kwargs is not None else {},
+            id=id,
+            name=name
+        )
+
+    def _real_add_jobs(self, jobs, jobstore_alias):
+        now = datetime.now(self.timezone)
+        for job in jobs:
+            # Fill in undefined values with defaults
+            replacements = dict((key, value) for key, value in self._job_defaults.items() if not hasattr(job, key))
+            if not hasattr(job, 'next_run_time'):
+                replacements['next_run_time'] = job.trigger.get_next_fire_time(None, now)
+            job._modify(**replacements)  # pylint: disable=protected-access
+
+        store = self._lookup_jobstore(jobstore_alias)
+        if hasattr(store, 'add_jobs'):
+            store.add_jobs(jobs)
+        else:
+            for job in jobs:
+                store.add_job(job)
+
+        for job in jobs:
+            # Mark the job as no longer pending and notify listeners
+            job._jobstore_alias = jobstore_alias  # pylint: disable=protected-access
+            self._dispatch_event(JobEvent(EVENT_JOB_ADDED, job.id, jobstore_alias))
+
+        self._logger.info('Added %d jobs to job store "%s"', len(jobs), jobstore_alias)
+
+        # Notify the scheduler about the new jobs
+        self._notify_changes()
+
+    def _notify_changes(self):
+        """
+        Wake up the scheduler after a change of the jobs, or once at the end of :meth:`jobstores_locked`
+        """
+        if self._deferred_wakeup is not None:
+            self._deferred_wakeup = True
+        elif self.state == STATE_RUNNING:
+            self.wakeup()
+
+    def _lookup_executor(self, alias):
+        """
+        Jobs stored with a pool that is no longer configured run in the default pool,
+        instead of being removed from the job store.
+        """
+        try:
+            return super(CMEScheduler, self)._lookup_executor(alias)
+        except KeyError:
+            if alias == 'default':
+                raise
+            self._logger.warning('Executor "%s" not configured, using the default executor', alias)
+            return super(CMEScheduler, self)._lookup_executor('default')
+
+
+scheduler = CMEScheduler()
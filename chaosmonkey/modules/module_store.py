@@ -2,10 +2,26 @@
 ModulesStore
 Handle the dynamic load of modules outside the main package.
 
+The classes of the loaded modules are indexed by their ref (module_name:ClassName)
+when the modules are loaded, added or removed, so looking up a class or listing
+them does not depend on the number of loaded modules.
+
+The modules of the loaded folders can be reloaded while the engine runs with
+:meth:`ModulesStore.reload`, that only imports the modules whose files changed.
+
+In lazy mode the python files of the folders are not imported by :meth:`ModulesStore.load`,
+their classes are found by parsing the files (classes that extend the klass by name) and a
+module is imported the first time one of its classes is requested.
 '''
+import ast
+import importlib
+import importlib.util
 import logging
+import os
 import sys
 import inspect
+import threading
+import time
 from os import listdir
 from os.path import isfile, join, splitext, isdir
 
@@ -16,15 +32,25 @@ class ModulesStore:
     """
     modules = []
 
-    def __init__(self, klass):
+    def __init__(self, klass, lazy=False):
         self.klass = klass
+        self.lazy = lazy
         self.modules = []
+        self.generation = 0  #: incremented every time the loaded modules change
+        self._modules_by_name = {}
+        self._index = {}
+        self._refs = []
+        self._paths = []
+        self._signatures = {}
+        self._pending = {}
+        self._import_lock = threading.RLock()
         self.log = logging.getLogger('%s.%s' % (__name__, klass.__name__))
 
     def load(self, path):
         """
         Loads all modules found in a given path.
-        It adds the path to the sys.path and import all modules found
+        It adds the path to the sys.path and import all modules found.
+        In lazy mode the python files are only parsed, see :meth:`get`
 
         :param path: path for lookup modules
         """
@@ -32,46 +58,135 @@ class ModulesStore:
         self._validate_path(path)
 
         sys.path.insert(0, path)
+        self._paths.append(path)
 
         module_names = self._get_module_names(path)
+        files = dict(self._module_files(path))
         try:
             for name in module_names:
                 if not name.endswith('_test'):
+                    self._signatures[name] = self._file_signature(files.get(name))
+                    if self.lazy and self._scan(name, files.get(name)):
+                        continue
                     self.log.debug('added module %s', name)
                     module = __import__(name)
                     self.modules.append(module)
         except ImportError:
             self.log.debug('error importing module %s', name)
             raise ValueError('Unable to import %s' % name)
+        finally:
+            self._build_index()
+
+    def reload(self):
+        """
+        Reload the modules of the loaded folders that changed on disk since they were
+        imported: new files are imported, modified files are reloaded and the modules
+        of deleted files are removed. A module that fails to import keeps its previous
+        version until its file changes again.
+
+        The index is replaced at once when all the modules are imported. The classes
+        already returned by :meth:`get` are not modified, so running attacks finish
+        with the class they started with.
+
+        :return: dict with the added, reloaded, removed and failed module names and
+                 the duration of the reload in seconds
+        """
+        with self._import_lock:
+            return self._reload()
+
+    def _reload(self):
+        started = time.time()
+        changes = {"added": [], "reloaded": [], "removed": [], "failed": []}
+        # forget the cached folder listings, so new files can be imported
+        importlib.invalidate_caches()
+        modules = list(self.modules)
+        found = set()
+        for path in self._paths:
+            if not isdir(path):
+                continue
+            for name, filename in self._module_files(path):
+                if name.endswith('_test') or name in found:
+                    continue
+                found.add(name)
+                signature = self._file_signature(filename)
+                if name not in self._signatures or signature != self._signatures[name]:
+                    if name in self._pending:
+                        self._scan(name, filename)
+                        changes["reloaded"].append(name)
+                    elif self.lazy and name not in self._signatures and self._scan(name, filename):
+                        changes["added"].append(name)
+                    else:
+                        self._import(name, filename, modules, changes, self._modules_by_name.get(name))
+                    self._signatures[name] = signature
+
+        for name in [name for name in self._signatures if name not in found]:
+            del self._signatures[name]
+            self._pending.pop(name, None)
+            modules = [module for module in modules if name != getattr(module, '__name__')]
+            # a file added back with the same name must not get the deleted module from sys.modules
+            if name in self._modules_by_name and sys.modules.get(name) is self._modules_by_name[name]:
+                del sys.modules[name]
+            changes["removed"].append(name)
+
+        if changes["added"] or changes["reloaded"] or changes["removed"]:
+            self.modules = modules
+            self._build_index()
+        changes["duration"] = time.time() - started
+        return changes
+
+    def _import(self, name, filename, modules, changes, module=None):
+        # a module that fails is imported again on the next change of its file
+        try:
+            if module is None:
+                modules.append(self._load_fresh(name, filename))
+                changes["added"].append(name)
+            else:
+                fresh = self._load_fresh(name, getattr(module, '__file__', None) or filename)
+                modules[modules.index(module)] = fresh
+                changes["reloaded"].append(name)
+        except Exception:  # pylint: disable=broad-except
+            self.log.exception('error importing module %s, keeping the previous version', name)
+            changes["failed"].append(name)
+
+    @staticmethod
+    def _load_fresh(name, filename):
+        """
+        Execute a module file in a new module object, that replaces the previous module
+        in sys.modules only if it executes without errors. Unlike importlib.reload the
+        previous module is never modified, so it keeps working if the new version fails.
+        """
+        spec = importlib.util.spec_from_file_location(name, filename)
+        if spec is None:
+            raise ImportError('Unable to load %s from %s' % (name, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[name] = module
+        return module
 
     def set_modules(self, modules):
         self.modules = modules
+        self._pending = {}
+        self._build_index()
 
     def get_modules(self):
         return self.modules
 
     def list(self):
         """
-        List all loaded modules names. It will return a list withe the
-        __name__ of each module
+        List the refs (module_name:ClassName) of the klass subclasses in the
+        loaded modules
         :return:
         """
-        module_names = []
-        for module in self.get_modules():
-            module_name = getattr(module, '__name__')
-            for name, data in inspect.getmembers(module):
-                if inspect.isclass(data) and self._has_klass_ancestor(data):
-                    module_names.append(module_name + ':' + name)
-
-        return module_names
+        return list(self._refs)
 
     def add(self, module):
         self.modules.append(module)
+        self._build_index()
 
     def remove(self, module_name):
-        for module in self.modules:
-            if module_name == getattr(module, '__name__'):
-                self.modules.remove(module)
+        self.modules = [module for module in self.modules if module_name != getattr(module, '__name__')]
+        self._pending.pop(module_name, None)
+        self._build_index()
 
     def get(self, ref):
         """
@@ -79,12 +194,86 @@ class ModulesStore:
         return the class so it can be instantiated
 
         The module with the class must be loaded first using load or add method.
+        In lazy mode the module is imported the first time one of its classes is requested.
 
         :param ref: str representation of a class in a module
         :return: class ready for instantation
         """
+        if self._pending and isinstance(ref, str) and ref.split(':', 1)[0] in self._pending:
+            self._import_pending(ref.split(':', 1)[0])
         return self._ref_to_obj(ref)
 
+    def _scan(self, name, filename):
+        """
+        Find the klass subclasses of a python file without importing it, and keep the
+        module as pending. Return False if the file can not be parsed.
+        """
+        if not filename or not filename.endswith('.py'):
+            return False
+        try:
+            with open(filename, 'rb') as module_file:
+                tree = ast.parse(module_file.read(), filename)
+        except (OSError, SyntaxError, ValueError):
+            return False
+
+        klass_name = self.klass.__name__
+        class_names = []
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef) and any(
+                    getattr(base, 'id', getattr(base, 'attr', None)) == klass_name for base in node.bases):
+                class_names.append(node.name)
+        self.log.debug('found module %s, imported when first requested', name)
+        self._pending[name] = class_names
+        return True
+
+    def _import_pending(self, name):
+        with self._import_lock:
+            if name not in self._pending:
+                return
+            try:
+                module = __import__(name)
+            except Exception:
+                self.log.exception('error importing module %s', name)
+                raise ModuleLookupError('Unable to import %s' % name)
+            self.log.debug('imported module %s', name)
+            del self._pending[name]
+            self.modules = self.modules + [module]
+            self._build_index()
+
+    def _build_index(self):
+        """
+        Index the loaded modules by name and the klass subclasses by ref. If several
+        modules have the same name the first one is used.
+        """
+        modules_by_name = {}
+        index = {}
+        refs = []
+        for module in self.modules:
+            module_name = getattr(module, '__name__')
+            modules_by_name.setdefault(module_name, module)
+            for name, data in inspect.getmembers(module):
+                if inspect.isclass(data) and self._has_klass_ancestor(data):
+                    ref = module_name + ':' + name
+                    refs.append(ref)
+                    index.setdefault(ref, data)
+        for module_name, class_names in self._pending.items():
+            refs.extend(module_name + ':' + name for name in class_names)
+
+        # the index is built aside and then replaced, readers never see it half built
+        self._modules_by_name, self._index, self._refs = modules_by_name, index, refs
+        self.generation += 1
+
+    @staticmethod
+    def _file_signature(filename):
+        """
+        Return the modification time and size of a module file
+        """
+        try:
+            stat = os.stat(filename)
+        except (TypeError, OSError):
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
     def _has_klass_ancestor(self, cls):
         if hasattr(cls, '__bases__') and self.klass in cls.__bases__:
             return True
@@ -101,11 +290,16 @@ class ModulesStore:
     @staticmethod
     def _get_module_names(path):
         '''Inspect a path and return all file names without extension'''
-        names = []
+        return [name for name, _ in ModulesStore._module_files(path)]
+
+    @staticmethod
+    def _module_files(path):
+        '''Inspect a path and return (file name without extension, file path) for all files'''
+        files = []
         for f in listdir(path):
             if isfile(join(path, f)):
-                names.append(splitext(f)[0])
-        return names
+                files.append((splitext(f)[0], join(path, f)))
+        return files
 
     def _ref_to_obj(self, ref):
         """
@@ -117,15 +311,19 @@ class ModulesStore:
         if ':' not in ref:
             raise ValueError('Invalid reference')
 
+        obj = self._index.get(ref)
+        if obj is not None:
+            return obj
+
+        # not a klass subclass, look it up in its module
         module_name, class_name = ref.split(':', 1)
-        for module in self.modules:
-            attr_name = getattr(module, '__name__')
-            if attr_name == module_name:
-                try:
-                    self.log.debug(attr_name + ' found on module store!')
-                    return getattr(module, class_name)
-                except Exception:
-                    raise ModuleLookupError('Error resolving reference %s: not found in modules' % ref)
+        module = self._modules_by_name.get(module_name)
+        if module is not None:
+            try:
+                self.log.debug(module_name + ' found on module store!')
+                return getattr(module, class_name)
+            except Exception:
+                raise ModuleLookupError('Error resolving reference %s: not found in modules' % ref)
 
 
 class ModuleLookupError(Exception):
@@ -41,6 +41,9 @@ class Planner:
         """
         Add a job to the global scheduler
 
+        When the planner is run by the CMEManager all the executors added in
+        :meth:`plan` are stored in a single batch once the method returns.
+
         :param date: date to execute the job
         :param name: job name
         :param attack_config: configuration related to the attack
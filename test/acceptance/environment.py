@@ -1,6 +1,7 @@
 from chaosmonkey.engine.cme_manager import manager as cme_manager
 from chaosmonkey.engine.app import configure_engine
 from chaosmonkey.dal.executor_model import Executor
+from chaosmonkey.dal.execution_model import Execution
 from chaosmonkey.dal.plan_model import Plan
 from chaosmonkey.api.app import flask_app
 
@@ -32,6 +33,7 @@ def before_all(context):
 def after_scenario(context, scenario):
     Plan.query.delete()
     Executor.query.delete()
+    Execution.query.delete()
     context.manager.planners_store.set_modules([])
     context.manager.attacks_store.set_modules([])
     context.manager.scheduler.remove_all_jobs()
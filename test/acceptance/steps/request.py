@@ -9,6 +9,7 @@ def request_with_payload(context, method, endpoint, payload):
         res = context.client.open(
             full_endpoint,
             method=method,
+            buffered=True,
             content_type='application/json',
             data=payload
         )
@@ -23,6 +24,7 @@ def request_with_querystring(context, method, endpoint, querystring):
         res = context.client.open(
             full_endpoint,
             method=method,
+            buffered=True,
             content_type='application/json',
             query_string=json.loads(querystring)
         )
@@ -45,6 +47,7 @@ def step_impl(context, method, endpoint, payload):
             res = context.client.open(
                 full_endpoint,
                 method=method,
+                buffered=True,
                 content_type='application/json',
                 data=payload
             )
@@ -63,6 +66,7 @@ def step_impl(context, method, endpoint):
         res = context.client.open(
             full_endpoint,
             method=method,
+            buffered=True,
             content_type='application/json'
         )
         context.last_response = res
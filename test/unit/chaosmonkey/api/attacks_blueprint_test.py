@@ -1,4 +1,5 @@
 from flask import url_for
+from chaosmonkey.api.app import precompute_documents
 from chaosmonkey.api.hal import Document
 import test.attacks.attack1 as attack1_module
 import test.attacks.attack2 as attack2_module
@@ -31,3 +32,51 @@ def test_attack_list_return_hal(app, manager):
         assert res.status_code == 200
         assert res.mimetype == "application/hal+json"
         assert res.json == Document(data={"attacks": attack_list}).to_dict()
+
+
+def test_get_admission(app):
+    url = url_for("attacks.get_admission")
+
+    with app.test_request_context(url):
+        res = app.test_client().get(url)
+
+    assert res.status_code == 200
+    assert res.mimetype == "application/hal+json"
+    assert res.json["attack_limits"] == {}
+    assert res.json["target_limit"] is None
+    assert res.json["keys"] == []
+
+
+def test_attack_list_etag(app, manager):
+    url = url_for("attacks.list_attacks")
+    manager.attacks_store.set_modules([attack1_module])
+
+    with app.test_request_context(url):
+        res = app.test_client().get(url)
+        etag = res.headers["ETag"]
+
+        not_modified = app.test_client().get(url, headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == etag
+
+        manager.attacks_store.set_modules([attack1_module, attack2_module])
+        modified = app.test_client().get(url, headers={"If-None-Match": etag})
+        assert modified.status_code == 200
+        assert modified.headers["ETag"] != etag
+        assert len(modified.json["attacks"]) == 2
+
+
+def test_attack_list_is_precomputed(app, manager, monkeypatch):
+    url = url_for("attacks.list_attacks")
+    manager.attacks_store.set_modules([attack1_module, attack2_module])
+    precompute_documents()
+
+    def get_attack_list():
+        raise AssertionError("the attacks list is built again")
+    monkeypatch.setattr(manager, "get_attack_list", get_attack_list)
+
+    with app.test_request_context(url):
+        res = app.test_client().get(url)
+        assert res.status_code == 200
+        assert res.json["_links"]["self"]["href"] == url
+        assert len(res.json["attacks"]) == 2
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from flask import url_for, json
+from chaosmonkey.api import events_blueprint
+from chaosmonkey.dal import events
+
+
+def parse_events(chunk):
+    events = []
+    for block in chunk.decode().strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["id"], fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def open_stream(app, headers=None, **query):
+    with app.test_request_context():
+        url = url_for("events.get_events", **query)
+    res = app.test_client().get(url, headers=headers or {}, buffered=False)
+    assert res.status_code == 200
+    assert res.mimetype == "text/event-stream"
+    chunks = iter(res.response)
+    assert next(chunks) == b"retry: %d\n\n" % events_blueprint.RETRY_MS
+    return res, chunks
+
+
+def test_events_of_the_executors_and_plans(app, manager):
+    res, chunks = open_stream(app)
+    plan = manager.add_plan("events plan")
+    executor, = manager.add_executors([(datetime.now() + timedelta(hours=10), "executor", {}, plan.id)])
+    manager.remove_executor(executor.id)
+    manager.delete_plan(plan.id)
+
+    events = parse_events(next(chunks))
+    assert [(event_type, data["id"]) for _, event_type, data in events] == [
+        ("plan_added", plan.id),
+        ("executor_added", executor.id),
+        ("executor_removed", executor.id),
+        ("plan_deleted", plan.id)
+    ]
+    assert events[1][2]["plan_id"] == plan.id
+    assert events[1][2]["next_run_time"] is not None
+    res.close()
+
+
+def test_events_filtered_by_plan(app, manager):
+    plan, other_plan = manager.add_plan("events plan"), manager.add_plan("other plan")
+    res, chunks = open_stream(app, plan_id=plan.id)
+    manager.add_executors([(datetime.now() + timedelta(hours=10), "other", {}, other_plan.id)])
+    executor, = manager.add_executors([(datetime.now() + timedelta(hours=10), "executor", {}, plan.id)])
+
+    assert [data["id"] for _, _, data in parse_events(next(chunks))] == [executor.id]
+    res.close()
+    manager.delete_plan(plan.id)
+    manager.delete_plan(other_plan.id)
+
+
+def test_events_resume_from_the_last_event_id(app, manager):
+    res, chunks = open_stream(app)
+    plan = manager.add_plan("events plan")
+    last_event_id = parse_events(next(chunks))[-1][0]
+    res.close()
+
+    manager.delete_plan(plan.id)
+    res, chunks = open_stream(app, headers={"Last-Event-ID": last_event_id})
+    assert [event_type for _, event_type, _ in parse_events(next(chunks))] == ["plan_deleted"]
+    res.close()
+
+
+def test_events_reset_with_an_unknown_event_id(app, manager):
+    res, chunks = open_stream(app, last_event_id="0123456789ab-12")
+
+    event_id, event_type, _ = parse_events(next(chunks))[0]
+    assert event_type == "reset"
+    assert manager.events.parse_id(event_id) == manager.events.last_seq
+    res.close()
+
+
+def test_events_reset_continues_from_the_first_event_kept():
+    bus = events.EventBus(size=2)
+    bus.publish([(events.PLAN_ADDED, {"id": "plan"}),
+                 (events.EXECUTOR_ADDED, {"id": "first", "plan_id": "plan"}),
+                 (events.EXECUTOR_REMOVED, {"id": "other", "plan_id": None}),
+                 (events.EXECUTOR_ADDED, {"id": "second", "plan_id": "plan"})])
+    stream = events_blueprint.event_stream(bus, 1, plan_id="plan")
+    next(stream)
+
+    reset_id, event_type, _ = parse_events(next(stream).encode())[0]
+    assert event_type == "reset"
+    assert bus.parse_id(reset_id) == 2
+    assert [data["id"] for _, _, data in parse_events(next(stream).encode())] == ["second"]
+
+    # the id of the reset event resumes without another reset
+    resumed = events_blueprint.event_stream(bus, bus.parse_id(reset_id))
+    next(resumed)
+    assert [data["id"] for _, _, data in parse_events(next(resumed).encode())] == ["other", "second"]
+
+    bus.publish([(events.PLAN_DELETED, {"id": "plan"})])
+    assert [event_type for _, event_type, _ in parse_events(next(stream).encode())] == ["plan_deleted"]
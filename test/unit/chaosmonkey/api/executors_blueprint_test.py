@@ -3,7 +3,7 @@ API Tests
 """
 import arrow
 from apscheduler.triggers.date import DateTrigger
-from flask import url_for
+from flask import json, url_for
 from chaosmonkey.api.hal import Document
 from datetime import datetime, timedelta
 
@@ -35,6 +35,93 @@ def test_get_executors(app, manager, plan):
         assert res.json == Document(embedded={"executors": [executor.to_dict()]}).to_dict()
 
 
+def test_get_executed_executors_from_history(app, manager, plan):
+    url = url_for("executors.get_executors", executed="true")
+
+    run_time = datetime.now() + timedelta(hours=10)
+    executor = manager.add_executor(run_time, "executor name", {}, plan.id)
+    manager.sql_store.remove_job(executor.id)
+
+    with app.test_request_context(url):
+        res = app.test_client().get(url)
+        assert res.status_code == 200
+        executed, = res.json["_embedded"]["executors"]
+        assert executed["id"] == executor.id
+        assert executed["executed"] is True
+        assert executed["outcome"] == "submitted"
+
+
+def test_get_executors_paginated(app, manager, plan):
+    run_time = datetime.now() + timedelta(hours=10)
+    executors = [manager.add_executor(run_time + timedelta(minutes=i % 3), "executor %d" % i, {}, plan.id)
+                 for i in range(5)]
+    expected = [executor.id for executor in sorted(executors, key=lambda e: (e.next_run_time, e.id))]
+
+    url = url_for("executors.get_executors", limit=2)
+    ids = []
+    pages = 0
+    with app.test_request_context(url):
+        while url:
+            res = app.test_client().get(url)
+            assert res.status_code == 200
+            ids += [executor["id"] for executor in res.json["_embedded"]["executors"]]
+            url = res.json["_links"].get("next", {}).get("href")
+            pages += 1
+
+    assert ids == expected
+    assert pages == 3
+
+
+def test_get_executors_etag_depends_on_the_query(app, manager, plan):
+    run_time = datetime.now() + timedelta(hours=10)
+    for i in range(3):
+        manager.add_executor(run_time + timedelta(minutes=i), "executor %d" % i, {}, plan.id)
+
+    with app.test_request_context("/"):
+        client = app.test_client()
+        first_page = client.get("/api/1/executors/?limit=1&plan_id=%s" % plan.id)
+        etag = first_page.headers["ETag"]
+        next_page = client.get(first_page.json["_links"]["next"]["href"], headers={"If-None-Match": etag})
+
+        assert next_page.status_code == 200
+        assert next_page.headers["ETag"] != etag
+        # the same query in another order has the same ETag
+        same_query = client.get("/api/1/executors/?plan_id=%s&limit=1" % plan.id, headers={"If-None-Match": etag})
+        assert same_query.status_code == 304
+
+
+def test_get_executors_filters(app, manager, plan):
+    other_plan = manager.add_plan("other plan")
+    run_time = datetime.now() + timedelta(hours=10)
+    manager.add_executor(run_time, "executor", {"ref": "module:Other"}, plan.id)
+    later = manager.add_executor(run_time + timedelta(hours=2), "executor", {"ref": "module:Other"}, plan.id)
+    other = manager.add_executor(run_time, "executor", {"ref": "module:Attack"}, other_plan.id)
+
+    def get_ids(**args):
+        url = url_for("executors.get_executors", **args)
+        with app.test_request_context(url):
+            res = app.test_client().get(url)
+            assert res.status_code == 200
+            return [executor["id"] for executor in res.json["_embedded"]["executors"]]
+
+    try:
+        assert get_ids(plan_id=other_plan.id) == [other.id]
+        assert get_ids(attack_ref="module:Attack") == [other.id]
+        from_date = arrow.get(run_time + timedelta(hours=1), "Europe/Madrid").isoformat()
+        assert get_ids(plan_id=plan.id, **{"from": from_date}) == [later.id]
+        assert later.id not in get_ids(plan_id=plan.id, to=from_date)
+    finally:
+        manager.delete_plan(other_plan.id)
+
+
+def test_get_executors_invalid_pagination(app):
+    for args in ({"limit": "0"}, {"limit": "a"}, {"after": "invalid"}, {"from": "not a date"}):
+        url = url_for("executors.get_executors", **args)
+        with app.test_request_context(url):
+            res = app.test_client().get(url)
+            assert res.status_code == 400
+
+
 def test_put_executor_valid_body(app, manager, plan):
     # Add a executor to the datastore
     run_time = datetime.now() + timedelta(hours=10)
@@ -154,3 +241,74 @@ def test_json_to_date_trigger():
     trigger_dict = {"type": "date", "args": {"date": "2016-06-21T15:30:12+00:00"}}
     trigger = DateTrigger(run_date=my_dt)
     assert trigger.run_date == dict_to_trigger(trigger_dict).run_date
+
+
+def post_bulk(app, body):
+    url = url_for("executors.bulk_executors")
+    with app.test_request_context(url):
+        return app.test_client().post(url, content_type="application/json", data=json.dumps(body))
+
+
+def test_bulk_reschedule_executors(app, manager, plan, monkeypatch):
+    run_time = datetime.now() + timedelta(hours=10)
+    executors = manager.add_executors([(run_time, "executor %d" % i, {}, plan.id) for i in range(3)])
+    wakeups = []
+    monkeypatch.setattr(manager.scheduler, "wakeup", lambda: wakeups.append(1))
+
+    new_date = arrow.get(run_time + timedelta(days=1), "Europe/Madrid")
+    res = post_bulk(app, {"action": "reschedule", "executors": [executor.id for executor in executors] + ["unknown"],
+                          "date": new_date.isoformat()})
+
+    assert res.status_code == 200
+    assert res.json["count"] == 3
+    assert res.json["not_found"] == ["unknown"]
+    assert len(wakeups) == 1
+    for executor in executors:
+        assert manager.get_executor(executor.id).next_run_time == new_date.naive
+        assert manager.scheduler.get_job(executor.id).next_run_time == new_date.datetime
+
+
+def test_bulk_shift_executors_by_filter(app, manager, plan):
+    other_plan = manager.add_plan("other plan")
+    run_time = datetime.now() + timedelta(hours=10)
+    first, later = manager.add_executors([(run_time, "first", {}, plan.id),
+                                          (run_time + timedelta(hours=2), "later", {}, plan.id)])
+    other, = manager.add_executors([(run_time, "other", {}, other_plan.id)])
+
+    try:
+        res = post_bulk(app, {"action": "shift", "seconds": -1800, "filter": {
+            "plan_id": plan.id, "to": arrow.get(run_time + timedelta(hours=1), "Europe/Madrid").isoformat()}})
+
+        assert res.status_code == 200
+        assert res.json["executors"] == [first.id]
+        assert manager.get_executor(first.id).next_run_time == first.next_run_time.replace(tzinfo=None) - \
+            timedelta(seconds=1800)
+        assert manager.get_executor(later.id).next_run_time == later.next_run_time.replace(tzinfo=None)
+        assert manager.get_executor(other.id).next_run_time == other.next_run_time.replace(tzinfo=None)
+    finally:
+        manager.delete_plan(other_plan.id)
+
+
+def test_bulk_delete_executors(app, manager, plan):
+    run_time = datetime.now() + timedelta(hours=10)
+    pending, executed = manager.add_executors([(run_time, "executor %d" % i, {}, plan.id) for i in range(2)])
+    manager.sql_store.remove_job(executed.id)
+
+    res = post_bulk(app, {"action": "delete", "executors": [pending.id, executed.id, "unknown"]})
+
+    assert res.status_code == 200
+    assert sorted(res.json["executors"]) == sorted([pending.id, executed.id])
+    assert res.json["not_found"] == ["unknown"]
+    assert manager.get_executors_for_plan(plan.id) == []
+    stored_plan = manager.get_plan(plan.id)
+    assert (stored_plan.pending_count, stored_plan.executed_count) == (0, 0)
+
+
+def test_bulk_executors_invalid_payload(app):
+    for body in ({"action": "delete"},
+                 {"action": "delete", "executors": ["1"], "filter": {"plan_id": "1"}},
+                 {"action": "delete", "filter": {}},
+                 {"action": "reschedule", "executors": ["1"]},
+                 {"action": "shift", "executors": ["1"]},
+                 {"action": "invalid", "executors": ["1"]}):
+        assert post_bulk(app, body).status_code == 400
@@ -0,0 +1,36 @@
+import json
+from chaosmonkey.api.hal import Document, StreamingDocument, Link
+
+
+def test_streaming_document_embedded(app):
+    items = [{"id": str(i)} for i in range(250)]
+    with app.test_request_context("/api/1/executors/"):
+        expected = Document(embedded={"executors": items}, links=[Link("next", "/next")]).to_dict()
+        document = StreamingDocument("executors", iter(items), links=[Link("next", "/next")])
+
+        assert json.loads(document.to_json()) == expected
+
+
+def test_streaming_document_data(app):
+    items = [{"id": str(i)} for i in range(3)]
+    with app.test_request_context("/api/1/plans/"):
+        expected = Document(data={"plans": items}).to_dict()
+
+        assert json.loads(StreamingDocument("plans", items, embed=False).to_json()) == expected
+        assert json.loads(StreamingDocument("plans", [], embed=False).to_json())["plans"] == []
+
+
+def test_streaming_document_reads_items_while_consumed(app):
+    read = []
+
+    def items():
+        for i in range(StreamingDocument.chunk_size * 3):
+            read.append(i)
+            yield {"id": i}
+
+    with app.test_request_context("/api/1/executors/"):
+        chunks = StreamingDocument("executors", items()).iter_json()
+        next(chunks)
+        assert read == []
+        next(chunks)
+        assert len(read) == StreamingDocument.chunk_size
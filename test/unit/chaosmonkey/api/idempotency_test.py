@@ -0,0 +1,98 @@
+import time
+from flask import url_for, json
+import test.attacks.attack1 as attack1_module
+import test.planners.two_executors as two_executors_module
+from chaosmonkey.api.idempotency import request_fingerprint
+from chaosmonkey.engine.idempotency import idempotency_keys
+from chaosmonkey.engine.plan_tasks import plan_tasks
+
+plan_body = {
+    "name": "idempotent plan",
+    "attack": {"ref": "test.attacks.attack1:Attack1", "args": {}},
+    "planner": {"ref": "test.planners.two_executors:TwoExecutors", "args": {}}
+}
+
+
+def post_plan(app, key, body=None, **query):
+    with app.test_request_context():
+        url = url_for("plans.add_plan", **query)
+        return app.test_client().post(url, content_type="application/json", data=json.dumps(body or plan_body),
+                                      headers={"Idempotency-Key": key})
+
+
+def plans_named(manager, name):
+    return [plan for plan in manager.get_plans(show_all=True) if plan.name == name]
+
+
+def delete_plans_named(manager, name):
+    for plan in plans_named(manager, name):
+        manager.delete_plan(plan.id)
+
+
+def test_retried_request_is_replayed(app, manager):
+    manager.attacks_store.add(attack1_module)
+    manager.planners_store.add(two_executors_module)
+
+    first = post_plan(app, "retried")
+    retry = post_plan(app, "retried")
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.data == first.data
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert len(plans_named(manager, "idempotent plan")) == 1
+
+    post_plan(app, "other key")
+    assert len(plans_named(manager, "idempotent plan")) == 2
+    delete_plans_named(manager, "idempotent plan")
+
+
+def test_async_request_is_replayed_with_the_task_location(app, manager):
+    manager.attacks_store.add(attack1_module)
+    manager.planners_store.add(two_executors_module)
+
+    first = post_plan(app, "async", **{"async": "true"})
+    retry = post_plan(app, "async", **{"async": "true"})
+
+    assert first.status_code == retry.status_code == 202
+    assert retry.headers["Location"] == first.headers["Location"]
+    task = plan_tasks.get(json.loads(retry.data)["id"])
+    assert task.id == json.loads(first.data)["id"]
+    while not task.done:
+        time.sleep(0.01)
+    for plan_id in task.plans:
+        manager.delete_plan(plan_id)
+
+
+def test_key_used_by_a_different_request(app, manager):
+    manager.attacks_store.add(attack1_module)
+    manager.planners_store.add(two_executors_module)
+    post_plan(app, "different")
+
+    res = post_plan(app, "different", dict(plan_body, name="other plan"))
+
+    assert res.status_code == 422
+    assert plans_named(manager, "other plan") == []
+    delete_plans_named(manager, "idempotent plan")
+
+
+def test_key_in_progress(app, manager):
+    with app.test_request_context():
+        url = url_for("plans.add_plan")
+    with app.test_request_context(url, method="POST", content_type="application/json", data=json.dumps(plan_body)):
+        idempotency_keys.claim("in progress", request_fingerprint())
+
+    res = post_plan(app, "in progress")
+
+    assert res.status_code == 409
+    assert plans_named(manager, "idempotent plan") == []
+    manager.sql_store.release_idempotency_keys(["in progress"])
+
+
+def test_failed_request_releases_the_key(app, manager):
+    manager.attacks_store.add(attack1_module)
+    body = dict(plan_body, planner={"ref": "test.planners.two_executors:Unknown", "args": {}})
+
+    assert post_plan(app, "failed", body).status_code == 400
+    assert idempotency_keys.claim("failed", "any") is None
+    manager.sql_store.release_idempotency_keys(["failed"])
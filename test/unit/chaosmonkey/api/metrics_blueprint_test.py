@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from flask import url_for
+
+
+def get_metrics(app):
+    with app.test_request_context():
+        url = url_for("metrics.get_metrics")
+    res = app.test_client().get(url)
+    assert res.status_code == 200
+    assert res.mimetype == "text/plain"
+    return res.data.decode().split("\n")
+
+
+def test_metrics_url(app):
+    with app.test_request_context():
+        assert url_for("metrics.get_metrics") == "/metrics"
+
+
+def test_metrics_of_the_requests_and_the_store(app):
+    client = app.test_client()
+    client.get("/api/1/plans/")
+    client.get("/api/1/plans/tasks/unknown")
+    client.get("/not-a-route")
+
+    lines = get_metrics(app)
+
+    assert any(line.startswith('cme_http_request_duration_seconds_count{route="/api/1/plans/",method="GET",'
+                               'status="200"}') for line in lines)
+    assert any(line.startswith('cme_http_request_duration_seconds_count{route="/api/1/plans/tasks/<string:task_id>",'
+                               'method="GET",status="404"}') for line in lines)
+    assert any(line.startswith('cme_http_request_duration_seconds_count{route="unmatched",method="GET",'
+                               'status="404"}') for line in lines)
+    assert any(line.startswith('cme_store_query_duration_seconds_count{method="get_plans"}') for line in lines)
+
+
+def gauges(app):
+    return dict(line.split(" ") for line in get_metrics(app) if line and not line.startswith("#"))
+
+
+def test_gauges(app, manager):
+    before = gauges(app)
+    plan = manager.add_plan("metrics plan")
+    manager.add_executors([(datetime.now() + timedelta(hours=10), "executor", {}, plan.id)] * 2)
+
+    after = gauges(app)
+    manager.delete_plan(plan.id)
+
+    assert int(after["cme_pending_executors"]) == int(before["cme_pending_executors"]) + 2
+    assert int(after["cme_active_plans"]) == int(before["cme_active_plans"]) + 1
+    assert after['cme_pool_busy_workers{pool="default"}'] == "0"
+    assert after['cme_pool_saturation{pool="default"}'] == "0.0"
@@ -31,3 +31,15 @@ def test_planners_list_return_hal(app, manager):
         assert res.status_code == 200
         assert res.mimetype == "application/hal+json"
         assert res.json == Document(data={"planners": planner_list}).to_dict()
+
+
+def test_planner_list_etag(app, manager):
+    url = url_for("planners.list_planners")
+
+    with app.test_request_context(url):
+        res = app.test_client().get(url)
+        assert res.status_code == 200
+
+        not_modified = app.test_client().get(url, headers={"If-None-Match": res.headers["ETag"]})
+        assert not_modified.status_code == 304
+        assert not_modified.data == b""
@@ -1,8 +1,11 @@
+import time
 from datetime import datetime, timedelta
 from flask import url_for, json
 from chaosmonkey.api.hal import Document
 import test.attacks.attack1 as attack1_module
 import test.planners.planner1 as planner1_module
+import test.planners.two_executors as two_executors_module
+from test.planners.two_executors import TwoExecutors
 
 valid_request_body = {
     "name": "Test Planner",
@@ -42,6 +45,72 @@ def test_plan_list_return_hal(app, manager):
         assert res.json == Document(data={"plans": plan_list}).to_dict()
 
 
+def test_plan_list_paginated(app, manager):
+    plans = [manager.add_plan("plan %d" % i) for i in range(3)]
+
+    url = url_for("plans.list_plans", all="true", limit=1)
+    ids = []
+    with app.test_request_context(url):
+        while url:
+            res = app.test_client().get(url)
+            assert res.status_code == 200
+            page = res.json["plans"]
+            assert len(page) == 1
+            ids += [plan["id"] for plan in page]
+            url = res.json["_links"].get("next", {}).get("href")
+
+    for plan in plans:
+        manager.delete_plan(plan.id)
+    assert [plan_id for plan_id in ids if plan_id in [plan.id for plan in plans]] == [plan.id for plan in plans]
+    assert len(ids) == len(set(ids))
+
+
+def test_plan_list_conditional_get(app, manager, plan):
+    url = url_for("plans.list_plans")
+
+    with app.test_request_context(url):
+        res = app.test_client().get(url, buffered=True)
+        etag = res.headers["ETag"]
+
+        not_modified = app.test_client().get(url, headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == etag
+
+        other_plan = manager.add_plan("other plan")
+        modified = app.test_client().get(url, headers={"If-None-Match": etag}, buffered=True)
+        manager.delete_plan(other_plan.id)
+        assert modified.status_code == 200
+        assert other_plan.id in [item["id"] for item in modified.json["plans"]]
+
+
+def test_plan_list_etag_depends_on_the_query(app, manager, plan):
+    with app.test_request_context("/"):
+        client = app.test_client()
+        etag = client.get("/api/1/plans/", buffered=True).headers["ETag"]
+
+        all_plans = client.get("/api/1/plans/?all=true", headers={"If-None-Match": etag}, buffered=True)
+        assert all_plans.status_code == 200
+        assert all_plans.headers["ETag"] != etag
+        assert client.get("/api/1/plans/?all=true", headers={"If-None-Match": all_plans.headers["ETag"]}).status_code \
+            == 304
+
+
+def test_plan_get_conditional_get(app, manager, plan):
+    url = url_for("plans.get_plan", plan_id=plan.id)
+
+    with app.test_request_context(url):
+        etag = app.test_client().get(url).headers["ETag"]
+
+        # changes in other plans do not change the plan version
+        manager.delete_plan(manager.add_plan("other plan").id)
+        assert app.test_client().get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        manager.add_executor(datetime.now() + timedelta(hours=10), "executor", {}, plan.id)
+        modified = app.test_client().get(url, headers={"If-None-Match": etag})
+        assert modified.status_code == 200
+        assert len(modified.json["_embedded"]["executors"]) == 1
+
+
 def test_plan_get_return_hal_with_executors(app, manager):
     plan = manager.add_plan("plan name")
     run_time = datetime.now() + timedelta(hours=10)
@@ -75,3 +144,145 @@ def test_plan_add_valid_body(app, manager):
         assert res.status_code == 200
         assert res.mimetype == "application/json"
         assert res.json == {"msg": "ok"}
+
+
+def batch_body(*names):
+    planner = {"ref": "test.planners.two_executors:TwoExecutors", "args": {}}
+    return [dict(valid_request_body, name=name, planner=dict(planner)) for name in names]
+
+
+def post_batch(app, body):
+    url = url_for("plans.add_plans")
+    with app.test_request_context(url):
+        return app.test_client().post(url, content_type="application/json", data=json.dumps(body))
+
+
+def test_plans_batch(app, manager):
+    manager.attacks_store.add(attack1_module)
+    manager.planners_store.add(two_executors_module)
+
+    res = post_batch(app, batch_body("first", "second"))
+
+    assert res.status_code == 200
+    results = res.json["plans"]
+    assert [(result["index"], len(result["plans"]), result["executors"]) for result in results] == \
+        [(0, 1, 2), (1, 1, 2)]
+    for result in results:
+        plan_id, = result["plans"]
+        assert manager.get_plan(plan_id).pending_count == 2
+        assert len(manager.get_executors(plan_id=plan_id)) == 2
+        manager.delete_plan(plan_id)
+
+
+def test_plans_batch_is_validated_before_planning(app, manager):
+    manager.attacks_store.add(attack1_module)
+    manager.planners_store.add(two_executors_module)
+    plans_count = len(manager.get_plans(show_all=True))
+    body = batch_body("first", "second", "third")
+    del body[1]["name"]
+    body[2]["planner"]["ref"] = "test.planners.two_executors:Unknown"
+
+    res = post_batch(app, body)
+
+    assert res.status_code == 400
+    assert res.json["msg"] == "invalid plans"
+    assert [error["index"] for error in res.json["errors"]] == [1]
+    assert len(manager.get_plans(show_all=True)) == plans_count
+
+
+def test_plans_batch_is_rolled_back_when_a_planner_fails(app, manager, monkeypatch):
+    class FailingPlanner(TwoExecutors):
+        def plan(self, planner_config, attack_config):
+            super(FailingPlanner, self).plan(planner_config, attack_config)
+            if self.name == "failing":
+                raise ValueError("planner error")
+
+    manager.attacks_store.add(attack1_module)
+    monkeypatch.setattr(manager.planners_store, "get", lambda ref: FailingPlanner)
+    plans_count = len(manager.get_plans(show_all=True))
+    executors_count = len(manager.get_executors())
+
+    res = post_batch(app, batch_body("first", "failing"))
+
+    assert res.status_code == 500
+    assert res.json["errors"] == [{"index": 1, "msg": "planner error"}]
+    assert len(manager.get_plans(show_all=True)) == plans_count
+    assert len(manager.get_executors()) == executors_count
+    assert len(manager.scheduler.get_jobs(jobstore="default")) == executors_count
+
+
+def post_async_plan(app, body):
+    url = url_for("plans.add_plan", **{"async": "true"})
+    with app.test_request_context(url):
+        return app.test_client().post(url, content_type="application/json", data=json.dumps(body))
+
+
+def wait_for_task(app, location):
+    for _ in range(100):
+        with app.test_request_context(location):
+            res = app.test_client().get(location)
+        if res.json["status"] in ("succeeded", "failed"):
+            return res
+        time.sleep(0.05)
+    raise AssertionError("plan task not finished")
+
+
+def test_add_plan_async(app, manager):
+    manager.attacks_store.add(attack1_module)
+    manager.planners_store.add(two_executors_module)
+
+    with app.test_request_context():
+        res = post_async_plan(app, batch_body("async")[0])
+
+        assert res.status_code == 202
+        location = res.headers["Location"]
+        assert location == url_for("plans.get_plan_task", task_id=res.json["id"], _external=True)
+        assert res.json["status"] in ("pending", "running", "succeeded")
+
+        res = wait_for_task(app, location)
+
+    assert res.json["status"] == "succeeded"
+    assert res.json["error"] is None
+    assert res.json["executors"] == 2
+    plan_id, = res.json["plans"]
+    assert res.json["_links"]["plan"]["href"] == "/api/1/plans/%s" % plan_id
+    assert manager.get_plan(plan_id).pending_count == 2
+    manager.delete_plan(plan_id)
+
+
+def test_add_plan_async_is_validated_before_accepted(app, manager):
+    manager.attacks_store.add(attack1_module)
+    body = batch_body("async")[0]
+    body["planner"]["ref"] = "test.planners.two_executors:Unknown"
+
+    with app.test_request_context():
+        res = post_async_plan(app, body)
+
+    assert res.status_code == 400
+
+
+def test_add_plan_async_failed(app, manager, monkeypatch):
+    class FailingPlanner(TwoExecutors):
+        def plan(self, planner_config, attack_config):
+            super(FailingPlanner, self).plan(planner_config, attack_config)
+            raise ValueError("planner error")
+
+    manager.attacks_store.add(attack1_module)
+    monkeypatch.setattr(manager.planners_store, "get", lambda ref: FailingPlanner)
+    plans_count = len(manager.get_plans(show_all=True))
+
+    with app.test_request_context():
+        res = wait_for_task(app, post_async_plan(app, batch_body("failing")[0]).headers["Location"])
+
+    assert res.json["status"] == "failed"
+    assert res.json["error"] == "error executing plan 0: planner error"
+    assert res.json["plans"] == []
+    assert len(manager.get_plans(show_all=True)) == plans_count
+
+
+def test_plan_task_not_found(app):
+    with app.test_request_context():
+        url = url_for("plans.get_plan_task", task_id="unknown")
+        res = app.test_client().get(url)
+
+    assert res.status_code == 404
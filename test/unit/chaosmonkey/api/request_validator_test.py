@@ -0,0 +1,44 @@
+import pytest
+from jsonschema import SchemaError, ValidationError
+from chaosmonkey.api.request_validator import ValidatorsCache
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"name": {"type": "string"}},
+    "required": ["name"]
+}
+
+
+def test_validator_is_compiled_once_per_schema():
+    cache = ValidatorsCache()
+
+    validator = cache.get(SCHEMA)
+    assert cache.get(SCHEMA) is validator
+    assert cache.get(dict(SCHEMA)) is not validator
+
+
+def test_validate():
+    cache = ValidatorsCache()
+
+    cache.validate({"name": "plan"}, SCHEMA)
+    with pytest.raises(ValidationError):
+        cache.validate({"name": 1}, SCHEMA)
+    with pytest.raises(SchemaError):
+        cache.validate({}, {"type": "unknown"})
+
+
+def test_cache_is_cleared_when_the_generation_changes():
+    cache = ValidatorsCache()
+
+    validator = cache.get(SCHEMA, generation=(1, 1))
+    assert cache.get(SCHEMA, generation=(1, 1)) is validator
+    assert cache.get(SCHEMA, generation=(1, 2)) is not validator
+
+
+def test_cache_is_bounded():
+    cache = ValidatorsCache(max_size=2)
+    schemas = [dict(SCHEMA) for _ in range(3)]
+    validators = [cache.get(schema) for schema in schemas]
+
+    assert cache.get(schemas[2]) is validators[2]
+    assert cache.get(schemas[0]) is not validators[0]
@@ -0,0 +1,35 @@
+from chaosmonkey.api.hal import Document
+from chaosmonkey.api.response_cache import ResponseCache
+
+
+class Builder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return Document(data={"calls": self.calls})
+
+
+def test_document_is_built_once_per_version(app):
+    cache = ResponseCache()
+    build = Builder()
+
+    with app.test_request_context("/"):
+        body, etag = cache.get("name", 1, "/", build)
+        assert cache.get("name", 1, "/", build) == (body, etag)
+        assert build.calls == 1
+
+        assert cache.get("name", 2, "/", build)[1] != etag
+        assert build.calls == 2
+
+
+def test_urls_are_bounded(app):
+    cache = ResponseCache(max_urls=2)
+    build = Builder()
+
+    with app.test_request_context("/"):
+        for url in ("/?a", "/?b", "/?c", "/?b"):
+            cache.get("name", 1, url, build)
+
+    assert build.calls == 4
@@ -0,0 +1,44 @@
+import threading
+from flask import url_for
+from chaosmonkey.engine.retention import retention
+
+
+def test_get_retention_not_configured(app):
+    url = url_for("retention.get_retention")
+
+    with app.test_request_context(url):
+        res = app.test_client().get(url)
+
+    assert res.status_code == 200
+    assert res.mimetype == "application/hal+json"
+    assert res.json["retention_days"] is None
+
+
+def test_run_retention_not_configured(app):
+    url = url_for("retention.run_retention")
+
+    with app.test_request_context(url):
+        res = app.test_client().post(url)
+
+    assert res.status_code == 400
+    assert res.json == {"msg": "retention is not configured"}
+
+
+def test_run_retention_is_scheduled(app, monkeypatch):
+    url = url_for("retention.run_retention")
+    done = threading.Event()
+
+    def run():
+        assert threading.current_thread() is not caller
+        done.set()
+    caller = threading.current_thread()
+    monkeypatch.setattr(retention, "retention_days", 30)
+    monkeypatch.setattr(retention, "run", run)
+
+    with app.test_request_context(url):
+        res = app.test_client().post(url)
+
+    assert res.status_code == 202
+    assert res.headers["Location"].endswith(url_for("retention.get_retention"))
+    assert res.json["retention_days"] == 30
+    assert done.wait(5)
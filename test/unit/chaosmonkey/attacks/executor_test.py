@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import pytest
+from chaosmonkey.attacks.executor import execute
+from chaosmonkey.dal.execution_model import Execution
+from chaosmonkey.engine.metrics import metrics
+
+
+class RecordAttack:
+    configs = []
+
+    def __init__(self, attack_config):
+        self.attack_config = attack_config
+
+    def run(self):
+        RecordAttack.configs.append(self.attack_config)
+
+
+def test_execute_resolves_the_stored_attack_config(app, manager, plan, monkeypatch):
+    monkeypatch.setattr(manager.attacks_store, "get", lambda ref: RecordAttack)
+    attack_config = manager.sql_store.add_attack_config(plan.id, {"ref": "record:RecordAttack", "args": {"a": 1}})
+
+    execute(plan_id=plan.id, attack_config_id=attack_config.id)
+    execute(attack_config={"ref": "record:RecordAttack", "args": {"b": 2}}, plan_id=plan.id)
+
+    assert RecordAttack.configs == [{"a": 1}, {"b": 2}]
+
+
+def test_execute_unknown_attack_config(app, manager, plan):
+    with pytest.raises(ValueError):
+        execute(plan_id=plan.id, attack_config_id="unknown")
+
+
+def test_execute_records_the_execution(app, manager, plan, monkeypatch):
+    monkeypatch.setattr(manager.attacks_store, "get", lambda ref: RecordAttack)
+    executor = manager.add_executor(datetime.now() + timedelta(hours=10), "executor", {"ref": "a:A"}, plan.id)
+
+    execute(plan_id=plan.id, attack_config_id=manager.get_executor(executor.id).attack_config_id,
+            executor_id=executor.id)
+
+    execution = Execution.query.get(executor.id)
+    assert execution.outcome == Execution.OUTCOME_SUCCESS
+    assert execution.started <= execution.finished
+    assert execution.duration >= 0
+
+
+def test_execute_records_errors(app, manager, plan):
+    executor = manager.add_executor(datetime.now() + timedelta(hours=10), "executor", {"ref": "a:A"}, plan.id)
+
+    with pytest.raises(ValueError):
+        execute(plan_id=plan.id, attack_config_id="unknown", executor_id=executor.id)
+
+    execution = Execution.query.get(executor.id)
+    assert execution.outcome == Execution.OUTCOME_ERROR
+    assert execution.error.startswith("ValueError: ")
+
+
+def test_execute_observes_the_attack_duration(app, manager, plan, monkeypatch):
+    class FailingAttack(RecordAttack):
+        def run(self):
+            raise RuntimeError("attack failed")
+
+    metrics.attack_duration.clear()
+    monkeypatch.setattr(manager.attacks_store, "get", lambda ref: RecordAttack)
+    execute(attack_config={"ref": "record:RecordAttack", "args": {}}, plan_id=plan.id)
+    monkeypatch.setattr(manager.attacks_store, "get", lambda ref: FailingAttack)
+    with pytest.raises(RuntimeError):
+        execute(attack_config={"ref": "record:FailingAttack", "args": {}}, plan_id=plan.id)
+
+    durations = metrics.attack_duration.values()
+    assert sorted(durations) == [("record:FailingAttack", Execution.OUTCOME_ERROR),
+                                 ("record:RecordAttack", Execution.OUTCOME_SUCCESS)]
+    assert all(count == 1 for _, _, count in durations.values())
@@ -0,0 +1,27 @@
+from chaosmonkey.dal.change_versions import ChangeVersions
+
+
+def test_bump_versions():
+    versions = ChangeVersions()
+    assert versions.tag() == versions.tag("plan") == versions.epoch + "-0"
+
+    assert versions.bump(["plan"]) == 1
+    assert versions.bump() == 2
+    assert versions.plan_version("plan") == 1
+    assert versions.plan_version("other") == 0
+    assert versions.tag() == versions.epoch + "-2"
+
+
+def test_bump_all_plans():
+    versions = ChangeVersions()
+    versions.bump(["plan"])
+    versions.bump(all_plans=True)
+    versions.bump(["other"])
+
+    assert versions.plan_version("plan") == 2
+    assert versions.plan_version("unknown") == 2
+    assert versions.plan_version("other") == 3
+
+
+def test_epoch_changes_on_restart():
+    assert ChangeVersions().tag() != ChangeVersions().tag()
@@ -0,0 +1,355 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from apscheduler.jobstores.base import JobLookupError
+from chaosmonkey.dal.cme_sqlalchemy_store import CMESQLAlchemyStore
+from chaosmonkey.dal.database import db
+from chaosmonkey.dal.execution_model import Execution
+from chaosmonkey.dal.executor_model import Executor
+
+
+def add_executors(manager, plan, count):
+    run_time = datetime.now() + timedelta(hours=10)
+    return manager.add_executors([(run_time, "executor %d" % i, {}, plan.id) for i in range(count)])
+
+
+def cached_store(manager):
+    store = CMESQLAlchemyStore(cache_jobs=True)
+    store.start(manager.scheduler, "cached")
+    return store
+
+
+def count_statements(func, *args):
+    statements = []
+
+    def before_cursor_execute(*_):
+        statements.append(1)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = func(*args)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    return result, len(statements)
+
+
+def test_plan_counters_follow_executors(app, manager, plan):
+    first, second = add_executors(manager, plan, 2)
+
+    stored_plan = manager.get_plan(plan.id)
+    assert (stored_plan.pending_count, stored_plan.executed_count) == (2, 0)
+    assert stored_plan.executed is False
+
+    manager.sql_store.remove_job(first.id)
+    stored_plan = manager.get_plan(plan.id)
+    assert (stored_plan.pending_count, stored_plan.executed_count) == (1, 1)
+    assert stored_plan.executed is False
+
+    manager.sql_store.remove_job(second.id)
+    stored_plan = manager.get_plan(plan.id)
+    assert (stored_plan.pending_count, stored_plan.executed_count) == (0, 2)
+    assert stored_plan.executed is True
+    assert stored_plan.executors_count == 2
+
+
+def test_remove_all_jobs_marks_the_plans_as_executed(app, manager, plan):
+    empty_plan = manager.add_plan("empty plan")
+    add_executors(manager, plan, 2)
+
+    manager.sql_store.remove_all_jobs()
+
+    stored_plan = manager.get_plan(plan.id)
+    assert (stored_plan.pending_count, stored_plan.executed) == (0, True)
+    assert manager.get_plan(empty_plan.id).executed is False
+    manager.delete_plan(empty_plan.id)
+
+
+def test_remove_job_twice_does_not_count_twice(app, manager, plan):
+    executor, = add_executors(manager, plan, 1)
+
+    manager.sql_store.remove_job(executor.id)
+    with pytest.raises(JobLookupError):
+        manager.sql_store.remove_job(executor.id)
+
+    stored_plan = manager.get_plan(plan.id)
+    assert (stored_plan.pending_count, stored_plan.executed_count) == (0, 1)
+
+
+def test_real_remove_job_updates_counters(app, manager, plan):
+    executed, pending = add_executors(manager, plan, 2)
+    manager.sql_store.remove_job(executed.id)
+
+    manager.sql_store.real_remove_job(executed.id)
+    stored_plan = manager.get_plan(plan.id)
+    assert (stored_plan.pending_count, stored_plan.executed_count) == (1, 0)
+
+    manager.sql_store.real_remove_job(pending.id)
+    stored_plan = manager.get_plan(plan.id)
+    assert (stored_plan.pending_count, stored_plan.executed_count) == (0, 0)
+    assert stored_plan.executed is True
+
+
+def test_get_plans_returns_counters(app, manager, plan):
+    add_executors(manager, plan, 3)
+
+    stored_plan, = [p for p in manager.get_plans(show_all=True) if p.id == plan.id]
+    assert stored_plan.executors_count == 3
+    assert stored_plan.next_execution is not None
+
+
+def test_get_next_run_time_ignores_executed_executors(app, manager, plan):
+    run_time = datetime.now() + timedelta(hours=1)
+    executed, pending = manager.add_executors([
+        (run_time, "executed", {}, plan.id),
+        (run_time + timedelta(hours=1), "pending", {}, plan.id)
+    ])
+    manager.sql_store.remove_job(executed.id)
+
+    assert manager.sql_store.get_next_run_time() == pending.next_run_time
+    assert [job.id for job in manager.sql_store.get_due_jobs(pending.next_run_time)] == [pending.id]
+
+
+def test_cached_store_serves_reads_from_memory(app, manager, plan):
+    run_time = datetime.now() + timedelta(hours=1)
+    first, second = manager.add_executors([
+        (run_time + timedelta(minutes=5), "second", {}, plan.id),
+        (run_time, "first", {}, plan.id)
+    ])[::-1]
+    store = cached_store(manager)
+
+    next_run_time, statements = count_statements(store.get_next_run_time)
+    assert statements == 0
+    assert next_run_time == manager.sql_store.get_next_run_time() == first.next_run_time
+
+    due_jobs, statements = count_statements(store.get_due_jobs, second.next_run_time)
+    assert statements == 0
+    assert [job.id for job in due_jobs] == [job.id for job in manager.sql_store.get_due_jobs(second.next_run_time)]
+
+    job, statements = count_statements(store.lookup_job, first.id)
+    assert statements == 0
+    assert job.id == first.id
+
+
+def test_cached_store_writes_through(app, manager, plan):
+    executor, = add_executors(manager, plan, 1)
+    store = cached_store(manager)
+    job = store.lookup_job(executor.id)
+
+    job._modify(next_run_time=job.next_run_time - timedelta(hours=9))
+    store.update_job(job)
+    assert store.get_next_run_time() == job.next_run_time
+    assert manager.sql_store.lookup_job(executor.id).next_run_time == job.next_run_time
+
+    store.remove_job(executor.id)
+    assert executor.id not in [job.id for job in store.get_all_jobs()]
+    assert manager.get_executor(executor.id).executed is True
+    with pytest.raises(JobLookupError):
+        store.lookup_job(executor.id)
+
+
+def test_cached_store_keeps_the_committed_jobs_if_a_write_fails(app, manager, plan, monkeypatch):
+    executor, = add_executors(manager, plan, 1)
+    store = cached_store(manager)
+    job = store.lookup_job(executor.id)
+    next_run_time = job.next_run_time
+
+    # the scheduler modifies the jobs before writing them
+    job._modify(next_run_time=next_run_time - timedelta(hours=9))
+
+    def encode(job):
+        raise ValueError("unable to encode")
+    monkeypatch.setattr(store.codec, "encode", encode)
+    with pytest.raises(ValueError):
+        store.update_jobs([job])
+
+    assert store.lookup_job(executor.id).next_run_time == next_run_time
+    assert store.get_next_run_time() == next_run_time
+
+
+def test_executors_share_the_plan_attack_config(app, manager, plan):
+    attack_config = {"ref": "attack1:Attack1", "args": {"key": "x" * 1000}}
+    run_time = datetime.now() + timedelta(hours=10)
+    executors = manager.add_executors([(run_time, "executor %d" % i, attack_config, plan.id) for i in range(3)])
+    executors.append(manager.add_executor(run_time, "executor", dict(attack_config), plan.id))
+
+    stored = [manager.get_executor(executor.id) for executor in executors]
+    attack_config_ids = set(executor.attack_config_id for executor in stored)
+    assert len(attack_config_ids) == 1
+    assert manager.sql_store.get_attack_config(attack_config_ids.pop()).attack_config == attack_config
+    assert all(len(executor.job_state) < 1000 for executor in stored)
+
+
+def test_delete_plan_deletes_attack_configs(app, manager):
+    plan = manager.add_plan("plan name")
+    executor = manager.add_executor(datetime.now() + timedelta(hours=10), "executor", {"ref": "a:A"}, plan.id)
+    attack_config_id = manager.get_executor(executor.id).attack_config_id
+
+    manager.delete_plan(plan.id)
+    assert manager.sql_store.get_attack_config(attack_config_id) is None
+
+
+def test_remove_job_moves_executor_to_history(app, manager, plan):
+    executor, = add_executors(manager, plan, 1)
+
+    manager.sql_store.remove_job(executor.id)
+
+    execution = manager.get_executor(executor.id)
+    assert isinstance(execution, Execution)
+    assert (execution.plan_id, execution.outcome) == (plan.id, Execution.OUTCOME_SUBMITTED)
+    assert execution.next_run_time == executor.next_run_time.replace(tzinfo=None)
+    assert Executor.query.get(executor.id) is None
+    assert executor.id in [e.id for e in manager.get_executors(executed=True)]
+    assert executor.id not in [e.id for e in manager.get_executors()]
+    assert [e.id for e in manager.get_executors_for_plan(plan.id)] == [executor.id]
+
+
+def test_record_execution_before_remove_job(app, manager, plan):
+    executor, = add_executors(manager, plan, 1)
+    started = datetime.now()
+
+    manager.sql_store.record_execution(executor.id, Execution.OUTCOME_ERROR, started,
+                                       started + timedelta(seconds=3), "ValueError: boom")
+    manager.sql_store.remove_job(executor.id)
+
+    execution = Execution.query.get(executor.id)
+    assert (execution.outcome, execution.duration, execution.error) == (Execution.OUTCOME_ERROR, 3, "ValueError: boom")
+    assert manager.get_plan(plan.id).executed_count == 1
+
+
+def test_start_moves_executed_executors_to_history(app, manager, plan):
+    executor = Executor("legacy", datetime.now(), plan.id, b"")
+    executor.executed = True
+    db.session.add(executor)
+    db.session.commit()
+
+    cached_store(manager)
+
+    assert Executor.query.get("legacy") is None
+    assert Execution.query.get("legacy").outcome == Execution.OUTCOME_SUBMITTED
+
+
+def test_failed_write_rolls_back_session(app, manager, plan):
+    executor = add_executors(manager, plan, 1)[0]
+
+    with pytest.raises(JobLookupError):
+        manager.sql_store.remove_job("not-found")
+    # the session is still usable and the lock released
+    assert manager.sql_store._write_lock.acquire(blocking=False)
+    manager.sql_store._write_lock.release()
+    manager.sql_store.remove_job(executor.id)
+    assert manager.get_executor(executor.id).executed is True
+
+
+def test_writes_bump_change_versions(app, manager, plan):
+    versions = manager.sql_store.versions
+    other_plan = manager.add_plan("other plan")
+    version, other_version = versions.version, versions.plan_version(other_plan.id)
+
+    executor, = add_executors(manager, plan, 1)
+    assert versions.version > version
+    assert versions.plan_version(plan.id) == versions.version
+    assert versions.plan_version(other_plan.id) == other_version
+
+    version = versions.version
+    manager.sql_store.record_execution(executor.id, Execution.OUTCOME_SUCCESS)
+    assert versions.plan_version(plan.id) == versions.version > version
+
+    manager.delete_plan(other_plan.id)
+    assert versions.plan_version(other_plan.id) == versions.version > other_version
+    assert manager.get_change_version(plan.id) != manager.get_change_version()
+
+
+def test_writes_without_changes_keep_change_versions(app, manager, plan):
+    store = manager.sql_store
+    executor, = add_executors(manager, plan, 1)
+    version = manager.get_change_version()
+
+    store.claim_idempotency_key("key", "fingerprint", datetime.utcnow() - timedelta(days=1))
+    store.complete_idempotency_key("key", 201, {}, "{}")
+    store.release_idempotency_keys()
+    store.delete_idempotency_keys(datetime.utcnow() + timedelta(days=1), 10)
+    store.incremental_vacuum(10)
+    assert manager.get_change_version() == version
+
+    with pytest.raises(JobLookupError):
+        store.remove_job("not-found")
+    with pytest.raises(ValueError):
+        with store.transaction():
+            store.remove_job(executor.id)
+            raise ValueError("rolled back")
+    assert manager.get_change_version() == version
+    assert manager.get_executor(executor.id).executed is False
+
+    store.remove_job(executor.id)
+    assert manager.get_change_version() != version
+
+
+def test_transaction_is_committed_at_once(app, manager, plan):
+    store = cached_store(manager)
+    versions = store.versions
+    run_time = datetime.now() + timedelta(hours=10)
+    job = manager.scheduler._create_job(func=dict, trigger="date", run_date=run_time, kwargs={"plan_id": plan.id})
+    job._modify(next_run_time=job.trigger.get_next_fire_time(None, run_time), **manager.scheduler._job_defaults)
+
+    seq = store.events.last_seq
+    with pytest.raises(ValueError):
+        with store.transaction():
+            store.add_jobs([job])
+            raise ValueError()
+    assert job.id not in [cached.id for cached in store.get_all_jobs()]
+    assert Executor.query.get(job.id) is None
+    assert store.events.last_seq == seq
+
+    version = versions.version
+    with store.transaction():
+        store.add_jobs([job])
+        assert versions.version == version
+        assert job.id not in [cached.id for cached in store.get_all_jobs()]
+        assert store.events.last_seq == seq
+    assert versions.plan_version(plan.id) == versions.version > version
+    assert job.id in [cached.id for cached in store.get_all_jobs()]
+    assert [(event.type, event.data["id"]) for event in store.events.since(seq)[0]] == [("executor_added", job.id)]
+    store.real_remove_job(job.id)
+
+
+def test_start_on_a_database_of_an_older_version(app, manager, monkeypatch):
+    import pickle
+    from flask import Flask
+    from apscheduler.job import Job
+    from apscheduler.triggers.date import DateTrigger
+    from chaosmonkey.attacks.executor import execute
+    from chaosmonkey.dal.plan_model import Plan
+    from test.unit.chaosmonkey.dal.database_test import baseline_database
+
+    run_time = manager.scheduler.timezone.localize(datetime(2030, 1, 1, 10))
+    job = Job(manager.scheduler, id="e1", func=execute, trigger=DateTrigger(run_time), executor="default",
+              args=(), kwargs={"attack_config": {"ref": "a:A"}, "plan_id": "p1"}, name="executor",
+              misfire_grace_time=1, coalesce=True, max_instances=1, next_run_time=run_time)
+    job_state = pickle.dumps(job.__getstate__(), pickle.HIGHEST_PROTOCOL)
+    path = baseline_database(
+        plans=[("p1", "plan", "2017-01-01 10:00:00.000000", False)],
+        executors=[("e1", "2030-01-01 10:00:00.000000", job_state, "p1", False),
+                   ("e2", "2017-01-01 10:00:00.000000", job_state, "p1", True)])
+
+    older_app = Flask("older_version")
+    older_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + path
+    older_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(older_app)
+    monkeypatch.setattr(db, "app", older_app)
+    db.session.remove()
+    try:
+        with older_app.app_context():
+            db.create_all()
+            store = CMESQLAlchemyStore(cache_jobs=True)
+            store.start(manager.scheduler, "older")
+
+            assert [job.id for job in store.get_all_jobs()] == ["e1"]
+            assert store.lookup_job("e1").kwargs["attack_config"] == {"ref": "a:A"}
+            assert Execution.query.get("e2").plan_id == "p1"
+            plan = Plan.query.get("p1")
+            assert (plan.pending_count, plan.executed_count, plan.executed) == (1, 1, False)
+            # the full VACUUM to convert the database is only run on startup
+            assert store.incremental_vacuum(10) is False
+            db.engine.dispose()
+    finally:
+        db.session.remove()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import pytest
+from sqlalchemy import create_engine
+from chaosmonkey.dal.database import db, STORAGE_DEFAULTS, configure_sqlite, storage_options, migrate_schema, \
+    convert_to_incremental_vacuum
+
+#: tables of the databases created by the 1.1.0 version
+BASELINE_SCHEMA = [
+    "CREATE TABLE cme_plans (id VARCHAR(80) NOT NULL, name VARCHAR(200), created DATETIME, executed BOOLEAN, "
+    "PRIMARY KEY (id), UNIQUE (created), CHECK (executed IN (0, 1)))",
+    "CREATE TABLE cme_executors (id VARCHAR(80) NOT NULL, next_run_time DATETIME, job_state BLOB NOT NULL, "
+    "plan_id INTEGER, executed BOOLEAN, PRIMARY KEY (id), FOREIGN KEY(plan_id) REFERENCES cme_plans (id), "
+    "CHECK (executed IN (0, 1)))",
+    "CREATE INDEX ix_cme_executors_next_run_time ON cme_executors (next_run_time)"
+]
+
+
+def baseline_database(plans, executors):
+    """
+    Create a database file with the 1.1.0 schema
+
+    :param plans:       list of (id, name, created, executed)
+    :param executors:   list of (id, next_run_time, job_state, plan_id, executed)
+    :return:            path of the database
+    """
+    path = os.path.join(tempfile.mkdtemp(), "cme.sqlite")
+    engine = create_engine("sqlite:///" + path)
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(statement)
+        for plan in plans:
+            connection.execute("INSERT INTO cme_plans VALUES (?, ?, ?, ?)", plan)
+        for executor in executors:
+            connection.execute("INSERT INTO cme_executors VALUES (?, ?, ?, ?, ?)", executor)
+    engine.dispose()
+    return path
+
+
+def pragma(engine, name):
+    with engine.connect() as connection:
+        return connection.execute("PRAGMA %s" % name).scalar()
+
+
+def test_storage_options_defaults():
+    assert storage_options() == STORAGE_DEFAULTS
+    assert storage_options(busy_timeout=None)["busy_timeout"] == STORAGE_DEFAULTS["busy_timeout"]
+
+
+def test_storage_options_normalize_and_validate():
+    assert storage_options(journal_mode="delete", synchronous="full")["journal_mode"] == "DELETE"
+
+    with pytest.raises(ValueError):
+        storage_options(journal_mode="journal")
+    with pytest.raises(ValueError):
+        storage_options(synchronous="sometimes")
+    with pytest.raises(ValueError):
+        storage_options(cache_size=100)
+
+
+def test_configure_sqlite_file_database():
+    path = os.path.join(tempfile.mkdtemp(), "cme.sqlite")
+    engine = create_engine("sqlite:///" + path)
+    configure_sqlite(engine, storage_options(busy_timeout=1234))
+
+    assert pragma(engine, "journal_mode") == "wal"
+    assert pragma(engine, "synchronous") == 1
+    assert pragma(engine, "busy_timeout") == 1234
+    assert pragma(engine, "auto_vacuum") == 2
+    engine.dispose()
+
+
+def test_configure_sqlite_memory_database_keeps_journal():
+    engine = create_engine("sqlite://")
+    configure_sqlite(engine)
+
+    assert pragma(engine, "journal_mode") == "memory"
+    assert pragma(engine, "auto_vacuum") == 2
+
+
+def test_migrate_schema_adds_and_fills_the_plan_counters():
+    path = baseline_database(
+        plans=[("p1", "pending", "2017-01-01 10:00:00.000000", False),
+               ("p2", "executed", "2017-01-01 11:00:00.000000", False),
+               ("p3", "empty", "2017-01-01 12:00:00.000000", False)],
+        executors=[("e1", "2030-01-01 10:00:00.000000", b"state", "p1", False),
+                   ("e2", "2030-01-01 11:00:00.000000", b"state", "p1", None),
+                   ("e3", "2017-01-01 10:00:00.000000", b"state", "p1", True),
+                   ("e4", "2017-01-01 11:00:00.000000", b"state", "p2", True)])
+    engine = create_engine("sqlite:///" + path)
+    db.Model.metadata.create_all(engine)
+
+    assert migrate_schema(engine) == ["cme_plans.pending_count", "cme_plans.executed_count",
+                                      "cme_executors.attack_config_id"]
+    assert migrate_schema(engine) == []
+
+    with engine.connect() as connection:
+        plans = connection.execute("SELECT id, pending_count, executed_count, executed FROM cme_plans "
+                                   "ORDER BY id").fetchall()
+    assert [tuple(plan) for plan in plans] == [("p1", 2, 1, 0), ("p2", 0, 1, 1), ("p3", 0, 0, 0)]
+
+    with engine.connect() as connection:
+        indexes = set(row[1] for row in connection.execute("PRAGMA index_list(cme_executors)"))
+    assert "ix_cme_executors_executed_next_run_time_id" in indexes
+    assert "ix_cme_executors_next_run_time" not in indexes
+    engine.dispose()
+
+
+def test_convert_to_incremental_vacuum():
+    engine = create_engine("sqlite:///" + baseline_database([], []))
+    assert pragma(engine, "auto_vacuum") == 0
+
+    assert convert_to_incremental_vacuum(engine) is True
+    assert pragma(engine, "auto_vacuum") == 2
+    assert convert_to_incremental_vacuum(engine) is False
+    engine.dispose()
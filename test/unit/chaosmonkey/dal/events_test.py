@@ -0,0 +1,33 @@
+from chaosmonkey.dal.events import EventBus
+
+
+def test_events_since_a_sequence_number():
+    bus = EventBus(size=3)
+    assert bus.since(0) == ([], False)
+
+    bus.publish([("a", {"id": 1}), ("b", {"id": 2})])
+    events, missed = bus.since(0)
+    assert [(event.seq, event.type) for event in events] == [(1, "a"), (2, "b")] and not missed
+    assert [event.seq for event in bus.since(1)[0]] == [2]
+    assert bus.since(2) == ([], False)
+
+
+def test_events_out_of_the_buffer_are_missed():
+    bus = EventBus(size=3)
+    bus.publish([("event", {"id": i}) for i in range(5)])
+
+    events, missed = bus.since(0)
+    assert [event.seq for event in events] == [3, 4, 5] and missed
+    events, missed = bus.since(2)
+    assert [event.seq for event in events] == [3, 4, 5] and not missed
+
+
+def test_event_ids_are_only_valid_in_the_same_run():
+    bus = EventBus()
+    bus.publish([("event", {"id": 1})])
+    event_id = bus.since(0)[0][0].id
+
+    assert bus.parse_id(event_id) == 1
+    assert EventBus().parse_id(event_id) is None
+    assert bus.parse_id("not an id") is None
+    assert bus.parse_id(None) is None
@@ -0,0 +1,65 @@
+import pickle
+from datetime import datetime, timedelta
+import pytest
+from apscheduler.job import Job
+from apscheduler.triggers.interval import IntervalTrigger
+from chaosmonkey.dal.job_state_codec import JobStateCodec, FORMAT_JSON, FORMAT_JSON_ZLIB
+
+
+def create_job(manager, trigger='date', **kwargs):
+    run_date = manager.scheduler.timezone.localize(datetime.now() + timedelta(hours=10))
+    job = manager.scheduler._create_job("chaosmonkey.attacks.executor:execute", trigger=trigger, id="job id",
+                                        name="job name", kwargs=kwargs, run_date=run_date)
+    job._modify(misfire_grace_time=1, coalesce=True, max_instances=1, next_run_time=run_date)
+    return job
+
+
+def assert_same_state(state, job):
+    expected = job.__getstate__()
+    assert state.pop("trigger").run_date == expected.pop("trigger").run_date
+    assert state == expected
+
+
+def test_encode_decode_json(app, manager):
+    job = create_job(manager, attack_config_id="config id", plan_id="plan id")
+    job_state = JobStateCodec().encode(job)
+
+    assert job_state[0] == FORMAT_JSON
+    assert_same_state(JobStateCodec().decode(job_state), job)
+
+
+def test_encode_decode_compressed(app, manager):
+    job = create_job(manager, attack_config={"ref": "a:A", "args": {"pem": "x" * 2000}})
+    job_state = JobStateCodec(compress_threshold=512).encode(job)
+
+    assert job_state[0] == FORMAT_JSON_ZLIB
+    assert len(job_state) < 512
+    assert_same_state(JobStateCodec().decode(job_state), job)
+
+
+def test_decode_pickled_job_state(app, manager):
+    job = create_job(manager, plan_id="plan id")
+    job_state = pickle.dumps(job.__getstate__(), pickle.HIGHEST_PROTOCOL)
+
+    assert_same_state(JobStateCodec().decode(job_state), job)
+
+
+def test_encode_other_triggers_with_pickle(app, manager):
+    job = create_job(manager, trigger=IntervalTrigger(hours=1))
+    state = JobStateCodec().decode(JobStateCodec().encode(job))
+
+    assert isinstance(state["trigger"], IntervalTrigger)
+    assert state["id"] == job.id
+
+
+def test_decode_unknown_format():
+    with pytest.raises(ValueError):
+        JobStateCodec().decode(b"\x07{}")
+
+
+def test_store_reconstitutes_encoded_jobs(app, manager, plan):
+    executor = manager.add_executor(datetime.now() + timedelta(hours=10), "executor", {"ref": "a:A"}, plan.id)
+
+    assert manager.get_executor(executor.id).job_state[0] == FORMAT_JSON
+    assert isinstance(manager.sql_store.lookup_job(executor.id), Job)
+    assert manager.sql_store.lookup_job(executor.id).next_run_time == executor.next_run_time
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from apscheduler.job import Job
+from apscheduler.triggers.date import DateTrigger
+from pytz import utc
+from chaosmonkey.dal.jobs_cache import JobsCache, COMPACT_MIN_ENTRIES
+
+
+def new_job(job_id, run_time):
+    return Job(SimpleNamespace(timezone=utc), id=job_id, func="chaosmonkey.attacks.executor:execute",
+               trigger=DateTrigger(run_time), executor="default", args=(), kwargs={}, name=job_id,
+               misfire_grace_time=1, coalesce=True, max_instances=1, next_run_time=run_time)
+
+
+def test_changes_of_the_returned_jobs_do_not_reach_the_cache():
+    cache = JobsCache()
+    run_time = datetime(2017, 1, 1, tzinfo=utc)
+    job = new_job("job", run_time)
+    cache.add(job)
+
+    job._modify(next_run_time=run_time + timedelta(hours=1))
+    cache.get("job")._modify(next_run_time=run_time + timedelta(hours=2))
+    cache.due_jobs(run_time)[0]._modify(next_run_time=run_time + timedelta(hours=3))
+
+    assert cache.get("job").next_run_time == run_time
+    assert cache.next_run_time() == run_time
+    assert [job.id for job in cache.due_jobs(run_time)] == ["job"]
+
+
+def test_stale_entries_are_compacted():
+    cache = JobsCache()
+    run_time = datetime(2017, 1, 1, tzinfo=utc)
+    for i in range(10):
+        cache.add(new_job("job %d" % i, run_time))
+
+    for hours in range(1, 100):
+        cache.add(new_job("job 0", run_time + timedelta(hours=hours)))
+
+    assert len(cache._run_times) <= 2 * len(cache) + COMPACT_MIN_ENTRIES
+    assert [job.id for job in cache.due_jobs(run_time)] == ["job %d" % i for i in range(1, 10)]
+    assert cache.get("job 0").next_run_time == run_time + timedelta(hours=99)
+
+    for i in range(10):
+        cache.remove("job %d" % i)
+    assert len(cache._run_times) <= COMPACT_MIN_ENTRIES
+    assert cache.next_run_time() is None
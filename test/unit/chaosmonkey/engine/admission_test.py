@@ -0,0 +1,137 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from chaosmonkey.attacks.attack import Attack
+from chaosmonkey.engine.admission import AdmissionController, parse_limit
+from chaosmonkey.engine.pools import Pools, DEFAULT_POOL
+
+
+class ASGAttack(Attack):
+    ref = "asg:ASGAttack"
+
+
+class OtherAttack(Attack):
+    ref = "other:OtherAttack"
+
+
+def run_concurrently(controller, attacks, duration=0.05):
+    """ Run the attacks in threads, started in order, and return the admission order and max concurrency """
+    admitted, running, max_running = [], [0], [0]
+    lock = threading.Lock()
+    finished = threading.Semaphore(0)
+    threads = ThreadPoolExecutor(len(attacks))
+
+    def run(name, attack_class, args):
+        def attack(waited):
+            with lock:
+                admitted.append(name)
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(duration)
+            with lock:
+                running[0] -= 1
+            finished.release()
+        controller.run(attack_class, args, attack, threads.submit)
+
+    for name, attack_class, args in attacks:
+        threads.submit(run, name, attack_class, args)
+        time.sleep(0.005)
+    for _ in attacks:
+        assert finished.acquire(timeout=5)
+    threads.shutdown()
+    return admitted, max_running[0]
+
+
+def test_parse_limit():
+    assert parse_limit("asg:ASGAttack=2") == ("asg:ASGAttack", 2)
+
+    for spec in ("asg:ASGAttack", "=2", "asg:ASGAttack=0", "asg:ASGAttack=two"):
+        with pytest.raises(ValueError):
+            parse_limit(spec)
+
+
+def test_default_target_key():
+    assert Attack.target_key({"region": "eu-west-1", "filters": {"tag:Name": "asg"}, "other": 1}) == \
+        Attack.target_key({"filters": {"tag:Name": "asg"}, "region": "eu-west-1"})
+    assert Attack.target_key({"region": "eu-west-1"}) != Attack.target_key({"region": "us-east-1"})
+    assert Attack.target_key({"url": "http://localhost"}) is None
+    assert Attack.target_key(None) is None
+
+
+def test_keys_for():
+    controller = AdmissionController()
+    assert controller.keys_for(ASGAttack, {"region": "eu-west-1"}) == []
+
+    controller.configure({"asg:ASGAttack": 2}, target_limit=1)
+    assert controller.keys_for(ASGAttack, {"region": "eu-west-1"}) == [
+        ("asg:ASGAttack", 2), ('asg:ASGAttack@{"region":"eu-west-1"}', 1)]
+    assert controller.keys_for(OtherAttack, {}) == []
+
+
+def test_attack_limit_queues_in_order():
+    controller = AdmissionController()
+    controller.configure({"asg:ASGAttack": 1})
+
+    admitted, max_running = run_concurrently(controller, [("attack %d" % i, ASGAttack, {}) for i in range(4)])
+
+    assert max_running == 1
+    assert admitted == ["attack %d" % i for i in range(4)]
+    stats, = controller.stats()
+    assert stats["key"] == "asg:ASGAttack"
+    assert (stats["running"], stats["queued"], stats["admitted"]) == (0, 0, 4)
+    assert stats["max_queued"] == 3
+    assert stats["max_wait"] >= 0.1
+
+
+def test_target_limit_does_not_block_other_targets():
+    controller = AdmissionController()
+    controller.configure(target_limit=1)
+    first, second = {"region": "eu-west-1"}, {"region": "us-east-1"}
+
+    admitted, max_running = run_concurrently(controller, [
+        ("first 1", ASGAttack, first), ("first 2", ASGAttack, first), ("second 1", ASGAttack, second),
+        ("other", OtherAttack, first)
+    ], duration=0.1)
+
+    assert max_running == 3
+    assert admitted == ["first 1", "second 1", "other", "first 2"]
+    assert [stats["admitted"] for stats in controller.stats()] == [2, 1, 1]
+
+
+def test_queued_attacks_do_not_hold_the_pool_threads():
+    pools = Pools()
+    executor = pools.configure({DEFAULT_POOL: ("thread", 2)})[DEFAULT_POOL]
+    controller = AdmissionController()
+    controller.configure({"asg:ASGAttack": 1})
+    release, other_ran = threading.Event(), threading.Event()
+    admitted, finished = [], threading.Semaphore(0)
+
+    def asg_attack(name):
+        def attack(waited):
+            admitted.append(name)
+            release.wait(5)
+            finished.release()
+        return attack
+
+    def run(attack_class, attack):
+        return controller.run(attack_class, {}, attack, lambda call: pools.submit(attack_class, call))
+
+    # more attacks of the limited ref than pool threads
+    results = [executor.submit_call(lambda i=i: run(ASGAttack, asg_attack("asg %d" % i))) for i in range(5)]
+    time.sleep(0.1)
+    assert [result.result(timeout=5) for result in results[1:]] == [False] * 4
+
+    # the queued attacks left a thread free for another ref
+    executor.submit_call(lambda: run(OtherAttack, lambda waited: other_ran.set()))
+    assert other_ran.wait(5)
+    assert admitted == ["asg 0"]
+    assert controller.stats()[0]["queued"] == 4
+
+    release.set()
+    for _ in range(5):
+        assert finished.acquire(timeout=5)
+    assert admitted == ["asg %d" % i for i in range(5)]
+    stats, = controller.stats()
+    assert (stats["running"], stats["queued"], stats["admitted"]) == (0, 0, 5)
+    executor.shutdown()
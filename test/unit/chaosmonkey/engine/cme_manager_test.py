@@ -0,0 +1,127 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+
+
+def test_add_executors_stores_all_executors(app, manager, plan):
+    run_time = datetime.now() + timedelta(hours=10)
+    executors = manager.add_executors([
+        (run_time + timedelta(minutes=i), "executor %d" % i, {}, plan.id) for i in range(5)
+    ])
+
+    stored_ids = set(executor.id for executor in manager.get_executors_for_plan(plan.id))
+    assert len(executors) == 5
+    assert stored_ids == set(executor.id for executor in executors)
+    assert manager.get_plan(plan.id).executed is False
+
+
+def test_executors_batch_adds_executors_on_exit(app, manager, plan):
+    run_time = datetime.now() + timedelta(hours=10)
+
+    with manager.executors_batch():
+        executor = manager.add_executor(run_time, "executor name", {}, plan.id)
+        assert manager.get_executor(executor.id) is None
+
+    assert manager.get_executor(executor.id).plan_id == plan.id
+
+
+def test_executors_batch_discards_executors_on_error(app, manager, plan):
+    run_time = datetime.now() + timedelta(hours=10)
+
+    with pytest.raises(ValueError):
+        with manager.executors_batch():
+            executor = manager.add_executor(run_time, "executor name", {}, plan.id)
+            raise ValueError()
+
+    assert manager.get_executor(executor.id) is None
+
+
+def test_executors_batch_discards_the_attack_configs_on_error(app, manager, plan):
+    from chaosmonkey.dal.attack_config_model import AttackConfig
+    run_time = datetime.now() + timedelta(hours=10)
+
+    with pytest.raises(ValueError):
+        with manager.executors_batch():
+            new_plan = manager.add_plan("failed plan")
+            manager.add_executor(run_time, "executor name", {"ref": "a:A", "args": {}}, new_plan.id)
+            manager.add_executor(run_time, "executor name", {"ref": "b:B", "args": {}}, plan.id)
+            raise ValueError()
+
+    assert manager.get_plan(new_plan.id) is None
+    assert AttackConfig.query.filter(AttackConfig.plan_id.in_([plan.id, new_plan.id])).count() == 0
+
+
+def locks_are_free(manager):
+    """ Return True if another thread can take the scheduler job stores lock and the store write lock """
+    free = []
+
+    def acquire():
+        for lock in (manager.scheduler._jobstores_lock, manager.sql_store._write_lock):
+            if not lock.acquire(timeout=1):
+                free.append(False)
+                return
+            lock.release()
+        free.append(True)
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    thread.join()
+    return free == [True]
+
+
+def test_executors_batch_runs_without_the_scheduler_and_store_locks(app, manager, plan):
+    run_time = datetime.now() + timedelta(hours=10)
+
+    with manager.executors_batch() as batch:
+        new_plan = manager.add_plan("batch plan")
+        manager.add_executor(run_time, "executor", {"ref": "a:A"}, new_plan.id)
+        assert locks_are_free(manager)
+        assert manager.get_plan(new_plan.id) is None
+
+    assert batch == {"plans": [new_plan.id], "executors": 1}
+    assert manager.get_plan(new_plan.id).pending_count == 1
+    manager.delete_plan(new_plan.id)
+
+
+def test_planners_run_without_the_scheduler_and_store_locks(app, manager, monkeypatch):
+    run_time = datetime.now() + timedelta(hours=10)
+    free = []
+
+    class SlowPlanner:
+        def __init__(self, name):
+            self.name = name
+
+        def plan(self, planner_config, attack_config):
+            new_plan = manager.add_plan(self.name)
+            manager.add_executor(run_time, "executor", attack_config, new_plan.id)
+            free.append(locks_are_free(manager))
+
+    monkeypatch.setattr(manager, "_validated_planner", lambda name, *configs: SlowPlanner(name))
+    results = manager.execute_plans([("first", {}, {"ref": "a:A"}), ("second", {}, {"ref": "a:A"})])
+
+    assert free == [True, True]
+    assert [result["executors"] for result in results] == [1, 1]
+    for result in results:
+        plan_id, = result["plans"]
+        assert manager.get_plan(plan_id).pending_count == 1
+        manager.delete_plan(plan_id)
+
+
+def test_executors_are_added_to_the_pool_of_the_attack(app, manager, plan, monkeypatch):
+    from chaosmonkey.attacks.attack import Attack
+    from chaosmonkey.engine.pools import pools
+
+    class SSHAttack(Attack):
+        executor_pool = "ssh"
+
+    monkeypatch.setattr(manager.attacks_store, "get", lambda ref: SSHAttack if ref == "ssh:SSHAttack" else None)
+    run_time = datetime.now() + timedelta(hours=10)
+    pools.configure({"ssh": ("thread", 2)})
+    try:
+        executor = manager.add_executor(run_time, "executor", {"ref": "ssh:SSHAttack"}, plan.id)
+        default_executor = manager.add_executor(run_time, "executor", {"ref": "unknown:Attack"}, plan.id)
+    finally:
+        pools.configure()
+
+    assert manager.scheduler.get_job(executor.id).executor == "ssh"
+    assert manager.scheduler.get_job(default_executor.id).executor == "default"
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+from chaosmonkey.dal.database import db
+from chaosmonkey.dal.idempotency_key_model import IdempotencyKey
+from chaosmonkey.engine.idempotency import IdempotencyKeys
+
+
+def test_expired_keys_are_claimed_again_and_evicted(app, manager):
+    keys = IdempotencyKeys(batch_size=2)
+    keys.configure(manager.scheduler, manager.sql_store, ttl_hours=1)
+
+    for key in ("expired 1", "expired 2", "expired 3", "valid"):
+        assert keys.claim(key, "fingerprint") is None
+        keys.complete(key, 200, {"Content-Type": "application/json"}, '{"msg": "ok"}')
+    db.session.query(IdempotencyKey).filter(IdempotencyKey.key.like("expired%"))\
+        .update({IdempotencyKey.created: datetime.utcnow() - timedelta(hours=2)}, synchronize_session=False)
+    db.session.commit()
+
+    valid = keys.claim("valid", "fingerprint")
+    assert not valid.in_progress and valid.body == '{"msg": "ok"}'
+    assert valid.response_headers == {"Content-Type": "application/json"}
+    assert keys.claim("expired 1", "other fingerprint") is None
+
+    assert keys.evict() == 2
+    assert IdempotencyKey.query.get("expired 2") is None
+    assert IdempotencyKey.query.get("expired 1").in_progress
+
+    keys.configure(manager.scheduler, manager.sql_store, ttl_hours=1)
+    assert IdempotencyKey.query.get("expired 1") is None
+    manager.sql_store.delete_idempotency_keys(datetime.utcnow() + timedelta(hours=1), 10)
@@ -0,0 +1,52 @@
+import pytest
+from chaosmonkey.engine.metrics import Histogram, Gauge, Registry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, "/a")
+    histogram.observe(0.2, "/b")
+
+    cumulative, total, count = histogram.values()[("/a",)]
+    assert cumulative == [2, 3, 4]
+    assert total == pytest.approx(3.65)
+    assert count == 4
+    assert histogram.values()[("/b",)][0] == [0, 1, 1]
+
+
+def test_histogram_samples():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+    histogram.observe(0.5, '/a"b')
+
+    assert histogram.samples() == [
+        'latency_seconds_bucket{route="/a\\"b",le="0.1"} 0',
+        'latency_seconds_bucket{route="/a\\"b",le="1"} 1',
+        'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 1',
+        'latency_seconds_sum{route="/a\\"b"} 0.5',
+        'latency_seconds_count{route="/a\\"b"} 1'
+    ]
+
+
+def test_gauge_reads_the_callback():
+    assert Gauge("empty", "Empty").samples() == []
+    assert Gauge("pending", "Pending", callback=lambda: 3).samples() == ["pending 3"]
+    busy = Gauge("busy", "Busy", ("pool",), callback=lambda: {("io",): 2, ("default",): 0.5})
+    assert busy.samples() == ['busy{pool="default"} 0.5', 'busy{pool="io"} 2']
+
+
+def test_registry_render():
+    registry = Registry()
+    registry.register(Gauge("pending", "Pending executors", callback=lambda: 3))
+    registry.register(Histogram("duration_seconds", "Duration", buckets=(1,)))
+
+    assert registry.render() == "\n".join([
+        "# HELP pending Pending executors",
+        "# TYPE pending gauge",
+        "pending 3",
+        "# HELP duration_seconds Duration",
+        "# TYPE duration_seconds histogram"
+    ]) + "\n"
+
+    with pytest.raises(ValueError):
+        registry.register(Gauge("pending", "Pending executors"))
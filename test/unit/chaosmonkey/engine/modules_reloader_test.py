@@ -0,0 +1,52 @@
+from chaosmonkey.engine.modules_reloader import ModulesReloader, RELOAD_JOB_ID
+
+
+class StoreMock:
+    def __init__(self, changes):
+        self.changes = changes
+
+    def reload(self):
+        return dict(self.changes, duration=0.01)
+
+
+def no_changes():
+    return {"added": [], "reloaded": [], "removed": [], "failed": []}
+
+
+def test_reload_job_is_not_scheduled_without_interval(app, manager):
+    reloader = ModulesReloader()
+    reloader.configure(manager.scheduler, {})
+
+    assert manager.scheduler.get_job(RELOAD_JOB_ID) is None
+
+
+def test_run_reports_changed_stores(app, manager):
+    reloader = ModulesReloader()
+    reloader.configure(manager.scheduler, {"attacks": StoreMock(no_changes())})
+
+    reloader.run()
+    assert reloader.last_report is None
+
+    reloader.configure(manager.scheduler, {
+        "attacks": StoreMock(dict(no_changes(), reloaded=["attack1"])),
+        "planners": StoreMock(no_changes())
+    })
+    report = reloader.run()
+
+    assert report["attacks"]["reloaded"] == ["attack1"]
+    assert reloader.last_report == report
+
+
+def test_listeners_are_called_after_a_reload_with_changes(app, manager):
+    calls = []
+    reloader = ModulesReloader()
+    reloader.add_listener(calls.append)
+    reloader.add_listener(lambda changed: 1 / 0)
+
+    reloader.configure(manager.scheduler, {"attacks": StoreMock(no_changes())})
+    reloader.run()
+    assert calls == []
+
+    reloader.configure(manager.scheduler, {"planners": StoreMock(dict(no_changes(), added=["planner1"]))})
+    reloader.run()
+    assert [sorted(changed) for changed in calls] == [["planners"]]
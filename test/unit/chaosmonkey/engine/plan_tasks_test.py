@@ -0,0 +1,53 @@
+import threading
+import time
+from chaosmonkey.engine.plan_tasks import PlanTasks, TASK_RUNNING, TASK_SUCCEEDED
+
+
+class BlockingManager:
+    """ Manager that creates a plan with one executor when the plan is released """
+    def __init__(self):
+        self.released = {}
+
+    def validate_plan(self, name, planner_config, attack_config):
+        self.released[name] = threading.Event()
+
+    def execute_plans(self, plans):
+        (name, _, _), = plans
+        self.released[name].wait(5)
+        return [{"index": 0, "plans": [name], "executors": 1}]
+
+
+def wait_for(task, status):
+    for _ in range(100):
+        if task.status == status:
+            return
+        time.sleep(0.01)
+    raise AssertionError("task %s is %s" % (task.name, task.status))
+
+
+def test_finished_tasks_are_evicted_oldest_first():
+    manager = BlockingManager()
+    tasks = PlanTasks()
+    tasks.configure(manager, workers=3, max_tasks=2)
+
+    running = tasks.submit("running", {}, {})
+    first = tasks.submit("first", {}, {})
+    wait_for(running, TASK_RUNNING)
+    manager.released["first"].set()
+    wait_for(first, TASK_SUCCEEDED)
+    assert first.plans == ["first"] and first.executors == 1
+
+    second = tasks.submit("second", {}, {})
+    manager.released["second"].set()
+    wait_for(second, TASK_SUCCEEDED)
+    third = tasks.submit("third", {}, {})
+
+    # the running task is kept even if it is the oldest
+    assert tasks.get(running.id) is running
+    assert tasks.get(first.id) is None
+    assert tasks.get(second.id) is None
+    assert tasks.get(third.id) is third
+
+    manager.released["running"].set()
+    manager.released["third"].set()
+    tasks.shutdown()
@@ -0,0 +1,112 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from apscheduler.executors.pool import ThreadPoolExecutor
+from pytz import utc
+from chaosmonkey.attacks.attack import Attack
+from chaosmonkey.engine.metrics import metrics
+from chaosmonkey.engine.pools import Pools, parse_pool, DEFAULT_POOL
+
+
+class ThreadAttack(Attack):
+    executor_pool = "io"
+    runs = []
+
+    def run(self):
+        self.runs.append((os.getpid(), self.attack_config))
+
+
+class ProcessAttack(Attack):
+    executor_pool = "cpu"
+
+    def run(self):
+        if self.attack_config.get("crash"):
+            os._exit(1)
+        if self.attack_config.get("fail"):
+            raise ValueError("attack failed in pid %d" % os.getpid())
+
+
+@pytest.fixture
+def pools():
+    pools = Pools()
+    yield pools
+    pools.shutdown()
+
+
+def test_parse_pool():
+    assert parse_pool("ssh=thread:20") == ("ssh", ("thread", 20))
+    assert parse_pool("cpu=process:2") == ("cpu", ("process", 2))
+
+    for spec in ("ssh", "ssh=thread", "=thread:2", "ssh=fork:2", "ssh=thread:0", "ssh=thread:many"):
+        with pytest.raises(ValueError):
+            parse_pool(spec)
+
+
+def test_configure_creates_a_scheduler_executor_per_pool(pools):
+    executors = pools.configure({"io": ("thread", 20), "cpu": ("process", 2)})
+
+    assert sorted(executors) == ["cpu", DEFAULT_POOL, "io"]
+    assert all(isinstance(executor, ThreadPoolExecutor) for executor in executors.values())
+    assert pools.pools[DEFAULT_POOL] == ("thread", 10)
+
+
+def test_pool_for_falls_back_to_default(pools):
+    pools.configure({"io": ("thread", 2)})
+
+    assert pools.pool_for(ThreadAttack) == "io"
+    assert pools.pool_for(ProcessAttack) == DEFAULT_POOL
+    assert pools.pool_for(None) == DEFAULT_POOL
+
+
+def test_run_in_thread_pool(pools):
+    pools.configure({"io": ("thread", 2)})
+    pools.run(ThreadAttack, {"target": "node"})
+
+    assert ThreadAttack.runs[-1] == (os.getpid(), {"target": "node"})
+
+
+def test_run_in_process_pool(pools):
+    pools.configure({"cpu": ("process", 1)})
+
+    with pytest.raises(ValueError) as excinfo:
+        pools.run(ProcessAttack, {"fail": True})
+    assert "pid %d" % os.getpid() not in str(excinfo.value)
+
+
+def test_broken_process_pool_is_created_again(pools):
+    pools.configure({"cpu": ("process", 1)})
+
+    with pytest.raises(BrokenProcessPool):
+        pools.run(ProcessAttack, {"crash": True})
+    pools.run(ProcessAttack, {})
+
+
+def test_pool_executor_counts_busy_threads_and_scheduler_lag(pools):
+    executors = pools.configure({"io": ("thread", 4)})
+    metrics.scheduler_lag.clear()
+    started, release = threading.Event(), threading.Event()
+
+    def run_job(job, jobstore_alias, run_times, logger_name):
+        started.set()
+        release.wait(5)
+        return []
+
+    run_time = datetime.now(utc) - timedelta(seconds=2)
+    future = executors["io"]._pool.submit(run_job, None, "default", [run_time], "logger")
+    started.wait(5)
+    assert pools.usage() == {DEFAULT_POOL: (0, 10), "io": (1, 4)}
+
+    release.set()
+    assert future.result(5) == []
+    assert pools.usage()["io"] == (0, 4)
+    _, lag, count = metrics.scheduler_lag.values()[("io",)]
+    assert count == 1
+    assert 2 <= lag < 5
+    executors["io"].shutdown()
+
+
+def test_jobs_of_unknown_pools_use_the_default_executor(app, manager):
+    scheduler = manager.scheduler
+    assert scheduler._lookup_executor("not-configured") is scheduler._lookup_executor(DEFAULT_POOL)
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+import pytest
+from chaosmonkey.dal.database import db
+from chaosmonkey.dal.execution_model import Execution
+from chaosmonkey.dal.plan_model import Plan
+from chaosmonkey.engine.retention import Retention
+
+
+def executed_plan(manager, executors, days_ago):
+    plan = manager.add_plan("plan name")
+    run_time = datetime.now() + timedelta(hours=10)
+    executors = manager.add_executors([(run_time, "executor %d" % i, {}, plan.id) for i in range(executors)])
+    for executor in executors:
+        manager.sql_store.remove_job(executor.id)
+
+    Execution.query.filter(Execution.plan_id == plan.id)\
+        .update({Execution.next_run_time: datetime.now() - timedelta(days=days_ago)})
+    Plan.query.filter(Plan.id == plan.id).update({Plan.created: datetime.utcnow() - timedelta(days=days_ago)})
+    db.session.commit()
+    return plan, executors
+
+
+@pytest.fixture
+def retention(manager):
+    retention = Retention(batch_size=2, pause=0)
+    retention.configure(manager.scheduler, manager.sql_store)
+    return retention
+
+
+def test_retention_deletes_old_executions_and_plans(app, manager, retention):
+    old_plan_id = executed_plan(manager, 3, days_ago=10)[0].id
+    recent_plan, recent_executors = executed_plan(manager, 1, days_ago=1)
+
+    report = retention.run(retention_days=5)
+
+    assert (report["executions_deleted"], report["plans_deleted"]) == (3, 1)
+    assert retention.last_report == report
+    assert manager.get_plan(old_plan_id) is None
+    assert Execution.query.filter(Execution.plan_id == old_plan_id).count() == 0
+    assert manager.get_executor(recent_executors[0].id).executed is True
+    assert manager.get_plan(recent_plan.id).executed_count == 1
+    manager.delete_plan(recent_plan.id)
+
+
+def test_retention_keeps_plans_with_pending_executors(app, manager, retention, plan):
+    manager.add_executor(datetime.now() + timedelta(hours=10), "executor", {}, plan.id)
+    Plan.query.filter(Plan.id == plan.id).update({Plan.created: datetime.utcnow() - timedelta(days=10)})
+    db.session.commit()
+
+    retention.run(retention_days=5)
+
+    assert manager.get_plan(plan.id).pending_count == 1
+
+
+def test_retention_without_days(app, retention):
+    with pytest.raises(ValueError):
+        retention.run()
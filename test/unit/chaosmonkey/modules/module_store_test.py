@@ -1,7 +1,10 @@
 from unittest.mock import patch
+from uuid import uuid4
+import os
 import sys
+import tempfile
 import pytest
-from chaosmonkey.modules.module_store import ModulesStore
+from chaosmonkey.modules.module_store import ModulesStore, ModuleLookupError
 from chaosmonkey.attacks.attack import Attack
 import chaosmonkey.attacks.attack as module_attack
 
@@ -60,12 +63,11 @@ def test_ref_to_obj():
     assert obj is Attack
 
 
-@patch.object(ModulesStore, "get_modules")
-def test_list(modules_mock):
+def test_list():
     sys.path.insert(0, "attacks")
     module = __import__("terminate_ec2_instance")
     modules_store = ModulesStore(Attack)
-    modules_mock.return_value = [module]
+    modules_store.set_modules([module])
 
     assert len(modules_store.list()) == 1
 
@@ -85,3 +87,149 @@ def test_remove():
     modules_store.add(module)
     modules_store.remove("terminate_ec2_instance")
     assert len(modules_store.list()) == 0
+
+
+def test_index_follows_added_and_removed_modules():
+    sys.path.insert(0, "attacks")
+    module = __import__("terminate_ec2_instance")
+    modules_store = ModulesStore(Attack)
+    generation = modules_store.generation
+
+    modules_store.add(module)
+    assert modules_store.get("terminate_ec2_instance:TerminateEC2Instance") is module.TerminateEC2Instance
+    assert modules_store.list() == ["terminate_ec2_instance:TerminateEC2Instance"]
+
+    modules_store.remove("terminate_ec2_instance")
+    assert modules_store.get("terminate_ec2_instance:TerminateEC2Instance") is None
+    assert modules_store.list() == []
+    assert modules_store.generation == generation + 2
+
+
+def test_get_unknown_class_in_loaded_module():
+    modules_store = ModulesStore(Attack)
+    modules_store.add(module_attack)
+
+    with pytest.raises(ModuleLookupError):
+        modules_store.get("chaosmonkey.attacks.attack:Unknown")
+
+
+ATTACK_SOURCE = '''
+from chaosmonkey.attacks.attack import Attack
+
+
+class ReloadAttack(Attack):
+    version = {version!r}
+'''
+
+
+def write_module(path, name, source):
+    with open(os.path.join(path, name + ".py"), "w") as module_file:
+        module_file.write(source)
+
+
+def test_reload_changed_modules():
+    path = tempfile.mkdtemp()
+    name = "reload_attack_%s" % uuid4().hex
+    write_module(path, name, ATTACK_SOURCE.format(version="first"))
+    modules_store = ModulesStore(Attack)
+    modules_store.load(path)
+    running_class = modules_store.get(name + ":ReloadAttack")
+
+    assert modules_store.reload()["reloaded"] == []
+
+    write_module(path, name, ATTACK_SOURCE.format(version="second version"))
+    write_module(path, name + "_new", ATTACK_SOURCE.format(version="new"))
+    changes = modules_store.reload()
+
+    assert (changes["added"], changes["reloaded"], changes["removed"]) == ([name + "_new"], [name], [])
+    assert modules_store.get(name + ":ReloadAttack").version == "second version"
+    assert modules_store.get(name + "_new:ReloadAttack").version == "new"
+    assert running_class.version == "first"
+
+    os.remove(os.path.join(path, name + "_new.py"))
+    assert modules_store.reload()["removed"] == [name + "_new"]
+    assert modules_store.list() == [name + ":ReloadAttack"]
+
+
+def test_reload_keeps_modules_that_fail():
+    path = tempfile.mkdtemp()
+    name = "reload_attack_%s" % uuid4().hex
+    write_module(path, name, ATTACK_SOURCE.format(version="first"))
+    modules_store = ModulesStore(Attack)
+    modules_store.load(path)
+
+    write_module(path, name, "class ReloadAttack(:\n")
+    changes = modules_store.reload()
+
+    assert changes["failed"] == [name]
+    assert modules_store.get(name + ":ReloadAttack").version == "first"
+    assert modules_store.reload()["failed"] == []
+
+
+def test_failed_reload_does_not_modify_the_previous_module():
+    path = tempfile.mkdtemp()
+    name = "reload_attack_%s" % uuid4().hex
+    write_module(path, name, ATTACK_SOURCE.format(version="first"))
+    modules_store = ModulesStore(Attack)
+    modules_store.load(path)
+    module = sys.modules[name]
+
+    write_module(path, name, ATTACK_SOURCE.format(version="broken") + "raise RuntimeError('broken module')\n")
+    assert modules_store.reload()["failed"] == [name]
+    # another module changes, so the index is built again from the loaded modules
+    write_module(path, name + "_new", ATTACK_SOURCE.format(version="new"))
+    assert modules_store.reload()["added"] == [name + "_new"]
+
+    assert sys.modules[name] is module
+    assert module.ReloadAttack.version == "first"
+    assert modules_store.get(name + ":ReloadAttack").version == "first"
+
+    write_module(path, name, ATTACK_SOURCE.format(version="fixed"))
+    assert modules_store.reload()["reloaded"] == [name]
+    assert modules_store.get(name + ":ReloadAttack").version == "fixed"
+    assert sys.modules[name] is not module
+    assert module.ReloadAttack.version == "first"
+
+
+def test_reload_a_deleted_module_added_again():
+    path = tempfile.mkdtemp()
+    name = "reload_attack_%s" % uuid4().hex
+    write_module(path, name, ATTACK_SOURCE.format(version="deleted"))
+    modules_store = ModulesStore(Attack)
+    modules_store.load(path)
+
+    os.remove(os.path.join(path, name + ".py"))
+    assert modules_store.reload()["removed"] == [name]
+    assert name not in sys.modules
+
+    write_module(path, name, ATTACK_SOURCE.format(version="added again").replace("ReloadAttack", "OtherAttack"))
+    assert modules_store.reload()["added"] == [name]
+    assert modules_store.list() == [name + ":OtherAttack"]
+    assert modules_store.get(name + ":OtherAttack").version == "added again"
+
+
+def test_lazy_load_imports_modules_when_requested():
+    path = tempfile.mkdtemp()
+    name = "lazy_attack_%s" % uuid4().hex
+    write_module(path, name, ATTACK_SOURCE.format(version="lazy"))
+    modules_store = ModulesStore(Attack, lazy=True)
+    modules_store.load(path)
+
+    assert modules_store.list() == [name + ":ReloadAttack"]
+    assert name not in sys.modules
+
+    assert modules_store.get(name + ":ReloadAttack").version == "lazy"
+    assert name in sys.modules
+    assert modules_store.list() == [name + ":ReloadAttack"]
+
+
+def test_lazy_reload_does_not_import_pending_modules():
+    path = tempfile.mkdtemp()
+    name = "lazy_attack_%s" % uuid4().hex
+    modules_store = ModulesStore(Attack, lazy=True)
+    modules_store.load(path)
+
+    write_module(path, name, ATTACK_SOURCE.format(version="lazy").replace("ReloadAttack", "NewAttack"))
+    assert modules_store.reload()["added"] == [name]
+    assert modules_store.list() == [name + ":NewAttack"]
+    assert name not in sys.modules